@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Dataset, Resource
+from .models import Dataset, Resource, ResourceLinkStatus, ResourceProfile
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
@@ -26,4 +26,20 @@ class ResourceAdmin(admin.ModelAdmin):
     list_display = ("name", "format", "dataset")
     list_filter = ("format",)
     search_fields = ("name", "description")
-    ordering = ("-name",)
\ No newline at end of file
+    ordering = ("-name",)
+
+@admin.register(ResourceLinkStatus)
+class ResourceLinkStatusAdmin(admin.ModelAdmin):
+    list_display = ("resource", "ok", "status_code", "error", "latency_ms", "checked_at")
+    list_filter = ("ok", "status_code")
+    search_fields = ("url",)
+    ordering = ("-checked_at",)
+    list_select_related = ("resource",)
+
+@admin.register(ResourceProfile)
+class ResourceProfileAdmin(admin.ModelAdmin):
+    list_display = ("resource", "row_count", "byte_size", "truncated", "error", "profiled_at")
+    list_filter = ("truncated",)
+    search_fields = ("url",)
+    ordering = ("-profiled_at",)
+    list_select_related = ("resource",)
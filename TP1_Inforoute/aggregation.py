@@ -0,0 +1,77 @@
+from django.db.models import Case, CharField, Count, Value, When
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear
+from django.utils import timezone
+
+from .stats import FRESHNESS_LABELS, freshness_filters
+
+
+def freshness():
+    # Mêmes tranches que l'histogramme de /api/stats/ ; sans date de modification : None
+    conditions = freshness_filters(timezone.localdate())
+    return Case(
+        *(When(condition, then=Value(label)) for condition, label in zip(conditions, FRESHNESS_LABELS)),
+        default=None,
+        output_field=CharField(),
+    )
+
+
+# Dimensions autorisées -> champ ORM, ou fonction qui construit l'expression
+# (liste blanche : jamais de champ venant du client)
+DIMENSIONS = {
+    "organization": "organization_title",
+    "license": "license_title",
+    "state": "state",
+    "format": "resources__format",
+    "tag": "tag_set__name",
+    "freshness": freshness,
+}
+DATE_FIELDS = ("metadata_modified", "metadata_created")
+GRANULARITIES = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+    "year": TruncYear,
+}
+METRICS = {
+    "datasets": lambda: Count("pk", distinct=True),
+    "resources": lambda: Count("resources", distinct=True),
+}
+MAX_ROWS = 10000
+
+
+def aggregate(queryset, group_by=(), date_field=None, granularity=None, metrics=("datasets",), limit=1000):
+    """Agrège `queryset` entièrement en SQL (GROUP BY) et retourne une liste de lignes."""
+    group_by = list(group_by)
+    values = {}
+    for name in group_by:
+        dimension = DIMENSIONS[name]
+        if callable(dimension):
+            queryset = queryset.annotate(**{f"{name}_bucket": dimension()})
+            dimension = f"{name}_bucket"
+        values[name] = dimension
+    if granularity:
+        queryset = queryset.annotate(period=GRANULARITIES[granularity](date_field or DATE_FIELDS[0]))
+        values["period"] = "period"
+
+    annotations = {name: METRICS[name]() for name in metrics}
+    first_metric = metrics[0]
+
+    if values:
+        rows = (
+            queryset
+            .values(*values.values())
+            .annotate(**annotations)
+            .order_by(*(["period"] if "period" in values else []), f"-{first_metric}")
+        )[:min(limit, MAX_ROWS)]
+    else:
+        rows = [queryset.aggregate(**annotations)]
+
+    # Renomme les colonnes ORM (organization_title, resources__format...) avec le nom de la dimension
+    results = []
+    for row in rows:
+        item = {name: row.get(field) for name, field in values.items()}
+        if item.get("period") is not None:
+            item["period"] = item["period"].date().isoformat()
+        item.update((name, row[name]) for name in metrics)
+        results.append(item)
+    return results
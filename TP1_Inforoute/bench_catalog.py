@@ -0,0 +1,297 @@
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Catalogue synthétique pour les mesures de performance : chaque dataset est
+# calculé à la demande à partir de (graine, rang), rien n'est gardé en mémoire.
+# 100 000 datasets x 10 ressources en moyenne = 1 million de ressources.
+WORDS = (
+    "eau", "qualité", "air", "transport", "route", "vélo", "parc", "arbre", "forêt", "lac",
+    "rivière", "budget", "contrat", "élection", "école", "santé", "hôpital", "population",
+    "recensement", "emploi", "entreprise", "permis", "bâtiment", "zonage", "adresse", "rue",
+    "collecte", "déchets", "recyclage", "énergie", "électricité", "climat", "température",
+    "précipitations", "neige", "inondation", "sécurité", "incendie", "police", "accident",
+    "circulation", "stationnement", "autobus", "métro", "piste", "cyclable", "territoire",
+    "municipalité", "région", "québec", "montréal", "gatineau", "sherbrooke", "laval",
+    "limite", "carte", "géographie", "statistiques", "indicateurs", "inventaire", "mesures",
+    "station", "capteur", "débit", "niveau", "faune", "flore", "espèces", "agriculture",
+    "culture", "patrimoine", "bibliothèque", "loisirs", "tourisme", "hébergement", "subvention",
+)
+FORMATS = ("CSV", "JSON", "GeoJSON", "SHP", "PDF", "XLSX", "WMS", "ZIP", "csv", "HTML")
+LICENSES = (
+    ("cc-by", "Creative Commons Attribution (CC-BY)"),
+    ("cc-by-4.0", "Creative Commons Attribution 4.0 (CC-BY-4.0)"),
+    ("cc-by-nc", "Creative Commons Attribution - Pas d'utilisation commerciale (CC-BY-NC)"),
+    ("odc-odbl", "Open Data Commons Open Database License (ODbL)"),
+    ("other-open", "Autre (Ouverte)"),
+)
+ORGANIZATION_COUNT = 60
+TAG_COUNT = 300
+GROUP_COUNT = 12
+FREQUENCIES = ("annuelle", "mensuelle", "hebdomadaire", "quotidienne", "irrégulière")
+
+CATALOG_START = datetime(2015, 1, 1, tzinfo=dt_timezone.utc)
+CATALOG_SPAN = timedelta(days=9 * 365)
+
+
+def ckan_datetime(value):
+    # Même forme que CKAN : UTC, sans fuseau
+    return value.astimezone(dt_timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class SyntheticCatalog:
+    """Catalogue CKAN déterministe : même graine, mêmes données, d'une exécution à l'autre.
+
+    Chaque révision (revision += 1) modifie une fraction `change_ratio` des
+    datasets, ce qui permet de mesurer un moissonnage incrémental.
+    """
+
+    def __init__(self, datasets=1000, resources_per_dataset=10, seed=0, change_ratio=0.01):
+        self.datasets = datasets
+        self.resources_per_dataset = resources_per_dataset
+        self.seed = seed
+        self.change_ratio = change_ratio
+        self.revision = 0
+        self._modified_index = None
+        self.organizations = [
+            (f"org-{k:03}", f"Organisation {k:03} - {WORDS[k % len(WORDS)].capitalize()}")
+            for k in range(ORGANIZATION_COUNT)
+        ]
+        # Répartition à longue traîne (loi de Zipf), comme les vrais catalogues
+        self.organization_weights = [1 / (k + 1) for k in range(ORGANIZATION_COUNT)]
+        self.tags = [f"{WORDS[k % len(WORDS)]}-{k // len(WORDS)}" if k >= len(WORDS) else WORDS[k]
+                     for k in range(TAG_COUNT)]
+        self.tag_weights = [1 / (k + 1) for k in range(TAG_COUNT)]
+        self.groups = [WORDS[k * 5].capitalize() for k in range(GROUP_COUNT)]
+
+    def __len__(self):
+        return self.datasets
+
+    def _rng(self, index, *salt):
+        return random.Random(":".join(str(part) for part in (self.seed, index) + salt))
+
+    def dataset_id(self, index):
+        # Identifiants croissants avec le rang : "id asc" et "metadata_created asc" donnent le même ordre
+        return str(uuid.UUID(int=(self.seed % (1 << 32)) << 96 | index))
+
+    def index_of(self, ckan_id):
+        try:
+            value = uuid.UUID(ckan_id).int
+        except ValueError:
+            return None
+        index = value & ((1 << 96) - 1)
+        if value >> 96 != self.seed % (1 << 32) or index >= self.datasets:
+            return None
+        return index
+
+    def last_change(self, index):
+        # Dernière révision ayant modifié ce dataset (0 = jamais modifié)
+        for revision in range(self.revision, 0, -1):
+            if self._rng(index, "rev", revision).random() < self.change_ratio:
+                return revision
+        return 0
+
+    def dates(self, index):
+        created = CATALOG_START + CATALOG_SPAN * (index / max(self.datasets, 1))
+        modified = created + timedelta(days=self._rng(index, "modified").random() * 365)
+        revision = self.last_change(index)
+        if revision:
+            modified = CATALOG_START + CATALOG_SPAN + timedelta(days=365 + revision, seconds=index)
+        return created, modified, revision
+
+    def package(self, index):
+        """Dataset au format package_show de CKAN."""
+        rng = self._rng(index)
+        created, modified, revision = self.dates(index)
+        ckan_id = self.dataset_id(index)
+        organization_id, organization_title = rng.choices(self.organizations, self.organization_weights)[0]
+        license_id, license_title = rng.choice(LICENSES)
+        words = rng.sample(WORDS, 4)
+        title = " ".join(words).capitalize() + (f" (révision {revision})" if revision else "")
+        tags = sorted(set(rng.choices(self.tags, self.tag_weights, k=rng.randint(1, 6))))
+        groups = sorted(set(rng.sample(self.groups, rng.randint(0, 2))))
+        resource_count = rng.randint(1, 2 * self.resources_per_dataset - 1) if self.resources_per_dataset else 0
+
+        return {
+            "id": ckan_id,
+            "name": f"jeu-{index}-{'-'.join(words[:2])}",
+            "title": title,
+            "notes": " ".join(rng.choices(WORDS, k=rng.randint(10, 60))).capitalize() + ".",
+            "author": f"Auteur {rng.randint(1, 500)}",
+            "author_email": f"auteur{rng.randint(1, 500)}@exemple.qc.ca",
+            "organization": {"id": organization_id, "name": organization_id, "title": organization_title},
+            "license_id": license_id,
+            "license_title": license_title,
+            "license_url": f"https://exemple.qc.ca/licences/{license_id}",
+            "metadata_created": ckan_datetime(created),
+            "metadata_modified": ckan_datetime(modified),
+            "state": "active" if rng.random() < 0.97 else "draft",
+            "private": rng.random() < 0.05,
+            "tags": [{"name": tag, "display_name": tag} for tag in tags],
+            "groups": [{"name": group.lower(), "display_name": group} for group in groups],
+            "temporal": f"{created.year}-{modified.year}",
+            "update_frequency": rng.choice(FREQUENCIES),
+            "resources": [
+                {
+                    "id": str(uuid.uuid5(uuid.UUID(ckan_id), str(k))),
+                    "name": f"Ressource {k} - {rng.choice(WORDS)}",
+                    "description": " ".join(rng.choices(WORDS, k=8)),
+                    "format": rng.choice(FORMATS),
+                    "url": f"https://donnees.exemple.qc.ca/{index}/ressource-{k}",
+                    "resource_type": rng.choice(("file", "api", "documentation")),
+                }
+                for k in range(resource_count)
+            ],
+        }
+
+    def modified_index(self):
+        # (metadata_modified, rang) triés, recalculés seulement quand la révision change
+        if self._modified_index is None or self._modified_index[0] != self.revision:
+            keys = sorted((self.dates(index)[1], index) for index in range(self.datasets))
+            self._modified_index = (self.revision, keys)
+        return self._modified_index[1]
+
+    def search(self, start=0, rows=10, sort=None, since=None, fields=None):
+        """Équivalent de package_search pour les tris utilisés par le moissonnage."""
+        if since is not None:
+            keys = self.modified_index()
+            first = bisect_left(keys, (since, -1))
+            indexes = [index for _, index in keys[first + start:first + start + rows]]
+            count = len(keys) - first
+        else:
+            # "metadata_created asc, id asc" et "id asc" : l'ordre des rangs
+            indexes = range(start, min(start + rows, self.datasets))
+            count = self.datasets
+
+        if fields == ["id"]:
+            results = [{"id": self.dataset_id(index)} for index in indexes]
+        else:
+            results = []
+            for index in indexes:
+                package = self.package(index)
+                for extra in ("temporal", "update_frequency"):
+                    package.pop(extra)
+                results.append(package)
+        return {"count": count, "results": results}
+
+
+# fq envoyé par le moissonnage incrémental : metadata_modified:[<date> TO *]
+SINCE_RE = re.compile(r"metadata_modified:\[(\S+) TO \*\]")
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # File d'attente des connexions : 5 par défaut, trop peu pour des centaines de clients simultanés
+    request_queue_size = 1024
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client parti avant la réponse (délai dépassé de son côté) : rien à signaler
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeCkanServer:
+    """Serveur HTTP local imitant package_search / package_show de CKAN.
+
+    S'utilise comme gestionnaire de contexte ; `url` remplace CKAN_BASE_URL.
+    `latency` ajoute un délai (secondes) à chaque réponse et `error_rate`
+    renvoie une fraction de 503 pour exercer les nouvelles tentatives.
+    """
+
+    def __init__(self, catalog, latency=0.0, error_rate=0.0, seed=0):
+        self.catalog = catalog
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/3/action"
+
+    def start(self):
+        self.server = _HTTPServer(("127.0.0.1", 0), self.handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            return self.error_rate and self.random.random() < self.error_rate
+
+    def action(self, name, params):
+        """Retourne (statut HTTP, corps JSON) pour une action CKAN."""
+        if name == "package_show":
+            index = self.catalog.index_of(params.get("id", ""))
+            if index is None:
+                return 404, {"success": False, "error": {"message": "Not found", "__type": "Not Found Error"}}
+            return 200, {"success": True, "result": self.catalog.package(index)}
+
+        if name == "package_search":
+            try:
+                start = int(params.get("start", 0))
+                rows = int(params.get("rows", 10))
+            except ValueError:
+                return 400, {"success": False, "error": {"message": "start/rows invalides"}}
+            since = None
+            match = SINCE_RE.search(params.get("fq", ""))
+            if match:
+                since = datetime.strptime(match.group(1), "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=dt_timezone.utc)
+            fields = params["fl"].split(",") if params.get("fl") else None
+            result = self.catalog.search(start, rows, params.get("sort"), since, fields)
+            return 200, {"success": True, "result": result}
+
+        return 400, {"success": False, "error": {"message": f"Action inconnue : {name}"}}
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, comme CKAN derrière nginx
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                name = parts.path.rstrip("/").rsplit("/", 1)[-1]
+                params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.should_fail():
+                    status, payload = 503, {"success": False, "error": {"message": "Service Unavailable"}}
+                else:
+                    status, payload = server.action(name, params)
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
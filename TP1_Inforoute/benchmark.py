@@ -0,0 +1,405 @@
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from . import ckan_cache, search
+from .bench_catalog import SyntheticCatalog, FakeCkanServer
+from .ckan import CkanClient
+from .harvest import Harvester
+from .models import Dataset, Resource, HarvestState, Tag, Group, CatalogStats
+
+# Mesures de performance reproductibles : catalogue synthétique, CKAN local,
+# puis moissonnage et vues en lecture appelées dans le même processus.
+PERCENTILES = (50, 90, 95, 99)
+BENCHMARK_USER = "benchmark"
+
+GRAPHQL_DATASETS = """
+query ($first: Int, $organization: String) {
+  allDatasets(first: $first, organization: $organization) {
+    edges { node { ckanId title organizationTitle metadataModified resources { format url } } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+GRAPHQL_SEARCH = """
+query ($keyword: String!, $first: Int) {
+  searchDatasets(keyword: $keyword, first: $first) {
+    edges { node { ckanId title } }
+  }
+}
+"""
+
+
+def percentile(values, pct):
+    # Interpolation linéaire entre les deux rangs encadrants (valeurs triées)
+    if not values:
+        return None
+    rank = (len(values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+@contextmanager
+def count_queries(counter):
+    # Compte les requêtes SQL sans garder leur texte (les écritures en lot sont volumineuses)
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        # Toutes les bases : avec une réplique, les lectures n'ont pas lieu sur "default"
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(wrapper))
+        yield
+
+
+def measure(call, prepare=None, iterations=10, warmup=1, trace_memory=True):
+    """Mesure `call` : latences, débit, nombre de requêtes SQL et pic mémoire.
+
+    `call` retourne le nombre d'éléments traités (1 par défaut) ; `prepare`
+    est appelé avant chaque appel, hors chronomètre. Le pic mémoire vient
+    d'un appel supplémentaire sous tracemalloc, qui ralentit l'exécution et
+    fausserait les latences.
+    """
+    def run():
+        if prepare:
+            prepare()
+        queries = [0]
+        with count_queries(queries):
+            started = time.perf_counter()
+            items = call()
+            elapsed = time.perf_counter() - started
+        return elapsed, 1 if items is None else items, queries[0]
+
+    for _ in range(warmup):
+        run()
+
+    latencies, items, queries = [], 0, []
+    for _ in range(iterations):
+        elapsed, count, query_count = run()
+        latencies.append(elapsed)
+        items += count
+        queries.append(query_count)
+
+    peak_memory = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    total = sum(latencies)
+    ordered = sorted(latencies)
+    return {
+        "iterations": iterations,
+        "items": items,
+        "throughput": items / total if total else None,
+        "latency_ms": dict(
+            {f"p{pct}": percentile(ordered, pct) * 1000 for pct in PERCENTILES},
+            min=ordered[0] * 1000,
+            mean=total / len(ordered) * 1000,
+            max=ordered[-1] * 1000,
+        ) if ordered else {},
+        "queries": max(queries) if queries else None,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def reset_catalog():
+    """Vide les tables du catalogue (et l'index plein texte) avant un moissonnage complet."""
+    Dataset.objects.all().delete()
+    Tag.objects.all().delete()
+    Group.objects.all().delete()
+    CatalogStats.objects.all().delete()
+    HarvestState.objects.filter(name=HarvestState.CATALOG).delete()
+    search.rebuild_index()
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def clear_caches():
+    caches["default"].clear()
+    caches[settings.RESPONSE_CACHE_ALIAS].clear()
+
+
+class BenchmarkSuite:
+    """Enchaîne les mesures du moissonnage puis des vues en lecture.
+
+    Les mesures de lecture portent sur le catalogue laissé par le moissonnage
+    complet. Avec cache="cold", les caches sont vidés avant chaque appel :
+    on mesure le calcul des réponses, pas le cache de réponses.
+    """
+
+    def __init__(self, catalog, server, iterations=20, warmup=2, cache="cold",
+                 workers=None, rows=None, trace_memory=True, log=None):
+        self.catalog = catalog
+        self.server = server
+        self.iterations = iterations
+        self.warmup = warmup
+        self.cache = cache
+        self.workers = workers or settings.HARVEST_WORKERS
+        self.rows = rows or settings.HARVEST_PAGE_SIZE
+        self.trace_memory = trace_memory
+        self.log = log or (lambda message: None)
+        self.results = {}
+
+    # --- Moissonnage ---
+
+    def harvest(self, incremental=False):
+        client = CkanClient(base_url=self.server.url, pool_size=self.workers)
+        harvester = Harvester(client=client, rows=self.rows, workers=self.workers, incremental=incremental)
+        try:
+            stats = harvester.run()
+        finally:
+            client.close()
+        return stats.total + stats.unchanged
+
+    def next_revision(self):
+        self.catalog.revision += 1
+
+    def harvest_cases(self):
+        # (nom, appel, préparation, itérations) ; les moissonnages complets ne se répètent pas
+        return [
+            ("harvest_full", self.harvest, reset_catalog, 1),
+            ("harvest_unchanged", self.harvest, None, 1),
+            ("harvest_incremental", lambda: self.harvest(incremental=True), self.next_revision, 1),
+        ]
+
+    # --- Lectures ---
+
+    def sample(self):
+        """Valeurs réelles du catalogue moissonné pour paramétrer les requêtes."""
+        ids = list(Dataset.objects.order_by("ckan_id").values_list("ckan_id", flat=True)[:50])
+        organization = (
+            Dataset.objects.exclude(organization_title=None)
+            .values_list("organization_title", flat=True).first()
+        )
+        return {"ids": ids or ["inconnu"], "organization": organization or "", "word": "eau"}
+
+    def read_cases(self):
+        sample = self.sample()
+        ids = sample["ids"]
+        position = [0]
+
+        def next_id():
+            # Détail : on fait tourner les identifiants pour ne pas mesurer une seule ligne
+            position[0] += 1
+            return ids[position[0] % len(ids)]
+
+        graphql_datasets = {"query": GRAPHQL_DATASETS, "variables": {"first": 20}}
+        graphql_filtered = {
+            "query": GRAPHQL_DATASETS,
+            "variables": {"first": 20, "organization": sample["organization"]},
+        }
+        graphql_search = {"query": GRAPHQL_SEARCH, "variables": {"keyword": sample["word"], "first": 20}}
+
+        return [
+            ("rest_list", "get", lambda: "/api/datasets/", None),
+            ("rest_list_expand", "get", lambda: "/api/datasets/?expand=resources", None),
+            ("rest_list_filtered", "get",
+             lambda: "/api/datasets/?" + urlencode({"organization": sample["organization"], "res_format": "CSV"}),
+             None),
+            ("rest_search", "get", lambda: f"/api/datasets/?search={sample['word']}", None),
+            ("rest_detail", "get", lambda: f"/api/datasets/{next_id()}/", None),
+            ("rest_resources", "get", lambda: "/api/resources/", None),
+            ("graphql_datasets", "post", lambda: "/graphql/", graphql_datasets),
+            ("graphql_datasets_filtered", "post", lambda: "/graphql/", graphql_filtered),
+            ("graphql_search", "post", lambda: "/graphql/", graphql_search),
+            ("stats_view", "get", lambda: "/stats/", None),
+            ("dataset_list", "get", lambda: "/", None),
+            ("dataset_list_search", "get", lambda: f"/?search={sample['word']}", None),
+            ("dataset_detail", "get", lambda: f"/dataset/{next_id()}/", None),
+        ]
+
+    def client(self):
+        # Hôte autorisé par ALLOWED_HOSTS ; GraphQL exige un utilisateur connecté
+        client = Client(HTTP_HOST="localhost")
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+        client.force_login(user)
+        return client
+
+    def request(self, client, method, path, payload):
+        if method == "post":
+            response = client.post(path, json.dumps(payload), content_type="application/json")
+        else:
+            response = client.get(path)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        if response.status_code != 200:
+            raise BenchmarkError(f"{path} : HTTP {response.status_code}")
+        return body
+
+    # --- Exécution ---
+
+    def selected(self, cases, only):
+        return [case for case in cases if not only or case[0] in only]
+
+    def run(self, only=None):
+        prepare_read = clear_caches if self.cache == "cold" else None
+
+        with override_settings(CKAN_BASE_URL=self.server.url):
+            # La page de détail lit les champs complémentaires sur le CKAN local
+            ckan_cache.reset_client()
+            try:
+                for name, call, prepare, iterations in self.selected(self.harvest_cases(), only):
+                    self.log(f"{name}...")
+                    self.results[name] = measure(
+                        call, prepare, iterations=iterations, warmup=0, trace_memory=self.trace_memory,
+                    )
+
+                if not Dataset.objects.exists():
+                    # Lectures seules (--only) : le catalogue est moissonné sans être mesuré
+                    self.harvest()
+                clear_caches()
+                client = self.client()
+                for name, method, path, payload in self.selected(self.read_cases(), only):
+                    self.log(f"{name}...")
+                    sizes = []
+
+                    def call(method=method, path=path, payload=payload):
+                        sizes.append(len(self.request(client, method, path(), payload)))
+
+                    result = measure(
+                        call, prepare_read, iterations=self.iterations, warmup=self.warmup,
+                        trace_memory=self.trace_memory,
+                    )
+                    result["response_bytes"] = max(sizes)
+                    self.results[name] = result
+            finally:
+                ckan_cache.reset_client()
+        return self.results
+
+    def metadata(self):
+        return {
+            "timestamp": timezone.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "sqlite": sqlite3.sqlite_version if connection.vendor == "sqlite" else None,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "datasets": self.catalog.datasets,
+            "resources_per_dataset": self.catalog.resources_per_dataset,
+            "resources": Resource.objects.count(),
+            "seed": self.catalog.seed,
+            "change_ratio": self.catalog.change_ratio,
+            "iterations": self.iterations,
+            "warmup": self.warmup,
+            "cache": self.cache,
+            "workers": self.workers,
+            "rows": self.rows,
+            "ckan_latency": self.server.latency,
+        }
+
+    def report(self):
+        return {"meta": self.metadata(), "results": self.results}
+
+
+def git_commit():
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def run_benchmarks(datasets=1000, resources_per_dataset=10, seed=0, change_ratio=0.01,
+                   ckan_latency=0.0, only=None, **options):
+    """Génère le catalogue, démarre le CKAN local et exécute la suite ; retourne le rapport."""
+    catalog = SyntheticCatalog(datasets, resources_per_dataset, seed=seed, change_ratio=change_ratio)
+    with FakeCkanServer(catalog, latency=ckan_latency, seed=seed) as server:
+        suite = BenchmarkSuite(catalog, server, **options)
+        suite.run(only)
+        return suite.report()
+
+
+@contextmanager
+def isolated_database(db_file=None):
+    """Base de test jetable (comme manage.py test) : la base de développement n'est jamais touchée.
+
+    Par défaut SQLite en mémoire ; `db_file` donne une base sur disque,
+    plus proche de la production.
+    """
+    if db_file:
+        connection.settings_dict["TEST"]["NAME"] = str(db_file)
+    # Comme le lanceur de tests : une réplique configurée devient un miroir de la base de test
+    old_config = setup_databases(verbosity=0, interactive=False, aliases=set(connections), serialized_aliases=set())
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+# Métriques comparées : (clé, sens favorable) ; +1 = plus haut est mieux
+COMPARED_METRICS = (
+    ("throughput", 1),
+    ("latency_ms.p50", -1),
+    ("latency_ms.p95", -1),
+    ("queries", -1),
+    ("peak_memory_bytes", -1),
+)
+
+
+def metric(result, key):
+    value = result
+    for part in key.split("."):
+        value = (value or {}).get(part)
+    return value
+
+
+def compare(previous, current, threshold=10.0):
+    """Compare deux rapports ; retourne les lignes (mesure, métrique, avant, après, écart %, régression).
+
+    Une régression est un écart défavorable de plus de `threshold` %. Les
+    requêtes SQL sont déterministes : toute requête en plus est une régression.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before_result = previous.get("results", {}).get(name)
+        if before_result is None:
+            continue
+        for key, direction in COMPARED_METRICS:
+            before, after = metric(before_result, key), metric(result, key)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            if key == "queries":
+                regression = after > before
+            else:
+                regression = change * direction < -threshold
+            rows.append((name, key, before, after, change, regression))
+    return rows
+
+
+def save_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def load_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
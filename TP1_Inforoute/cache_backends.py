@@ -0,0 +1,136 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Comme LocMemCache : un seul stockage par nom de cache, partagé entre les threads
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Store:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # clé -> (valeur picklée, expiration)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class LRUBytesCache(BaseCache):
+    """Cache mémoire local borné en octets, avec éviction LRU.
+
+    La taille de chaque entrée est celle de sa valeur picklée : la borne
+    porte sur la mémoire réellement occupée, pas sur un nombre d'entrées.
+    Compteurs hits/misses/évictions disponibles via stats().
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        max_bytes = int(params.get("OPTIONS", {}).get("MAX_BYTES", DEFAULT_MAX_BYTES))
+        with _stores_lock:
+            self._store = _stores.setdefault(name, _Store(max_bytes))
+
+    def _expired(self, entry):
+        return entry[1] is not None and entry[1] <= time.time()
+
+    def _remove(self, key):
+        value, _ = self._store.entries.pop(key)
+        self._store.size -= len(value)
+
+    def _lookup(self, key):
+        # Retourne l'entrée valide (et la marque comme récente), ou None
+        entry = self._store.entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            self._remove(key)
+            return None
+        self._store.entries.move_to_end(key)
+        return entry
+
+    def _set(self, key, pickled, timeout):
+        store = self._store
+        if key in store.entries:
+            self._remove(key)
+        if len(pickled) > store.max_bytes:
+            return
+        store.entries[key] = (pickled, self.get_backend_timeout(timeout))
+        store.size += len(pickled)
+        while store.size > store.max_bytes:
+            oldest = next(iter(store.entries))
+            self._remove(oldest)
+            store.evictions += 1
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            if self._lookup(key) is not None:
+                return False
+            self._set(key, pickled, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self._store.misses += 1
+                return default
+            self._store.hits += 1
+            pickled = entry[0]
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            self._set(key, pickled, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            entry = self._lookup(key)
+            if entry is None:
+                return False
+            self._store.entries[key] = (entry[0], self.get_backend_timeout(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            if key not in self._store.entries:
+                return False
+            self._remove(key)
+            return True
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            return self._lookup(key) is not None
+
+    def clear(self):
+        with self._store.lock:
+            self._store.entries.clear()
+            self._store.size = 0
+
+    def stats(self):
+        store = self._store
+        with store.lock:
+            lookups = store.hits + store.misses
+            return {
+                "hits": store.hits,
+                "misses": store.misses,
+                "hit_ratio": round(store.hits / lookups, 4) if lookups else None,
+                "evictions": store.evictions,
+                "entries": len(store.entries),
+                "bytes": store.size,
+                "max_bytes": store.max_bytes,
+            }
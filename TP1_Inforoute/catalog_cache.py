@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import HarvestState
+
+
+def catalog_generation():
+    # Version du catalogue : change seulement quand un moissonnage se termine
+    generation = (
+        HarvestState.objects
+        .filter(name=HarvestState.CATALOG)
+        .values_list("generation", flat=True)
+        .first()
+    )
+    return generation or 0
+
+
+def bump_generation():
+    updated = HarvestState.objects.filter(name=HarvestState.CATALOG).update(generation=F("generation") + 1)
+    if not updated:
+        # Aucun moissonnage encore : sans la ligne, une écriture par l'API laisserait la génération à 0
+        _, created = HarvestState.objects.get_or_create(name=HarvestState.CATALOG, defaults={"generation": 1})
+        if not created:
+            bump_generation()
+
+
+def params_digest(params):
+    # Clé indépendante de l'ordre des paramètres (?a=1&b=2 == ?b=2&a=1)
+    if hasattr(params, "lists"):
+        items = sorted((key, sorted(values)) for key, values in params.lists())
+    else:
+        items = sorted(params.items())
+    encoded = json.dumps(items, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def cached_for_generation(prefix, params, compute, generation=None):
+    """Retourne compute() mis en cache pour la version courante du catalogue.
+
+    Un nouveau moissonnage change la génération, donc la clé : pas
+    d'invalidation explicite à faire.
+    """
+    if generation is None:
+        generation = catalog_generation()
+    key = f"{prefix}:{generation}:{params_digest(params)}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
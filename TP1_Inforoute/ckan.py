@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+# Erreurs passagères : réessayées avec attente exponentielle (+ aléa), puis CkanError
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CkanError(Exception):
+    pass
+
+
+def make_retry(retries=None):
+    retries = settings.CKAN_RETRIES if retries is None else retries
+    return Retry(
+        total=retries,
+        backoff_factor=settings.CKAN_BACKOFF_FACTOR,
+        backoff_jitter=settings.CKAN_BACKOFF_JITTER,
+        backoff_max=settings.CKAN_BACKOFF_MAX,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # la dernière réponse en erreur est traitée par action()
+    )
+
+
+def make_session(pool_size=10, retries=None):
+    # Session keep-alive partagée : les connexions TCP/TLS sont réutilisées entre les pages
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=make_retry(retries))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = "TP1_Inforoute-harvester"
+    return session
+
+
+class CkanClient:
+    """Client minimal pour l'API d'actions CKAN (Données Québec)."""
+
+    def __init__(self, base_url=None, pool_size=10, timeout=None, session=None, retries=None):
+        self.base_url = (base_url or settings.CKAN_BASE_URL).rstrip("/")
+        self.timeout = timeout or settings.CKAN_TIMEOUT
+        self.session = session or make_session(pool_size, retries)
+
+    def action(self, name, **params):
+        try:
+            response = self.session.get(f"{self.base_url}/{name}", params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise CkanError(f"{name} : {e}") from e
+
+        if not response.ok:
+            raise CkanError(f"{name} : HTTP {response.status_code}")
+
+        try:
+            payload = response.json()
+        except ValueError as e:
+            raise CkanError(f"{name} : réponse invalide") from e
+        if not payload.get("success", True):
+            raise CkanError(f"{name} : {payload.get('error')}")
+        return payload.get("result")
+
+    def package_search(self, start=0, rows=100, **params):
+        return self.action("package_search", start=start, rows=rows, **params)
+
+    def package_show(self, ckan_id):
+        return self.action("package_show", id=ckan_id)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncCkanClient:
+    """Même API que CkanClient, pour les vues async (httpx).
+
+    Un seul pool de connexions borné, partagé par toutes les requêtes de la
+    boucle d'événements ; chaque appel a un délai total strict, en plus des
+    délais de connexion et d'attente du pool.
+    """
+
+    def __init__(self, base_url=None, timeout=None, max_connections=None):
+        self.base_url = (base_url or settings.CKAN_BASE_URL).rstrip("/")
+        self.timeout = timeout or settings.CKAN_TIMEOUT
+        max_connections = max_connections or settings.CKAN_ASYNC_MAX_CONNECTIONS
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=settings.CKAN_ASYNC_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=settings.CKAN_ASYNC_KEEPALIVE,
+            ),
+            headers={"User-Agent": "TP1_Inforoute-harvester"},
+        )
+
+    async def action(self, name, **params):
+        try:
+            # Délai total : un CKAN qui répond goutte à goutte ne retient pas la requête
+            response = await asyncio.wait_for(
+                self.client.get(f"{self.base_url}/{name}", params=params), self.timeout
+            )
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            raise CkanError(f"{name} : {str(e) or 'délai dépassé'}") from e
+
+        if not response.is_success:
+            raise CkanError(f"{name} : HTTP {response.status_code}")
+
+        try:
+            payload = response.json()
+        except ValueError as e:
+            raise CkanError(f"{name} : réponse invalide") from e
+        if not payload.get("success", True):
+            raise CkanError(f"{name} : {payload.get('error')}")
+        return payload.get("result")
+
+    async def package_show(self, ckan_id):
+        return await self.action("package_show", id=ckan_id)
+
+    async def close(self):
+        await self.client.aclose()
@@ -0,0 +1,119 @@
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .ckan import AsyncCkanClient, CkanError
+
+# Champs de package_show qui ne sont pas moissonnés dans la table Dataset
+EXTRA_FIELDS = ("temporal", "update_frequency")
+FAILURE_TTL = 60  # secondes avant de réessayer quand CKAN ne répond pas
+
+# Clients async : un par boucle d'événements (un seul sous ASGI) -> (client, durée de vie)
+_async_clients = weakref.WeakKeyDictionary()
+_loop = None
+_loop_lock = threading.Lock()
+# Rafraîchissements en cours (références gardées jusqu'à la fin de la tâche)
+_background_tasks = set()
+
+
+def _background_loop():
+    # Boucle dédiée aux rafraîchissements en arrière-plan, dans un thread démon : elle
+    # survit à la requête. Sous WSGI, la boucle de async_to_sync se ferme avec la vue
+    # et annulerait une tâche créée dessus.
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="ckan-extras", daemon=True).start()
+        return _loop
+
+
+async def _client_lifetime(client):
+    # Générateur jamais épuisé : la boucle le ferme (shutdown_asyncgens) quand elle s'arrête,
+    # ce qui ferme le pool. Sans serveur ASGI, chaque requête a sa propre boucle courte.
+    try:
+        yield client
+    finally:
+        await client.close()
+
+
+async def get_async_client():
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        lifetime = _client_lifetime(AsyncCkanClient(timeout=settings.CKAN_EXTRAS_TIMEOUT))
+        entry = (await anext(lifetime), lifetime)
+        _async_clients[loop] = entry
+    return entry[0]
+
+
+def reset_client():
+    # Oublie les clients partagés (ex. après un changement de CKAN_BASE_URL)
+    _async_clients.clear()
+
+
+def _cache_key(ckan_id):
+    return f"ckan:extras:{ckan_id}"
+
+
+def _extra_fields(result):
+    result = result or {}
+    return {field: result.get(field) for field in EXTRA_FIELDS if result.get(field)}
+
+
+async def arefresh_extra_fields(ckan_id):
+    key = _cache_key(ckan_id)
+    try:
+        values = _extra_fields(await (await get_async_client()).package_show(ckan_id))
+        fresh_until = time.time() + settings.CKAN_EXTRAS_TTL
+    except CkanError:
+        entry = await cache.aget(key)
+        values = entry[1] if entry else {}
+        fresh_until = time.time() + FAILURE_TTL
+
+    await cache.aset(key, (fresh_until, values), settings.CKAN_EXTRAS_TTL + settings.CKAN_EXTRAS_STALE_TTL)
+    return values
+
+
+async def _arefresh_in_background(ckan_id):
+    lock_key = f"{_cache_key(ckan_id)}:refresh"
+    if not await cache.aadd(lock_key, True, settings.CKAN_EXTRAS_TIMEOUT * 2):
+        return
+
+    async def run():
+        try:
+            await arefresh_extra_fields(ckan_id)
+        finally:
+            await cache.adelete(lock_key)
+
+    # Contexte vide : la tâche ne doit pas hériter de l'exécuteur async_to_sync de la requête
+    task = contextvars.Context().run(asyncio.run_coroutine_threadsafe, run(), _background_loop())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def aget_extra_fields(ckan_id):
+    """Retourne les champs CKAN non stockés localement (lecture via cache).
+
+    Une valeur fraîche est servie telle quelle ; une valeur périmée est servie
+    immédiatement puis rafraîchie en arrière-plan (stale-while-revalidate).
+    Un cache vide n'attend pas CKAN non plus (il peut être en panne) : la page
+    est rendue sans ces champs et le rafraîchissement les ajoute pour la suivante.
+    """
+    if not settings.CKAN_EXTRAS_CACHE_ENABLED:
+        return {}
+
+    entry = await cache.aget(_cache_key(ckan_id))
+    if entry is None:
+        await _arefresh_in_background(ckan_id)
+        return {}
+
+    fresh_until, values = entry
+    if time.time() >= fresh_until:
+        await _arefresh_in_background(ckan_id)
+    return values
@@ -0,0 +1,130 @@
+import hashlib
+import json
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Dataset, HarvestState, CatalogStats, Resource
+
+# Champs des ressources rendus dans le détail d'un dataset (ResourceSerializer)
+RESOURCE_VERSION_FIELDS = ("id", "name", "description", "format", "url", "resource_type")
+
+
+def _variant(request):
+    # Un même URL peut être rendu en JSON ou en API navigable : ETag distinct par Accept
+    accept = request.META.get("HTTP_ACCEPT", "")
+    return hashlib.sha1(accept.encode("utf-8")).hexdigest()[:8]
+
+
+def _memo(request, name, compute):
+    # etag_func et last_modified_func sont appelées séparément : une seule requête SQL
+    if not hasattr(request, name):
+        setattr(request, name, compute())
+    return getattr(request, name)
+
+
+async def _amemo(request, name, compute):
+    if not hasattr(request, name):
+        setattr(request, name, await compute())
+    return getattr(request, name)
+
+
+def _catalog_version_query():
+    return HarvestState.objects.filter(name=HarvestState.CATALOG).values_list("generation", "last_finished")
+
+
+def catalog_version(request):
+    return _memo(request, "_catalog_version", lambda: _catalog_version_query().first() or (0, None))
+
+
+async def acatalog_version(request, *args, **kwargs):
+    async def compute():
+        return await _catalog_version_query().afirst() or (0, None)
+    return await _amemo(request, "_catalog_version", compute)
+
+
+def catalog_etag(request, *args, **kwargs):
+    generation, _ = catalog_version(request)
+    return f'W/"catalog-{generation}-{_variant(request)}"'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return catalog_version(request)[1]
+
+
+def _dataset_version_query(pk):
+    content_hash = Dataset.objects.filter(pk=pk).values_list("content_hash", flat=True).first()
+    if not content_hash:
+        return None
+    # L'empreinte moissonnée ne voit pas les écritures de l'API sur les ressources
+    # (ResourceViewSet) : leur état courant entre dans la version
+    resources = Resource.objects.filter(dataset_id=pk).order_by("pk").values_list(*RESOURCE_VERSION_FIELDS)
+    payload = json.dumps([content_hash, list(resources)], default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def dataset_version(request, pk):
+    return _memo(request, "_dataset_version", lambda: _dataset_version_query(pk))
+
+
+def dataset_etag(request, pk=None, *args, **kwargs):
+    version = dataset_version(request, pk)
+    return f'W/"dataset-{version}-{_variant(request)}"' if version else None
+
+
+def _stats_computed_at_query():
+    return CatalogStats.objects.order_by("-computed_at").values_list("computed_at", flat=True)
+
+
+def stats_computed_at(request, *args, **kwargs):
+    return _memo(request, "_stats_computed_at", lambda: _stats_computed_at_query().first())
+
+
+async def astats_computed_at(request, *args, **kwargs):
+    return await _amemo(request, "_stats_computed_at", _stats_computed_at_query().afirst)
+
+
+def stats_etag(request, *args, **kwargs):
+    computed_at = stats_computed_at(request)
+    return f'W/"stats-{computed_at.timestamp()}-{_variant(request)}"' if computed_at else None
+
+
+def conditional(etag_func=None, last_modified_func=None, preload=None):
+    """condition() de Django, plus Cache-Control: no-cache.
+
+    Le validateur est vérifié avant d'exécuter la vue : un 304 ne coûte
+    qu'une petite requête SQL. no-cache oblige le navigateur à revalider
+    au lieu de servir une copie jugée « fraîche » par heuristique.
+
+    Pour une vue async, `preload` (coroutine) lit la version avec l'ORM async
+    et la mémorise sur la requête : condition() n'accède plus à la base.
+    """
+    def decorator(view):
+        checked = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def ainner(request, *args, **kwargs):
+                if preload:
+                    await preload(request, *args, **kwargs)
+                response = await checked(request, *args, **kwargs)
+                patch_cache_control(response, no_cache=True)
+                return response
+            return ainner
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            response = checked(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return inner
+    return decorator
+
+
+catalog_conditional = conditional(catalog_etag, catalog_last_modified, preload=acatalog_version)
+# Pas de Last-Modified : metadata_modified ne change pas quand une ressource est modifiée par l'API
+dataset_conditional = conditional(dataset_etag)
+stats_conditional = conditional(stats_etag, stats_computed_at, preload=astats_computed_at)
@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.urls import resolve, Resolver404
+
+# Alias des bases : écritures sur la primaire, lectures sur la réplique si elle est configurée
+PRIMARY = "default"
+REPLICA = "replica"
+# Modèles toujours lus sur la primaire : une réplique en retard casserait les verrous
+# et l'historique du planificateur
+PRIMARY_ONLY_MODELS = {"joblock", "jobrun"}
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_pinned = ContextVar("db_pinned_to_primary", default=False)
+
+
+def pinned_to_primary():
+    return _pinned.get()
+
+
+@contextmanager
+def use_primary():
+    """Envoie toutes les lectures du bloc sur la primaire (lire ce qu'on vient d'écrire).
+
+    Utilisé par le moissonnage et les tâches planifiées, et par le middleware
+    pour les requêtes qui écrivent.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def replica_reads(view):
+    # Vue en lecture seule malgré une méthode POST (ex. GraphQL sans mutation)
+    view.replica_reads = True
+    return view
+
+
+class PrimaryReplicaRouter:
+    """Routeur de DATABASE_ROUTERS : lectures sur la réplique, écritures sur la primaire.
+
+    Sans alias "replica" dans DATABASES, tout va sur la primaire. Les lectures
+    faites dans une transaction de la primaire y restent aussi.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            REPLICA not in connections.databases
+            or pinned_to_primary()
+            or model._meta.model_name in PRIMARY_ONLY_MODELS
+            # Dans une transaction d'écriture, on relit ce qu'on vient d'écrire
+            or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaire et réplique contiennent les mêmes données
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique est alimentée par la réplication, jamais migrée directement
+        return db == PRIMARY
+
+
+class PrimaryForWritesMiddleware:
+    """Les requêtes qui écrivent (POST, PUT, PATCH, DELETE) lisent aussi sur la primaire.
+
+    Synchrone sous WSGI, coroutine sous ASGI : les vues async ne passent pas par un thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in SAFE_METHODS or self.reads_only(request):
+            return self.get_response(request)
+        with use_primary():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method in SAFE_METHODS or self.reads_only(request):
+            return await self.get_response(request)
+        # La variable de contexte suit la requête dans les sync_to_async de la vue
+        with use_primary():
+            return await self.get_response(request)
+
+    def reads_only(self, request):
+        try:
+            view = resolve(request.path_info).func
+        except Resolver404:
+            return False
+        return getattr(view, "replica_reads", False)
@@ -0,0 +1,355 @@
+"""Détection des quasi-doublons (MinHash / LSH).
+
+Chaque dataset reçoit une signature MinHash de DEDUP_NUM_PERM valeurs sur les
+n-grammes de mots de son titre, de ses notes et de ses tags. La signature est
+découpée en DEDUP_BANDS bandes ; deux datasets qui partagent une bande tombent
+dans le même seau et deviennent candidats. Seuls les candidats sont comparés
+(similarité de Jaccard estimée >= DEDUP_THRESHOLD) : le coût est quasi linéaire
+au lieu de comparer toutes les paires.
+
+Les groupes (composantes connexes des paires similaires) sont identifiés par le
+plus petit ckan_id de leurs membres. Le moissonnage recalcule les signatures des
+datasets modifiés et les marque « à regrouper » ; update_clusters() ne recalcule
+ensuite que les groupes touchés.
+"""
+import hashlib
+import re
+import struct
+import unicodedata
+from functools import lru_cache
+from itertools import combinations, groupby
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Dataset, DatasetSignature, DedupBucket
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+BATCH_SIZE = 500
+
+
+class ClusterStats:
+    def __init__(self):
+        self.datasets = 0  # datasets regroupés (recalculés)
+        self.clusters = 0  # groupes de doublons parmi eux
+        self.comparisons = 0  # paires candidates comparées
+        self.full = False
+
+    def as_dict(self):
+        return {
+            "datasets": self.datasets, "clusters": self.clusters,
+            "comparisons": self.comparisons, "full": self.full,
+        }
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def words(text):
+    # Minuscules sans accents : « Québec » et « quebec » donnent le même mot
+    text = unicodedata.normalize("NFKD", text.lower())
+    return WORD_RE.findall("".join(c for c in text if not unicodedata.combining(c)))
+
+
+def shingles(dataset, size=None):
+    size = size or settings.DEDUP_SHINGLE_SIZE
+    tokens = words(" ".join([dataset.title or "", dataset.notes or "", *(dataset.tags or [])]))
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+@lru_cache(maxsize=None)
+def _probe(position, attempt, num_perm):
+    # Case voisine pseudo-aléatoire, la même pour tous les datasets (densification)
+    return _hash64(f"{position}:{attempt}") % num_perm
+
+
+def minhash(items, num_perm=None):
+    """Signature MinHash à une seule permutation (One Permutation Hashing).
+
+    Chaque n-gramme n'est haché qu'une fois : les bits de poids faible
+    choisissent la case, ceux de poids fort la valeur (minimum par case).
+    Les cases vides empruntent la valeur d'une autre case choisie par un
+    hachage commun à tous les documents (densification optimale, Shrivastava
+    2017) : la proportion de cases égales estime toujours la similarité de Jaccard.
+    """
+    num_perm = num_perm or settings.DEDUP_NUM_PERM
+    bins = [None] * num_perm
+    for item in items:
+        value = _hash64(item)
+        position, value = value % num_perm, value >> 32
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+    if all(value is None for value in bins):
+        return None
+
+    signature = list(bins)
+    for position, value in enumerate(bins):
+        attempt = 0
+        while value is None:
+            attempt += 1
+            value = bins[_probe(position, attempt, num_perm)]
+        signature[position] = value
+    return signature
+
+
+def pack(signature):
+    return struct.pack(f"<{len(signature)}I", *signature)
+
+
+def unpack(data):
+    data = bytes(data)
+    return struct.unpack(f"<{len(data) // 4}I", data)
+
+
+def band_keys(signature, bands=None):
+    bands = bands or settings.DEDUP_BANDS
+    rows = len(signature) // bands
+    for band in range(bands):
+        chunk = struct.pack(f"<{rows}I", *signature[band * rows:(band + 1) * rows])
+        # Entier signé 63 bits : tient dans un BigIntegerField
+        yield band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big") >> 1
+
+
+def similarity(first, second):
+    """Similarité de Jaccard estimée : proportion de valeurs égales des deux signatures."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def mark_cluster_mates(ckan_ids):
+    """Marque « à regrouper » les membres des groupes des datasets donnés.
+
+    Appelé avant de modifier ou de supprimer un dataset : son départ peut scinder son groupe.
+    """
+    for batch in _chunks(ckan_ids):
+        clusters = DatasetSignature.objects.filter(dataset_id__in=batch, cluster__isnull=False).values("cluster")
+        DatasetSignature.objects.filter(cluster__in=clusters).update(dirty=True)
+
+
+def index_datasets(datasets):
+    """Calcule les signatures et seaux LSH des datasets donnés ; appelé par le moissonnage à chaque page.
+
+    Les datasets dont le texte n'a pas changé (même signature) sont ignorés.
+    """
+    signatures = {}
+    for dataset in datasets:
+        signature = minhash(shingles(dataset))
+        signatures[dataset.ckan_id] = pack(signature) if signature else None
+
+    existing = {}
+    for batch in _chunks(signatures):
+        existing.update(
+            (ckan_id, bytes(data))
+            for ckan_id, data in DatasetSignature.objects.filter(dataset_id__in=batch).values_list("dataset_id", "minhash")
+        )
+    changed = [ckan_id for ckan_id, data in signatures.items() if existing.get(ckan_id) != data]
+    if not changed:
+        return 0
+
+    mark_cluster_mates(changed)
+    for batch in _chunks(changed):
+        DedupBucket.objects.filter(dataset_id__in=batch).delete()
+        # Plus de texte : plus de signature
+        DatasetSignature.objects.filter(dataset_id__in=[i for i in batch if signatures[i] is None]).delete()
+
+    changed = [ckan_id for ckan_id in changed if signatures[ckan_id] is not None]
+    DatasetSignature.objects.bulk_create(
+        [DatasetSignature(dataset_id=ckan_id, minhash=signatures[ckan_id], dirty=True) for ckan_id in changed],
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["dataset"],
+        update_fields=["minhash", "dirty"],
+    )
+    DedupBucket.objects.bulk_create(
+        [
+            DedupBucket(dataset_id=ckan_id, band=band, key=key)
+            for ckan_id in changed
+            for band, key in band_keys(unpack(signatures[ckan_id]))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return len(changed)
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = item
+        while self.parent.setdefault(root, root) != root:
+            root = self.parent[root]
+        # Compression du chemin : les recherches suivantes sont directes
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            # La plus petite racine gagne : c'est aussi l'identifiant du groupe
+            first, second = sorted((first, second))
+            self.parent[second] = first
+
+
+class _Signatures(dict):
+    # Signatures gardées sous forme compacte (octets), décodées au moment de comparer
+    def load(self, ckan_ids):
+        missing = [ckan_id for ckan_id in ckan_ids if ckan_id not in self]
+        for batch in _chunks(missing):
+            for ckan_id, data in DatasetSignature.objects.filter(dataset_id__in=batch).values_list("dataset_id", "minhash"):
+                self[ckan_id] = bytes(data)
+
+
+def _link(union_find, signatures, first, second, stats):
+    if union_find.find(first) == union_find.find(second):
+        return False
+    stats.comparisons += 1
+    if similarity(unpack(signatures[first]), unpack(signatures[second])) >= settings.DEDUP_THRESHOLD:
+        union_find.union(first, second)
+        return True
+    return False
+
+
+def _bucket_pairs(members):
+    # Seau géant (texte type partagé par des milliers de datasets) : comparaisons en chaîne, linéaires
+    if len(members) > settings.DEDUP_MAX_BUCKET:
+        return zip(members, members[1:])
+    return combinations(members, 2)
+
+
+def _full_components(stats):
+    # Un seul parcours des seaux triés par (bande, clé) : index dedup_bucket_idx
+    union_find = UnionFind()
+    signatures = _Signatures(
+        (ckan_id, bytes(data)) for ckan_id, data in DatasetSignature.objects.values_list("dataset_id", "minhash").iterator()
+    )
+    buckets = DedupBucket.objects.order_by("band", "key", "dataset").values_list("band", "key", "dataset_id")
+    for _, rows in groupby(buckets.iterator(chunk_size=10000), key=lambda row: row[:2]):
+        members = [row[2] for row in rows]
+        for first, second in _bucket_pairs(members):
+            _link(union_find, signatures, first, second, stats)
+    return union_find, set(signatures)
+
+
+def _neighbors(ckan_ids):
+    """Candidats LSH (datasets partageant un seau) de chaque dataset donné."""
+    keys = {}
+    for batch in _chunks(ckan_ids):
+        for ckan_id, band, key in DedupBucket.objects.filter(dataset_id__in=batch).values_list("dataset_id", "band", "key"):
+            keys.setdefault((band, key), []).append(ckan_id)
+
+    by_band = {}
+    for band, key in keys:
+        by_band.setdefault(band, []).append(key)
+
+    neighbors = {}
+    for band, band_key_list in by_band.items():
+        for batch in _chunks(band_key_list):
+            members = {}
+            for key, member in DedupBucket.objects.filter(band=band, key__in=batch).values_list("key", "dataset_id"):
+                members.setdefault(key, []).append(member)
+            for key, bucket in members.items():
+                for ckan_id in keys[(band, key)]:
+                    neighbors.setdefault(ckan_id, set()).update(bucket)
+    return neighbors
+
+
+def _local_components(seeds, stats):
+    # Parcours en largeur depuis les datasets à regrouper : seules leurs composantes sont visitées
+    union_find = UnionFind()
+    signatures = _Signatures()
+    visited = set(seeds)
+    frontier = set(seeds)
+    while frontier:
+        neighbors = _neighbors(frontier)
+        signatures.load(set(frontier).union(*neighbors.values()))
+        reached = set()
+        for ckan_id, candidates in neighbors.items():
+            for candidate in candidates:
+                if candidate != ckan_id and _link(union_find, signatures, ckan_id, candidate, stats):
+                    reached.add(candidate)
+        frontier = reached - visited
+        visited |= frontier
+    return union_find, visited
+
+
+def update_clusters(full=False):
+    """Recalcule les groupes des datasets « à regrouper » (tous avec full=True)."""
+    stats = ClusterStats()
+    dirty = list(DatasetSignature.objects.filter(dirty=True).values_list("dataset_id", flat=True))
+    if not dirty and not full:
+        return stats
+
+    total = DatasetSignature.objects.count()
+    stats.full = full or len(dirty) > total * settings.DEDUP_REBUILD_RATIO
+    if stats.full:
+        union_find, nodes = _full_components(stats)
+    else:
+        union_find, nodes = _local_components(dirty, stats)
+
+    roots = {node: union_find.find(node) for node in nodes}
+    sizes = {}
+    for root in roots.values():
+        sizes[root] = sizes.get(root, 0) + 1
+    assigned = [
+        DatasetSignature(dataset_id=node, cluster=root if sizes[root] > 1 else None, dirty=False)
+        for node, root in roots.items()
+    ]
+    stats.datasets = len(nodes)
+    stats.clusters = sum(1 for size in sizes.values() if size > 1)
+
+    with transaction.atomic():
+        if stats.full:
+            DatasetSignature.objects.exclude(cluster=None, dirty=False).update(cluster=None, dirty=False)
+            assigned = [signature for signature in assigned if signature.cluster]
+        DatasetSignature.objects.bulk_update(assigned, ["cluster", "dirty"], batch_size=BATCH_SIZE)
+    return stats
+
+
+def rebuild(log=None):
+    """Recalcule toutes les signatures (ex. après un changement de DEDUP_*), puis tous les groupes."""
+    DedupBucket.objects.all().delete()
+    DatasetSignature.objects.all().delete()
+    queryset = Dataset.objects.only("ckan_id", "title", "notes", "tags").order_by("ckan_id")
+    batch = []
+    done = 0
+    for dataset in queryset.iterator(chunk_size=BATCH_SIZE):
+        batch.append(dataset)
+        if len(batch) >= BATCH_SIZE:
+            with transaction.atomic():
+                index_datasets(batch)
+            done += len(batch)
+            batch = []
+            if log:
+                log(f"{done} signatures calculées")
+    if batch:
+        with transaction.atomic():
+            index_datasets(batch)
+    return update_clusters(full=True)
+
+
+def duplicates_of(ckan_id, limit=None):
+    """Autres membres du groupe d'un dataset, du plus similaire au moins similaire : [(ckan_id, similarité)]."""
+    own = DatasetSignature.objects.filter(dataset_id=ckan_id).values_list("cluster", "minhash").first()
+    if not own or not own[0]:
+        return []
+    signature = unpack(own[1])
+    members = (
+        DatasetSignature.objects.filter(cluster=own[0])
+        .exclude(dataset_id=ckan_id)
+        .values_list("dataset_id", "minhash")
+    )
+    ranked = sorted(
+        ((member, similarity(signature, unpack(data))) for member, data in members),
+        key=lambda item: (-item[1], item[0]),
+    )
+    return ranked[:limit] if limit else ranked
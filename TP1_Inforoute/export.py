@@ -0,0 +1,195 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+
+from .models import Resource
+
+CHUNK_SIZE = 500
+ASYNC_BATCH = 100  # morceaux lus par passage dans le thread de la base (ASGI)
+
+DATASET_EXPORT_FIELDS = [
+    "ckan_id", "name", "title", "notes", "author", "author_email",
+    "organization_id", "organization_title",
+    "license_id", "license_title", "license_url",
+    "metadata_created", "metadata_modified",
+    "state", "private", "tags", "groups",
+]
+RESOURCE_EXPORT_FIELDS = ["ckan_id", "name", "description", "format", "url", "resource_type"]
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def iter_records(queryset, chunk_size=CHUNK_SIZE):
+    """Parcourt le queryset par blocs (curseur côté serveur), ressources préchargées par bloc."""
+    resources = Prefetch(
+        "resources",
+        queryset=Resource.objects.only("dataset_id", *RESOURCE_EXPORT_FIELDS).order_by("id"),
+    )
+    datasets = queryset.only(*DATASET_EXPORT_FIELDS).prefetch_related(resources)
+    for dataset in datasets.iterator(chunk_size=chunk_size):
+        record = {field: getattr(dataset, field) for field in DATASET_EXPORT_FIELDS}
+        record["resources"] = [
+            {field: getattr(resource, field) for field in RESOURCE_EXPORT_FIELDS}
+            for resource in dataset.resources.all()
+        ]
+        yield record
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_ndjson(records):
+    for record in records:
+        record["metadata_created"] = _isoformat(record["metadata_created"])
+        record["metadata_modified"] = _isoformat(record["metadata_modified"])
+        yield json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class _Echo:
+    # Pseudo-fichier pour csv.writer : chaque ligne est retournée au lieu d'être écrite
+    def write(self, value):
+        return value
+
+
+CSV_COLUMNS = DATASET_EXPORT_FIELDS + [f"resource_{field}" for field in RESOURCE_EXPORT_FIELDS]
+
+
+def export_csv(records):
+    """Une ligne par ressource (colonnes du dataset répétées) ; tags et groupes séparés par « | »."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS).encode("utf-8")
+    for record in records:
+        row = [record[field] for field in DATASET_EXPORT_FIELDS]
+        row[DATASET_EXPORT_FIELDS.index("tags")] = "|".join(record["tags"] or [])
+        row[DATASET_EXPORT_FIELDS.index("groups")] = "|".join(record["groups"] or [])
+        for resource in record["resources"] or [{}]:
+            line = row + [resource.get(field) for field in RESOURCE_EXPORT_FIELDS]
+            yield writer.writerow(line).encode("utf-8")
+
+
+class _ChunkSink:
+    """Fichier en écriture seule qui accumule les octets jusqu'au prochain drain().
+
+    tell() compte tous les octets écrits : le pied de page Parquet garde des
+    positions correctes même si les blocs ont déjà été envoyés.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _batched(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parquet_schema(pa):
+    string = pa.string()
+    timestamp = pa.timestamp("us", tz="UTC")
+    fields = [(field, string) for field in DATASET_EXPORT_FIELDS]
+    types = dict(fields)
+    types.update({
+        "metadata_created": timestamp,
+        "metadata_modified": timestamp,
+        "private": pa.bool_(),
+        "tags": pa.list_(string),
+        "groups": pa.list_(string),
+    })
+    resource = pa.struct([(field, string) for field in RESOURCE_EXPORT_FIELDS])
+    return pa.schema(
+        [(field, types[field]) for field in DATASET_EXPORT_FIELDS] + [("resources", pa.list_(resource))]
+    )
+
+
+def export_parquet(records, chunk_size=CHUNK_SIZE):
+    """Un groupe de lignes Parquet par bloc : la mémoire reste bornée par chunk_size."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailable("L'export Parquet nécessite le paquet pyarrow.")
+
+    schema = parquet_schema(pa)
+
+    def generate():
+        sink = _ChunkSink()
+        with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd") as writer:
+            yield sink.drain()
+            for batch in _batched(records, chunk_size):
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                yield sink.drain()
+        yield sink.drain()
+
+    return generate()
+
+
+EXPORTERS = {
+    "ndjson": export_ndjson,
+    "csv": export_csv,
+    "parquet": export_parquet,
+}
+
+
+def export(queryset, export_format, chunk_size=CHUNK_SIZE):
+    """Retourne un itérateur d'octets (bytes) pour le format demandé."""
+    records = iter_records(queryset, chunk_size)
+    if export_format == "parquet":
+        # Un groupe de lignes par bloc lu : même borne mémoire que la lecture
+        return export_parquet(records, chunk_size)
+    return EXPORTERS[export_format](records)
+
+
+async def aiter_content(content, batch=ASYNC_BATCH):
+    """Itérateur async sur un itérateur d'octets, pour StreamingHttpResponse sous ASGI.
+
+    Django lirait entièrement un itérateur synchrone avant d'envoyer quoi que ce
+    soit. Les lectures (curseur de la base) restent dans un même thread et sont
+    regroupées par `batch` morceaux pour limiter les allers-retours.
+    """
+    content = iter(content)
+
+    def next_pieces():
+        return list(islice(content, batch))
+
+    while pieces := await sync_to_async(next_pieces, thread_sensitive=True)():
+        yield b"".join(pieces)
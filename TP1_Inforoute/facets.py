@@ -0,0 +1,57 @@
+from django.db.models import Count
+
+from .models import Dataset, Resource
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+
+def _dataset_facet(field):
+    # Colonne du dataset : GROUP BY direct sur la requête filtrée
+    def compute(queryset, limit):
+        return (
+            queryset.order_by()
+            .values_list(field)
+            .annotate(count=Count("pk"))
+            .order_by("-count", field)[:limit]
+        )
+    return compute
+
+
+def _format_facet(queryset, limit):
+    # Un dataset compte une fois par format, même s'il a plusieurs ressources de ce format
+    return (
+        Resource.objects
+        .filter(dataset__in=queryset.order_by().values("pk"))
+        .values_list("format")
+        .annotate(count=Count("dataset", distinct=True))
+        .order_by("-count", "format")[:limit]
+    )
+
+
+def _tag_facet(queryset, limit):
+    # Directement sur la table de liens (un lien par couple dataset/tag)
+    links = Dataset.tag_set.through.objects
+    return (
+        links.filter(dataset__in=queryset.order_by().values("pk"))
+        .values_list("tag__name")
+        .annotate(count=Count("dataset"))
+        .order_by("-count", "tag__name")[:limit]
+    )
+
+
+FACETS = {
+    "organization": _dataset_facet("organization_title"),
+    "license": _dataset_facet("license_title"),
+    "format": _format_facet,
+    "tag": _tag_facet,
+    "state": _dataset_facet("state"),
+}
+
+
+def compute_facets(queryset, names=None, limit=DEFAULT_LIMIT):
+    """Compte les datasets de `queryset` par valeur de chaque facette (une requête groupée par facette)."""
+    return {
+        name: [{"value": value, "count": count} for value, count in FACETS[name](queryset, limit)]
+        for name in (names or FACETS)
+    }
@@ -0,0 +1,115 @@
+import django_filters
+from django import forms
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django_filters.widgets import QueryArrayWidget
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+from . import search
+from .models import Dataset, Resource
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    # Même paramètre ?search= que SearchFilter, mais via l'index plein texte (classé par pertinence)
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "").strip()
+        if not text:
+            return queryset
+        return search.search(queryset, text)
+
+
+def resources_with_format(formats, queryset=None):
+    # Comparaison insensible à la casse sur UPPER(format) : servie par l'index resource_format_upper_idx
+    # (format__iexact devient un LIKE, qu'aucun index ne sert)
+    queryset = Resource.objects.all() if queryset is None else queryset
+    return queryset.alias(format_upper=Upper("format")).filter(format_upper__in=[f.upper() for f in formats])
+
+
+class MultipleValueField(forms.Field):
+    # Accepte ?tags=a&tags=b (ou tags=a,b)
+    widget = QueryArrayWidget
+
+    def to_python(self, value):
+        # QueryArrayWidget ne découpe pas les virgules : chaque valeur peut en contenir plusieurs
+        return [item.strip() for v in (value or []) for item in (v or "").split(",") if item.strip()]
+
+
+class MultipleValueFilter(django_filters.Filter):
+    field_class = MultipleValueField
+
+
+class DatasetFilter(django_filters.FilterSet):
+    organization = django_filters.CharFilter(method="filter_organization")
+    license = django_filters.CharFilter(method="filter_license")
+    state = django_filters.CharFilter(field_name="state")
+    private = django_filters.BooleanFilter(field_name="private")
+    tags = MultipleValueFilter(method="filter_tags")
+    tags_mode = django_filters.ChoiceFilter(
+        choices=[("all", "Tous les tags"), ("any", "Au moins un tag")],
+        method="filter_noop",
+    )
+    # "format" est réservé par DRF (?format=json) : même nom que l'API CKAN
+    res_format = MultipleValueFilter(method="filter_format")
+
+    class Meta:
+        model = Dataset
+        fields = ["organization", "license", "state", "private", "tags", "tags_mode", "res_format"]
+
+    def filter_noop(self, queryset, name, value):
+        # tags_mode est lu par filter_tags
+        return queryset
+
+    def filter_organization(self, queryset, name, value):
+        return queryset.filter(Q(organization_title=value) | Q(organization_id=value))
+
+    def filter_license(self, queryset, name, value):
+        return queryset.filter(Q(license_title=value) | Q(license_id=value))
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        # pk IN (liens du tag) : index du nom du tag, puis des liens, puis clé primaire du dataset
+        # (un EXISTS corrélé forcerait le parcours de tous les datasets)
+        links = Dataset.tag_set.through.objects
+        if self.form.cleaned_data.get("tags_mode") == "any":
+            return queryset.filter(pk__in=links.filter(tag__name__in=value).values("dataset_id"))
+        for tag in value:
+            queryset = queryset.filter(pk__in=links.filter(tag__name=tag).values("dataset_id"))
+        return queryset
+
+    def filter_format(self, queryset, name, value):
+        if not value:
+            return queryset
+        # Sous-requête IN plutôt qu'une jointure : pas de doublons, pas de .distinct()
+        return queryset.filter(pk__in=resources_with_format(value).values("dataset_id"))
+
+
+def filtered_datasets(params):
+    # Mêmes filtres et même ?search= que la liste des datasets
+    filterset = DatasetFilter(params, queryset=Dataset.objects.all())
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    text = params.get("search", "").strip()
+    if text:
+        return search.search(filterset.qs, text)
+    return filterset.qs.order_by("ckan_id")
+
+
+class ResourceFilter(django_filters.FilterSet):
+    res_format = django_filters.CharFilter(method="filter_format")
+    # ?broken=false écarte les liens brisés à la dernière vérification (check_links)
+    broken = django_filters.BooleanFilter(method="filter_broken")
+
+    class Meta:
+        model = Resource
+        fields = ["dataset", "res_format", "broken"]
+
+    def filter_format(self, queryset, name, value):
+        return resources_with_format([value], queryset)
+
+    def filter_broken(self, queryset, name, value):
+        if value:
+            return queryset.filter(link_status__ok=False)
+        # Les liens jamais vérifiés sont gardés
+        return queryset.exclude(link_status__ok=False)
@@ -0,0 +1,99 @@
+from django.conf import settings
+from graphene.validation import depth_limit_validator
+from graphql import GraphQLError, get_named_type, get_nullable_type, is_list_type
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode, IntValueNode
+from graphql.validation import ValidationRule, specified_rules
+
+
+def cost_limit_validator(max_cost):
+    """Refuse les requêtes dont le coût estimé dépasse max_cost.
+
+    Chaque champ coûte 1 ; les champs paginés (argument `first`) multiplient
+    le coût de leurs sous-champs par la taille de page demandée, les listes
+    simples (ex. resources d'un dataset) par GRAPHQL_LIST_FANOUT.
+    """
+
+    class CostLimitValidator(ValidationRule):
+        def enter_operation_definition(self, node, *args):
+            root = self.context.schema.get_root_type(node.operation)
+            cost = self.selection_cost(node.selection_set, root, set())
+            if cost > max_cost:
+                self.report_error(GraphQLError(
+                    f"Requête trop coûteuse : coût estimé {cost}, maximum {max_cost}.",
+                    node,
+                ))
+
+        def page_size(self, field):
+            for argument in field.arguments or ():
+                if argument.name.value == "first":
+                    if isinstance(argument.value, IntValueNode):
+                        return min(int(argument.value.value), settings.GRAPHQL_MAX_PAGE_SIZE)
+                    # Variable : on suppose le pire cas
+                    return settings.GRAPHQL_MAX_PAGE_SIZE
+            return None
+
+        def is_connection(self, field):
+            # Connexion Relay sans `first` : taille de page par défaut
+            selections = field.selection_set.selections if field.selection_set else ()
+            return any(isinstance(s, FieldNode) and s.name.value == "edges" for s in selections)
+
+        def definition(self, parent, field):
+            # Type parent inconnu (champ invalide, signalé par les règles standard) : aucune définition
+            return (getattr(parent, "fields", None) or {}).get(field.name.value)
+
+        def is_list(self, parent, field):
+            # Les edges d'une connexion sont déjà comptées par la taille de page
+            definition = self.definition(parent, field)
+            return (
+                definition is not None and is_list_type(get_nullable_type(definition.type))
+                and "pageInfo" not in parent.fields
+            )
+
+        def field_type(self, parent, field):
+            definition = self.definition(parent, field)
+            return get_named_type(definition.type) if definition else None
+
+        def condition_type(self, fragment, parent):
+            condition = fragment.type_condition
+            return self.context.schema.get_type(condition.name.value) if condition else parent
+
+        def selection_cost(self, selection_set, parent, visited):
+            if selection_set is None:
+                return 0
+            total = 0
+            for selection in selection_set.selections:
+                if isinstance(selection, FieldNode):
+                    if selection.name.value.startswith("__"):
+                        continue
+                    children = self.selection_cost(
+                        selection.selection_set, self.field_type(parent, selection), visited,
+                    )
+                    size = self.page_size(selection)
+                    if size is None and self.is_connection(selection):
+                        size = settings.GRAPHQL_PAGE_SIZE
+                    elif size is None and self.is_list(parent, selection):
+                        size = settings.GRAPHQL_LIST_FANOUT
+                    total += 1 + children * (size or 1)
+                elif isinstance(selection, InlineFragmentNode):
+                    total += self.selection_cost(
+                        selection.selection_set, self.condition_type(selection, parent), visited,
+                    )
+                elif isinstance(selection, FragmentSpreadNode):
+                    name = selection.name.value
+                    fragment = self.context.get_fragment(name)
+                    if fragment is not None and name not in visited:
+                        total += self.selection_cost(
+                            fragment.selection_set, self.condition_type(fragment, parent), visited | {name},
+                        )
+            return total
+
+    return CostLimitValidator
+
+
+def validation_rules():
+    # Règles standard de GraphQL + limites de profondeur et de coût
+    return (
+        *specified_rules,
+        depth_limit_validator(max_depth=settings.GRAPHQL_MAX_DEPTH),
+        cost_limit_validator(settings.GRAPHQL_MAX_COST),
+    )
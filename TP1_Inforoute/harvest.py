@@ -0,0 +1,402 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import dedup, search
+from .ckan import CkanClient, CkanError
+from .models import Dataset, Resource, HarvestState, Tag, Group
+from .stats import refresh_catalog_stats
+from .catalog_cache import bump_generation
+
+# Tri stable pour que les pages téléchargées en parallèle ne se chevauchent pas
+HARVEST_SORT = "metadata_created asc, id asc"
+INCREMENTAL_SORT = "metadata_modified asc, id asc"
+BULK_BATCH_SIZE = 500
+ID_PAGE_SIZE = 1000
+
+DATASET_FIELDS = [
+    "content_hash", "name", "title", "notes", "author", "author_email",
+    "organization_id", "organization_title",
+    "license_id", "license_title", "license_url",
+    "metadata_created", "metadata_modified",
+    "state", "private", "tags", "groups",
+]
+RESOURCE_FIELDS = ["dataset", "url", "name", "description", "format", "resource_type"]
+# Listes JSON du dataset -> relation normalisée correspondante
+LABEL_RELATIONS = [("tags", "tag_set", Tag), ("groups", "group_set", Group)]
+
+
+def parse_ckan_datetime(value):
+    # CKAN renvoie des dates UTC sans fuseau
+    parsed = parse_datetime(value or "")
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def solr_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def dataset_fields(data):
+    organization = data.get("organization") or {}
+    return {
+        "name": data.get("name"),
+        "title": data.get("title"),
+        "notes": data.get("notes"),
+        "author": data.get("author"),
+        "author_email": data.get("author_email"),
+        "organization_id": organization.get("id"),
+        "organization_title": organization.get("title"),
+        "license_id": data.get("license_id"),
+        "license_title": data.get("license_title"),
+        "license_url": data.get("license_url"),
+        "metadata_created": parse_ckan_datetime(data.get("metadata_created")),
+        "metadata_modified": parse_ckan_datetime(data.get("metadata_modified")),
+        "state": data.get("state"),
+        "private": data.get("private", False),
+        "tags": [t["display_name"] for t in data.get("tags", [])],
+        "groups": [g["display_name"] for g in data.get("groups", [])],
+    }
+
+
+def resource_fields(res):
+    return {
+        "url": res.get("url"),
+        "name": res.get("name"),
+        "description": res.get("description"),
+        "format": res.get("format"),
+        "resource_type": res.get("resource_type"),
+    }
+
+
+def content_hash(data):
+    # Empreinte des seuls champs stockés : un changement ailleurs dans CKAN ne force pas d'écriture
+    payload = dataset_fields(data)
+    payload["resources"] = [
+        dict(resource_fields(res), id=res.get("id")) for res in data.get("resources", [])
+    ]
+    encoded = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class HarvestStats:
+    def __init__(self):
+        self.pages = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.resources = 0
+
+    @property
+    def total(self):
+        return self.created + self.updated
+
+    def as_dict(self):
+        return dict(vars(self), total=self.total)
+
+
+def chunks(items, size=BULK_BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def sync_resources(by_id):
+    """Synchronise les ressources des datasets de la page par différence d'ensembles.
+
+    Les ressources sont identifiées par leur id CKAN : insertion, mise à jour
+    et suppression se font en lot. Retourne le nombre de ressources écrites.
+    """
+    incoming = {}
+    for ckan_id, data in by_id.items():
+        for res in data.get("resources", []):
+            if res.get("id"):
+                incoming[res["id"]] = (ckan_id, res)
+
+    # Ressources actuelles des datasets de la page, plus celles qui auraient changé de dataset
+    current = {r.pk: r for r in Resource.objects.filter(dataset_id__in=list(by_id))}
+    for ids in chunks(incoming):
+        current.update((r.pk, r) for r in Resource.objects.filter(ckan_id__in=ids))
+    by_ckan_id = {r.ckan_id: r for r in current.values() if r.ckan_id}
+
+    to_create, to_update = [], []
+    for res_id, (dataset_id, res) in incoming.items():
+        resource = by_ckan_id.get(res_id)
+        if resource is None:
+            to_create.append(Resource(ckan_id=res_id, dataset_id=dataset_id, **resource_fields(res)))
+            continue
+        resource.dataset_id = dataset_id
+        for field, value in resource_fields(res).items():
+            setattr(resource, field, value)
+        to_update.append(resource)
+
+    # Ressources retirées en amont (ou anciennes lignes sans id CKAN)
+    stale = [r.pk for r in current.values() if r.ckan_id not in incoming]
+    for pks in chunks(stale):
+        Resource.objects.filter(pk__in=pks).delete()
+
+    Resource.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    Resource.objects.bulk_update(to_update, RESOURCE_FIELDS, batch_size=BULK_BATCH_SIZE)
+    return len(to_create) + len(to_update)
+
+
+def sync_labels(datasets):
+    """Remplace en lot les liens tags/groupes des datasets donnés.
+
+    Les noms inconnus sont créés (ignore_conflicts), puis les liens sont
+    supprimés et réinsérés : seuls les datasets modifiés passent ici.
+    """
+    pks = [d.pk for d in datasets]
+    for attr, relation, model in LABEL_RELATIONS:
+        through = getattr(Dataset, relation).through
+        fk = f"{model._meta.model_name}_id"
+        names = {name for d in datasets for name in (getattr(d, attr) or []) if name}
+
+        model.objects.bulk_create(
+            [model(name=name) for name in names], batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+        )
+        ids = {}
+        for batch in chunks(names):
+            ids.update(model.objects.filter(name__in=batch).values_list("name", "id"))
+
+        for batch in chunks(pks):
+            through.objects.filter(dataset_id__in=batch).delete()
+        through.objects.bulk_create(
+            [
+                through(dataset_id=d.pk, **{fk: ids[name]})
+                for d in datasets
+                for name in set(getattr(d, attr) or []) if name
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+
+def write_page(datasets_list):
+    """Écrit une page CKAN en lot, dans une seule transaction.
+
+    Les datasets dont l'empreinte n'a pas changé sont ignorés.
+    Retourne (créés, mis à jour, inchangés, ressources écrites).
+    """
+    # Un même id peut apparaître deux fois si le catalogue bouge pendant le moissonnage
+    by_id = {data["id"]: data for data in datasets_list if data.get("id")}
+
+    with transaction.atomic():
+        existing = dict(Dataset.objects.filter(ckan_id__in=list(by_id)).values_list("ckan_id", "content_hash"))
+
+        to_create, to_update = [], []
+        unchanged = 0
+        for ckan_id, data in list(by_id.items()):
+            digest = content_hash(data)
+            if existing.get(ckan_id) == digest:
+                del by_id[ckan_id]
+                unchanged += 1
+                continue
+            dataset = Dataset(ckan_id=ckan_id, content_hash=digest, **dataset_fields(data))
+            (to_update if ckan_id in existing else to_create).append(dataset)
+
+        Dataset.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        Dataset.objects.bulk_update(to_update, DATASET_FIELDS, batch_size=BULK_BATCH_SIZE)
+        search.index_datasets(to_create + to_update)
+        sync_labels(to_create + to_update)
+        dedup.index_datasets(to_create + to_update)
+
+        res_written = sync_resources(by_id)
+
+    return len(to_create), len(to_update), unchanged, res_written
+
+
+class Harvester:
+    """Moissonne package_search en parallèle et écrit chaque page en lot.
+
+    Les pages sont téléchargées par un pool de threads partageant une session
+    keep-alive ; les écritures restent dans le thread principal (une
+    transaction par page). En mode incrémental, seuls les datasets modifiés
+    depuis le dernier moissonnage réussi sont demandés à CKAN.
+
+    Après chaque page écrite, un point de reprise est enregistré : avec
+    resume=True, un moissonnage interrompu repart de là au lieu de start=0.
+    """
+
+    def __init__(self, client=None, rows=None, workers=None, incremental=False, log=None):
+        self.rows = rows or settings.HARVEST_PAGE_SIZE
+        self.workers = max(1, workers or settings.HARVEST_WORKERS)
+        self.client = client or CkanClient(pool_size=self.workers)
+        self.log = log or (lambda message: None)
+        self.stats = HarvestStats()
+        self.state, _ = HarvestState.objects.get_or_create(name=HarvestState.CATALOG)
+        # Sans moissonnage réussi auparavant, l'incrémental est un moissonnage complet
+        self.incremental = bool(incremental and self.state.watermark)
+        self.since = self.state.watermark if self.incremental else None
+        self.start = 0
+        # Pages écrites mais pas encore contiguës au point de reprise : offset -> plus grand metadata_modified
+        self.pending_pages = {}
+
+    def search_params(self):
+        if self.incremental:
+            # Borne inclusive : les datasets à la limite sont revus mais ignorés grâce à l'empreinte
+            return {
+                "sort": INCREMENTAL_SORT,
+                "fq": f"metadata_modified:[{solr_datetime(self.since)} TO *]",
+            }
+        return {"sort": HARVEST_SORT}
+
+    def fetch_page(self, start):
+        return self.client.package_search(start=start, rows=self.rows, **self.search_params())
+
+    def handle_page(self, start, result):
+        datasets_list = result.get("results", [])
+        created, updated, unchanged, resources = write_page(datasets_list)
+        self.stats.pages += 1
+        self.stats.created += created
+        self.stats.updated += updated
+        self.stats.unchanged += unchanged
+        self.stats.resources += resources
+        self.save_checkpoint(start, datasets_list)
+        self.log(f"**Total moissonnés : {self.stats.total + self.stats.unchanged}")
+        return datasets_list
+
+    def resume_from(self, state):
+        """Reprend là où le moissonnage interrompu s'est arrêté (même mode, même requête)."""
+        self.incremental = state.checkpoint_incremental and bool(state.checkpoint_watermark or state.watermark)
+        if self.incremental:
+            # Tri par metadata_modified : on repart de la date atteinte plutôt que d'un offset,
+            # qui décalerait si des datasets déjà vus sont modifiés entre-temps
+            self.since = state.checkpoint_watermark or state.watermark
+            self.start = 0
+        else:
+            self.since = None
+            self.start = state.checkpoint_offset
+        self.log(f"Reprise du moissonnage ({'incrémental' if self.incremental else 'complet'}, offset {self.start})")
+
+    def save_checkpoint(self, start, datasets_list):
+        # Les pages se terminent dans le désordre : le point de reprise n'avance
+        # que sur la suite contiguë de pages écrites depuis self.start
+        dates = [parse_ckan_datetime(d.get("metadata_modified")) for d in datasets_list]
+        self.pending_pages[start] = max((d for d in dates if d), default=None)
+        advanced = False
+        while self.state.checkpoint_offset in self.pending_pages:
+            latest = self.pending_pages.pop(self.state.checkpoint_offset)
+            if latest and self.incremental:
+                self.state.checkpoint_watermark = latest
+            self.state.checkpoint_offset += self.rows
+            advanced = True
+        if advanced:
+            self.state.save(update_fields=["checkpoint_offset", "checkpoint_watermark"])
+
+    def clear_checkpoint(self):
+        self.state.checkpoint_offset = None
+        self.state.checkpoint_watermark = None
+
+    def map_pages(self, fetch, first, count, rows, handle):
+        # Télécharge les pages suivant la première en parallèle, avec une fenêtre
+        # bornée : la mémoire ne dépend pas de la taille du catalogue
+        offsets = iter(range(first + rows, count, rows))
+        max_pending = self.workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}
+
+            def drain(futures):
+                # Pages traitées dans l'ordre ; en cas d'échec, les autres pages déjà
+                # téléchargées sont quand même écrites (le point de reprise avance au maximum)
+                error = None
+                for future in sorted(futures, key=pending.get):
+                    start = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    handle(start, result)
+                return error
+
+            for start in offsets:
+                pending[executor.submit(fetch, start)] = start
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    error = drain(done)
+                    if error:
+                        drain(list(pending))
+                        raise error
+
+            error = drain(list(pending))
+            if error:
+                raise error
+
+    def run(self, resume=False):
+        if resume and self.state.checkpoint_offset is not None:
+            self.resume_from(self.state)
+        elif resume:
+            self.log("Aucun moissonnage interrompu : moissonnage normal.")
+
+        self.state.last_started = timezone.now()
+        self.state.checkpoint_offset = self.start
+        self.state.checkpoint_incremental = self.incremental
+        self.state.checkpoint_watermark = self.since
+        self.state.save(update_fields=[
+            "last_started", "checkpoint_offset", "checkpoint_incremental", "checkpoint_watermark",
+        ])
+
+        # La première page donne le nombre total de datasets à moissonner
+        first = self.fetch_page(self.start)
+        self.handle_page(self.start, first)
+        self.map_pages(self.fetch_page, self.start, first.get("count", 0), self.rows, self.handle_page)
+
+        self.stats.deleted = self.remove_deleted()
+
+        # Nouveau point de départ incrémental : seulement après un moissonnage complet
+        self.state.watermark = Dataset.objects.aggregate(latest=Max("metadata_modified"))["latest"]
+        self.state.last_finished = timezone.now()
+        self.clear_checkpoint()
+        self.state.save(update_fields=["watermark", "last_finished", "checkpoint_offset", "checkpoint_watermark"])
+
+        # Groupes de quasi-doublons : seuls ceux des datasets modifiés ou supprimés sont recalculés
+        dedup.update_clusters()
+        refresh_catalog_stats()
+        bump_generation()
+        return self.stats
+
+    def upstream_ids(self):
+        # Liste légère (fl=id) de tous les identifiants publiés sur CKAN
+        def fetch(start):
+            return self.client.package_search(start=start, rows=ID_PAGE_SIZE, fl="id", sort="id asc")
+
+        ids = set()
+
+        def collect(start, result):
+            ids.update(item["id"] for item in result.get("results", []))
+
+        first = fetch(0)
+        collect(0, first)
+        count = first.get("count", 0)
+        self.map_pages(fetch, 0, count, ID_PAGE_SIZE, collect)
+
+        if len(ids) != count:
+            # Le catalogue a bougé pendant la liste : on ne supprime rien plutôt que de supprimer à tort
+            raise CkanError(f"liste des identifiants incomplète ({len(ids)}/{count})")
+        return ids
+
+    def remove_deleted(self):
+        try:
+            upstream = self.upstream_ids()
+        except CkanError as e:
+            self.log(f"Détection des suppressions ignorée : {e}")
+            return 0
+
+        local = set(Dataset.objects.values_list("ckan_id", flat=True))
+        gone = local - upstream
+        for ids in chunks(gone):
+            with transaction.atomic():
+                dedup.mark_cluster_mates(ids)
+                Dataset.objects.filter(ckan_id__in=ids).delete()
+                search.remove_datasets(ids)
+        return len(gone)
@@ -0,0 +1,48 @@
+from django.conf import settings
+
+from . import related
+from .catalog_cache import bump_generation
+from .harvest import Harvester
+from .linkcheck import run_link_check
+from .models import HarvestState
+from .profiling import profile_resources
+from .scheduler import register
+
+HARVEST_JOB = "harvest"
+LINKCHECK_JOB = "linkcheck"
+PROFILE_JOB = "profiling"
+RELATED_JOB = "related"
+
+
+@register(HARVEST_JOB, interval=settings.HARVEST_INTERVAL)
+def harvest():
+    # Complet tant qu'aucun moissonnage n'a abouti (base vide), incrémental ensuite ;
+    # un moissonnage interrompu est repris à son point de reprise
+    state = HarvestState.objects.filter(name=HarvestState.CATALOG).first()
+    harvester = Harvester(incremental=bool(state and state.last_finished))
+    try:
+        return harvester.run(resume=True).as_dict()
+    finally:
+        harvester.client.close()
+
+
+@register(RELATED_JOB, after=HARVEST_JOB)
+def related_datasets():
+    # Les poids TF-IDF dépendent de tout le catalogue : recalculés après chaque moissonnage,
+    # hors du verrou du moissonnage
+    stats = related.rebuild()
+    # Les réponses de l'API (datasets similaires) sont en cache par génération
+    bump_generation()
+    return stats.as_dict()
+
+
+@register(LINKCHECK_JOB, interval=settings.LINKCHECK_INTERVAL)
+def linkcheck():
+    # Les liens vérifiés récemment (manuellement ou par un passage interrompu) sont sautés
+    return run_link_check(max_age=settings.LINKCHECK_MAX_AGE).as_dict()
+
+
+@register(PROFILE_JOB, interval=settings.PROFILE_INTERVAL)
+def profiling():
+    # Les fichiers inchangés (ETag / Last-Modified) répondent 304 et ne sont pas retraités
+    return profile_resources(max_age=settings.PROFILE_MAX_AGE).as_dict()
@@ -0,0 +1,286 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from itertools import chain, zip_longest
+from urllib.parse import urlsplit
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalog_cache import bump_generation
+from .models import Resource, ResourceLinkStatus
+
+# Serveurs qui refusent HEAD (ou le gèrent mal) : on retente en GET sans lire le corps
+HEAD_REFUSED = {400, 403, 405, 501}
+USER_AGENT = "TP2-Inforoute-linkcheck/1.0"
+RESULT_FIELDS = [
+    "url", "ok", "status_code", "error", "latency_ms", "content_length",
+    "content_type", "etag", "last_modified", "checked_at",
+]
+
+
+class LinkCheckStats:
+    def __init__(self):
+        self.checked = 0
+        self.ok = 0
+        self.broken = 0
+        self.not_modified = 0
+        self.changed = 0  # ressources dont l'état (ok / code) a changé
+
+    def add(self, result, previous, not_modified):
+        self.checked += 1
+        if result["ok"]:
+            self.ok += 1
+        else:
+            self.broken += 1
+        if not_modified:
+            self.not_modified += 1
+        if previous is None or (previous["ok"], previous["status_code"]) != (result["ok"], result["status_code"]):
+            self.changed += 1
+
+    def as_dict(self):
+        return {
+            "checked": self.checked, "ok": self.ok, "broken": self.broken,
+            "not_modified": self.not_modified, "changed": self.changed,
+        }
+
+
+class HostLimiter:
+    """Politesse par hôte : au plus `per_host` requêtes simultanées, espacées de `delay` secondes."""
+
+    def __init__(self, per_host, delay):
+        self.per_host = per_host
+        self.delay = delay
+        self.semaphores = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self.next_slot = {}
+
+    @asynccontextmanager
+    async def slot(self, host):
+        async with self.semaphores[host]:
+            # Réserve le prochain créneau avant d'attendre : pas de course entre tâches
+            now = asyncio.get_running_loop().time()
+            start = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = start + self.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+def _host(url):
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https"):
+        return None
+    return parts.hostname
+
+
+def interleave_hosts(items):
+    # Alterne les hôtes dans un lot : les ressources d'un même dataset sont souvent sur
+    # le même serveur et bloqueraient tous les workers derrière sa limite
+    by_host = defaultdict(list)
+    for item in items:
+        by_host[_host(item["url"])].append(item)
+    return [item for item in chain.from_iterable(zip_longest(*by_host.values())) if item is not None]
+
+
+def _previous(item):
+    if item["link_status__checked_at"] is None:
+        return None
+    return {
+        "url": item["link_status__url"],
+        "ok": item["link_status__ok"],
+        "status_code": item["link_status__status_code"],
+        "content_length": item["link_status__content_length"],
+        "content_type": item["link_status__content_type"],
+        "etag": item["link_status__etag"],
+        "last_modified": item["link_status__last_modified"],
+    }
+
+
+def _content_length(response):
+    try:
+        return int(response.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+
+async def check_one(client, limiter, item):
+    """Vérifie une URL : HEAD, puis GET (en-têtes seulement) si le serveur refuse HEAD."""
+    url = item["url"]
+    previous = _previous(item)
+    result = {
+        "resource_id": item["id"], "url": url, "ok": False, "status_code": None, "error": "",
+        "latency_ms": None, "content_length": None, "content_type": "", "etag": "", "last_modified": "",
+    }
+
+    host = _host(url)
+    if not host:
+        result["error"] = "URL non HTTP"
+        result["checked_at"] = timezone.now()
+        return result, previous, False
+
+    # Requête conditionnelle si on a déjà vu cette URL
+    headers = {}
+    if previous and previous["url"] == url:
+        if previous["etag"]:
+            headers["If-None-Match"] = previous["etag"]
+        if previous["last_modified"]:
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    async with limiter.slot(host):
+        started = time.perf_counter()
+        try:
+            response = await client.head(url, headers=headers)
+            if response.status_code in HEAD_REFUSED:
+                async with client.stream("GET", url, headers=headers) as response:
+                    pass  # fermé sans lire le corps
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            result["error"] = (str(e) or type(e).__name__)[:255]
+            response = None
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000)
+
+    result["checked_at"] = timezone.now()
+    if response is None:
+        return result, previous, False
+
+    not_modified = response.status_code == 304 and previous is not None
+    if not_modified:
+        # Inchangé : on garde ce que la vérification précédente avait relevé (code compris)
+        for field in ("ok", "status_code", "content_length", "content_type", "etag", "last_modified"):
+            result[field] = previous[field]
+    else:
+        result["status_code"] = response.status_code
+        result["ok"] = response.status_code < 400
+        result["content_length"] = _content_length(response)
+        result["content_type"] = response.headers.get("content-type", "").split(";")[0].strip()[:255]
+    result["etag"] = response.headers.get("etag", result["etag"])[:255]
+    result["last_modified"] = response.headers.get("last-modified", result["last_modified"])[:64]
+    return result, previous, not_modified
+
+
+def resources_to_check(max_age=None, queryset=None):
+    queryset = (queryset if queryset is not None else Resource.objects.all()).exclude(
+        Q(url__isnull=True) | Q(url="")
+    )
+    if max_age:
+        # Ne revérifie que les liens jamais vérifiés ou vérifiés il y a plus de max_age secondes
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+        queryset = queryset.filter(Q(link_status__isnull=True) | Q(link_status__checked_at__lt=cutoff))
+    return queryset
+
+
+async def _batches(queryset, batch_size):
+    # Pagination par clé (id) : mémoire bornée, pas d'OFFSET
+    columns = ["id", "url"] + [f"link_status__{field}" for field in RESULT_FIELDS]
+    last_id = 0
+    while True:
+        batch = [
+            row async for row in
+            queryset.filter(id__gt=last_id).order_by("id").values(*columns)[:batch_size]
+        ]
+        if not batch:
+            return
+        last_id = batch[-1]["id"]
+        yield batch
+
+
+def save_results(results):
+    # Une ressource supprimée entre-temps (moissonnage) n'a plus de statut à enregistrer
+    ids = [result["resource_id"] for result in results]
+    existing = set(Resource.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    ResourceLinkStatus.objects.bulk_create(
+        [ResourceLinkStatus(**result) for result in results if result["resource_id"] in existing],
+        update_conflicts=True,
+        unique_fields=["resource"],
+        update_fields=RESULT_FIELDS,
+    )
+
+
+def _first_error(errors):
+    while isinstance(errors, BaseExceptionGroup):
+        errors = errors.exceptions[0]
+    return errors
+
+
+async def check_links(queryset=None, max_age=None, concurrency=None, per_host=None,
+                      host_delay=None, timeout=None, batch_size=None, log=None, transport=None):
+    """Vérifie les liens des ressources avec un pool de `concurrency` tâches async.
+
+    Les ressources sont lues par lots, passent par des files bornées et les
+    résultats sont écrits par lots : la mémoire ne dépend pas de la taille du catalogue.
+    """
+    concurrency = concurrency or settings.LINKCHECK_CONCURRENCY
+    batch_size = batch_size or settings.LINKCHECK_BATCH_SIZE
+    timeout = timeout or settings.LINKCHECK_TIMEOUT
+    limiter = HostLimiter(
+        per_host or settings.LINKCHECK_PER_HOST,
+        settings.LINKCHECK_HOST_DELAY if host_delay is None else host_delay,
+    )
+    queryset = resources_to_check(max_age, queryset)
+    stats = LinkCheckStats()
+    items = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue(maxsize=batch_size)
+    save = sync_to_async(save_results)
+
+    async def produce():
+        async for batch in _batches(queryset, batch_size):
+            for item in interleave_hosts(batch):
+                await items.put(item)
+        for _ in range(concurrency):
+            await items.put(None)
+
+    async def work(client):
+        while (item := await items.get()) is not None:
+            await results.put(await check_one(client, limiter, item))
+
+    async def write():
+        pending = []
+        while (entry := await results.get()) is not None:
+            result, previous, not_modified = entry
+            stats.add(result, previous, not_modified)
+            pending.append(result)
+            if len(pending) >= batch_size:
+                await save(pending)
+                pending = []
+                if log:
+                    log(f"{stats.checked} liens vérifiés ({stats.broken} brisés)")
+        if pending:
+            await save(pending)
+
+    async with httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5)),
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        headers={"User-Agent": USER_AGENT},
+        transport=transport,
+    ) as client:
+        try:
+            # Première erreur (lecture, vérification ou écriture) : les autres tâches sont annulées aussitôt
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(write())
+                async with asyncio.TaskGroup() as workers:
+                    workers.create_task(produce())
+                    for _ in range(concurrency):
+                        workers.create_task(work(client))
+                await results.put(None)
+        except BaseExceptionGroup as errors:
+            # L'erreur d'origine plutôt que le groupe : message lisible dans l'historique des tâches
+            raise _first_error(errors) from None
+
+    if stats.checked:
+        # Les réponses de l'API (filtre broken, statut des liens) sont en cache par génération ;
+        # chaque statut écrit change au moins checked_at et la latence, servis par l'API
+        await sync_to_async(bump_generation)()
+    return stats
+
+
+def run_link_check(**options):
+    # async_to_sync : l'ORM (sync_to_async) tourne sur le thread appelant, dans sa transaction
+    return async_to_sync(check_links)(**options)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from TP1_Inforoute import related
+from TP1_Inforoute.catalog_cache import bump_generation
+from TP1_Inforoute.db_router import use_primary
+
+
+class Command(BaseCommand):
+    help = "Recalcule l'index des datasets similaires (TF-IDF, k plus proches voisins)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, help="Voisins enregistrés par dataset (défaut : RELATED_TOP_K).")
+        parser.add_argument("--batch-size", type=int, help="Datasets par lot (défaut : RELATED_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with use_primary():
+            stats = related.rebuild(
+                top_k=options["top_k"], batch_size=options["batch_size"], log=self.stdout.write,
+            )
+            # Les réponses de l'API (datasets similaires) sont en cache par génération
+            bump_generation()
+
+        self.stdout.write(
+            f"-- {stats.datasets} datasets, {stats.terms} termes, {stats.links} voisins "
+            f"en {time.perf_counter() - started:.1f} s"
+        )
+        self.stdout.write(self.style.SUCCESS("Index des datasets similaires recalculé."))
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from TP1_Inforoute.db_router import use_primary
+from TP1_Inforoute.jobs import LINKCHECK_JOB
+from TP1_Inforoute.linkcheck import run_link_check
+from TP1_Inforoute.models import Resource
+from TP1_Inforoute.scheduler import LockHeld, job_lock, record_run
+
+
+class Command(BaseCommand):
+    help = "Vérifie les liens des ressources (HEAD/GET) et enregistre leur état."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None,
+                            help="Requêtes simultanées (défaut : LINKCHECK_CONCURRENCY).")
+        parser.add_argument("--per-host", type=int, default=None,
+                            help="Requêtes simultanées par serveur (défaut : LINKCHECK_PER_HOST).")
+        parser.add_argument("--host-delay", type=float, default=None,
+                            help="Secondes entre deux requêtes vers un même serveur (défaut : LINKCHECK_HOST_DELAY).")
+        parser.add_argument("--timeout", type=float, default=None,
+                            help="Secondes par lien (défaut : LINKCHECK_TIMEOUT).")
+        parser.add_argument("--max-age", type=int, default=None,
+                            help="Ne revérifie que les liens vérifiés il y a plus de N secondes.")
+        parser.add_argument("--broken", action="store_true",
+                            help="Ne revérifie que les liens brisés à la dernière vérification.")
+        parser.add_argument("--dataset", metavar="CKAN_ID",
+                            help="Limite la vérification aux ressources d'un dataset.")
+
+    def handle(self, *args, **options):
+        queryset = Resource.objects.all()
+        if options["broken"]:
+            queryset = queryset.filter(link_status__ok=False)
+        if options["dataset"]:
+            queryset = queryset.filter(dataset__ckan_id=options["dataset"])
+
+        self.stdout.write("Vérification des liens des ressources...")
+        started = time.monotonic()
+        try:
+            # Même verrou que le planificateur : jamais deux vérifications en même temps
+            with use_primary(), job_lock(LINKCHECK_JOB), record_run(LINKCHECK_JOB) as run:
+                stats = run_link_check(
+                    queryset=queryset,
+                    max_age=options["max_age"],
+                    concurrency=options["concurrency"],
+                    per_host=options["per_host"],
+                    host_delay=options["host_delay"],
+                    timeout=options["timeout"],
+                    log=self.stdout.write,
+                )
+                run.details = stats.as_dict()
+        except LockHeld:
+            self.stdout.write(self.style.ERROR("Une vérification des liens est déjà en cours (verrou actif)."))
+            return
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"-- {stats.checked} liens vérifiés en {elapsed:.1f} s : {stats.ok} valides "
+            f"({stats.not_modified} inchangés), {stats.broken} brisés"
+        )
+        self.stdout.write(self.style.SUCCESS("Vérification terminée."))
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from TP1_Inforoute.export import export, ExportUnavailable, CONTENT_TYPES
+from TP1_Inforoute.filters import filtered_datasets
+from rest_framework.exceptions import ValidationError
+
+
+class Command(BaseCommand):
+    help = "Exporte le catalogue (datasets et ressources) en NDJSON, CSV ou Parquet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", dest="export_format", choices=list(CONTENT_TYPES), default="ndjson")
+        parser.add_argument("--output", "-o", help="Fichier de sortie (sortie standard par défaut)")
+        parser.add_argument(
+            "--filter", action="append", default=[], metavar="NOM=VALEUR",
+            help="Filtre de l'API (ex. organization=..., tags=eau, res_format=CSV, search=...) ; répétable",
+        )
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for item in options["filter"]:
+            name, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Filtre invalide : {item} (attendu NOM=VALEUR)")
+            params.appendlist(name, value)
+
+        try:
+            content = export(filtered_datasets(params), options["export_format"])
+        except ValidationError as e:
+            raise CommandError(e.detail)
+        except ExportUnavailable as e:
+            raise CommandError(str(e))
+
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in content:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"Export écrit dans {options['output']} ({written} octets)."))
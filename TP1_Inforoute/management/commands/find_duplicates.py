@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from TP1_Inforoute import dedup
+from TP1_Inforoute.catalog_cache import bump_generation
+from TP1_Inforoute.db_router import use_primary
+from TP1_Inforoute.models import Dataset, DatasetSignature
+
+
+class Command(BaseCommand):
+    help = "Regroupe les quasi-doublons (MinHash / LSH) et affiche les plus grands groupes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Recalcule toutes les signatures puis tous les groupes (après un changement de DEDUP_*).")
+        parser.add_argument("--full", action="store_true",
+                            help="Recalcule tous les groupes à partir des signatures existantes.")
+        parser.add_argument("--limit", type=int, default=10, help="Nombre de groupes affichés.")
+
+    def handle(self, *args, **options):
+        with use_primary():
+            if options["rebuild"]:
+                stats = dedup.rebuild(log=self.stdout.write)
+            else:
+                # Sans option : seulement les datasets marqués « à regrouper » (ex. moissonnage interrompu)
+                stats = dedup.update_clusters(full=options["full"])
+            if stats.datasets:
+                # Les réponses de l'API (groupes, doublons d'un dataset) sont en cache par génération
+                bump_generation()
+
+        self.stdout.write(
+            f"-- {stats.datasets} datasets regroupés ({'complet' if stats.full else 'local'}), "
+            f"{stats.clusters} groupes, {stats.comparisons} paires comparées"
+        )
+
+        clusters = (
+            DatasetSignature.objects.filter(cluster__isnull=False)
+            .values("cluster")
+            .annotate(size=Count("dataset"))
+            .order_by("-size", "cluster")[:options["limit"]]
+        )
+        for cluster in clusters:
+            titles = Dataset.objects.filter(signature__cluster=cluster["cluster"]).order_by("title").values_list("title", flat=True)
+            self.stdout.write(f"\n[{cluster['size']}] {cluster['cluster']}")
+            for title in titles[:5]:
+                self.stdout.write(f"    {title}")
+            if cluster["size"] > 5:
+                self.stdout.write(f"    ... et {cluster['size'] - 5} autres")
+        self.stdout.write(self.style.SUCCESS("Détection des doublons terminée."))
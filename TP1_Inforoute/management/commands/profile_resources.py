@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from TP1_Inforoute.db_router import use_primary
+from TP1_Inforoute.jobs import PROFILE_JOB
+from TP1_Inforoute.models import Resource
+from TP1_Inforoute.profiler import ProfilingUnavailable
+from TP1_Inforoute.profiling import profile_resources
+from TP1_Inforoute.scheduler import LockHeld, job_lock, record_run
+
+
+class Command(BaseCommand):
+    help = "Profile les ressources CSV / JSON / GeoJSON (lignes, colonnes, types, valeurs nulles, taille)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Processus du pool (défaut : PROFILE_WORKERS).")
+        parser.add_argument("--max-bytes", type=int, default=None,
+                            help="Octets lus au plus par fichier (défaut : PROFILE_MAX_BYTES).")
+        parser.add_argument("--timeout", type=float, default=None,
+                            help="Secondes sans données avant d'abandonner un fichier (défaut : PROFILE_TIMEOUT).")
+        parser.add_argument("--max-age", type=int, default=None,
+                            help="Ne recontacte que les ressources vues il y a plus de N secondes.")
+        parser.add_argument("--force", action="store_true",
+                            help="Retraite aussi les fichiers inchangés (ignore ETag / Last-Modified).")
+        parser.add_argument("--dataset", metavar="CKAN_ID",
+                            help="Limite le profilage aux ressources d'un dataset.")
+
+    def handle(self, *args, **options):
+        queryset = Resource.objects.all()
+        if options["dataset"]:
+            queryset = queryset.filter(dataset__ckan_id=options["dataset"])
+
+        self.stdout.write("Profilage des ressources...")
+        started = time.monotonic()
+        try:
+            # Même verrou que le planificateur : jamais deux profilages en même temps
+            with use_primary(), job_lock(PROFILE_JOB), record_run(PROFILE_JOB) as run:
+                stats = profile_resources(
+                    queryset=queryset,
+                    max_age=options["max_age"],
+                    workers=options["workers"],
+                    max_bytes=options["max_bytes"],
+                    timeout=options["timeout"],
+                    force=options["force"],
+                    log=self.stdout.write,
+                )
+                run.details = stats.as_dict()
+        except LockHeld:
+            self.stdout.write(self.style.ERROR("Un profilage est déjà en cours (verrou actif)."))
+            return
+        except ProfilingUnavailable as e:
+            raise CommandError(str(e))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"-- {stats.profiled} profilées ({stats.truncated} tronquées), {stats.not_modified} inchangées, "
+            f"{stats.errors} en erreur ({elapsed:.1f} s)"
+        )
+        self.stdout.write(self.style.SUCCESS("Profilage terminé."))
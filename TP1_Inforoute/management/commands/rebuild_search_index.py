@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from TP1_Inforoute import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index plein texte des jeux de données."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING("Index plein texte non disponible pour ce moteur de base de données."))
+            return
+        search.create_index()
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Index reconstruit : {count} jeux de données."))
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from TP1_Inforoute import benchmark
+
+
+def format_bytes(value):
+    if value is None:
+        return "-"
+    for unit in ("o", "Kio", "Mio"):
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} Gio"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesures de performance reproductibles : moissonnage d'un catalogue synthétique "
+        "servi par un CKAN local, puis API REST, GraphQL et pages HTML."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--datasets", type=int, default=1000,
+                            help="Taille du catalogue synthétique (ex. 100000).")
+        parser.add_argument("--resources-per-dataset", type=int, default=10,
+                            help="Nombre moyen de ressources par dataset.")
+        parser.add_argument("--seed", type=int, default=0, help="Graine : même graine, même catalogue.")
+        parser.add_argument("--change-ratio", type=float, default=0.01,
+                            help="Fraction des datasets modifiés avant le moissonnage incrémental.")
+        parser.add_argument("--iterations", type=int, default=20, help="Appels mesurés par vue.")
+        parser.add_argument("--warmup", type=int, default=2, help="Appels non mesurés avant chaque vue.")
+        parser.add_argument("--cache", choices=["cold", "warm"], default="cold",
+                            help="cold : caches vidés avant chaque appel ; warm : cache de réponses actif.")
+        parser.add_argument("--workers", type=int, default=None, help="Threads du moissonnage.")
+        parser.add_argument("--rows", type=int, default=None, help="Datasets par page CKAN.")
+        parser.add_argument("--ckan-latency", type=float, default=0.0,
+                            help="Délai (secondes) ajouté à chaque réponse du CKAN local.")
+        parser.add_argument("--only", action="append", default=[], metavar="NOM",
+                            help="Ne lance que cette mesure (répétable).")
+        parser.add_argument("--no-memory", action="store_true",
+                            help="Ne mesure pas le pic mémoire (tracemalloc double la durée).")
+        parser.add_argument("--db-file", help="Base SQLite de test sur disque (en mémoire par défaut).")
+        parser.add_argument("--output", "-o", help="Fichier JSON des résultats (défaut : benchmark-<date>.json).")
+        parser.add_argument("--compare", metavar="FICHIER", help="Résultats précédents à comparer.")
+        parser.add_argument("--max-regression", type=float, default=None, metavar="POURCENT",
+                            help="Échoue si une métrique se dégrade de plus de POURCENT par rapport à --compare.")
+
+    def handle(self, *args, **options):
+        previous = None
+        if options["compare"]:
+            try:
+                previous = benchmark.load_report(options["compare"])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Résultats précédents illisibles : {e}")
+
+        with benchmark.isolated_database(options["db_file"]):
+            try:
+                report = benchmark.run_benchmarks(
+                    datasets=options["datasets"],
+                    resources_per_dataset=options["resources_per_dataset"],
+                    seed=options["seed"],
+                    change_ratio=options["change_ratio"],
+                    ckan_latency=options["ckan_latency"],
+                    only=set(options["only"]),
+                    iterations=options["iterations"],
+                    warmup=options["warmup"],
+                    cache=options["cache"],
+                    workers=options["workers"],
+                    rows=options["rows"],
+                    trace_memory=not options["no_memory"],
+                    log=self.stdout.write,
+                )
+            except benchmark.BenchmarkError as e:
+                raise CommandError(str(e))
+
+        self.print_results(report)
+        output = options["output"] or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+        benchmark.save_report(report, output)
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {output}"))
+
+        if previous is not None:
+            threshold = options["max_regression"] if options["max_regression"] is not None else 10.0
+            regressions = self.print_comparison(benchmark.compare(previous, report, threshold))
+            if regressions and options["max_regression"] is not None:
+                raise CommandError(f"{regressions} régression(s) au-delà de {threshold:g} %.")
+
+    def print_results(self, report):
+        meta = report["meta"]
+        self.stdout.write(
+            f"\n{meta['datasets']} datasets, {meta['resources']} ressources "
+            f"(graine {meta['seed']}, cache {meta['cache']}, commit {meta['commit'] or '?'})"
+        )
+        self.stdout.write(
+            f"{'mesure':<28}{'débit/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'requêtes':>10}{'mémoire':>12}"
+        )
+        for name, result in report["results"].items():
+            latency = result["latency_ms"]
+            self.stdout.write(
+                f"{name:<28}{result['throughput'] or 0:>10.1f}{latency['p50']:>10.1f}"
+                f"{latency['p95']:>10.1f}{latency['p99']:>10.1f}{result['queries']:>10}"
+                f"{format_bytes(result['peak_memory_bytes']):>12}"
+            )
+
+    def print_comparison(self, rows):
+        self.stdout.write(f"\n{'mesure':<28}{'métrique':<20}{'avant':>14}{'après':>14}{'écart':>10}")
+        regressions = 0
+        for name, key, before, after, change, regression in rows:
+            line = f"{name:<28}{key:<20}{before:>14.1f}{after:>14.1f}{change:>+9.1f}%"
+            if regression:
+                regressions += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        return regressions
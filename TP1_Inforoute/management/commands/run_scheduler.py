@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from TP1_Inforoute import scheduler
+
+
+class Command(BaseCommand):
+    help = "Planificateur des tâches de fond (moissonnage périodique, etc.)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Exécute les tâches dues une seule fois puis s'arrête (ex. depuis cron).")
+        parser.add_argument("--poll", type=int, default=None,
+                            help="Secondes entre deux vérifications (défaut : SCHEDULER_POLL_INTERVAL).")
+        parser.add_argument("--status", action="store_true", help="Affiche l'état des tâches et s'arrête.")
+
+    def handle(self, *args, **options):
+        if options["status"]:
+            for job in scheduler.status():
+                last = job["last_run"]
+                state = "en cours" if job["running"] else (last["status"] if last else "jamais exécutée")
+                if job["next_run"] is not None:
+                    following = f"prochaine exécution {job['next_run']:%Y-%m-%d %H:%M}"
+                else:
+                    following = f"en attente de la tâche {job['after']}"
+                self.stdout.write(f"{job['name']} : {state}, {following}")
+            return
+
+        if options["once"]:
+            for job in scheduler.due_jobs():
+                self.stdout.write(f"Lancement de la tâche {job.name}")
+                run = scheduler.run_job(job)
+                if run is None:
+                    self.stdout.write(self.style.WARNING(f"Tâche {job.name} déjà en cours ailleurs."))
+                elif run.status == run.FAILED:
+                    self.stdout.write(self.style.ERROR(f"Tâche {job.name} échouée : {run.message}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"Tâche {job.name} terminée."))
+            return
+
+        self.stdout.write("Planificateur démarré (Ctrl+C pour arrêter).")
+        try:
+            scheduler.run_forever(poll=options["poll"], log=self.stdout.write)
+        except KeyboardInterrupt:
+            self.stdout.write("Planificateur arrêté.")
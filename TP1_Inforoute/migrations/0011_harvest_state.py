@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0010_profile_delete_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HarvestState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('last_started', models.DateTimeField(blank=True, null=True)),
+                ('last_finished', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+    ]
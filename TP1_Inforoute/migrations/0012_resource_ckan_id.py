@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:34
+
+from django.db import migrations, models
+
+
+def reset_content_hash(apps, schema_editor):
+    # Les ressources existantes n'ont pas d'identifiant CKAN : on force leur resynchronisation
+    Dataset = apps.get_model('TP1_Inforoute', 'Dataset')
+    Dataset.objects.using(schema_editor.connection.alias).update(content_hash=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0011_harvest_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='ckan_id',
+            field=models.CharField(blank=True, max_length=36, null=True, unique=True),
+        ),
+        migrations.RunPython(reset_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+import hashlib
+
+from django.db import migrations
+
+# SQL figé à l'état de cette migration (voir TP1_Inforoute.search) : une migration
+# ne doit pas changer si le module évolue
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS dataset_search USING fts5("
+    "ckan_id UNINDEXED, title, notes, organization_title, tags, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+INSERT_ROW = (
+    "INSERT INTO dataset_search (rowid, ckan_id, title, notes, organization_title, tags) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+DROP_INDEX = "DROP TABLE IF EXISTS dataset_search"
+
+
+def docid(ckan_id):
+    # rowid FTS stable dérivé de l'id CKAN
+    digest = hashlib.blake2b(ckan_id.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') >> 1
+
+
+def create_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor != 'sqlite':
+        return
+
+    Dataset = apps.get_model('TP1_Inforoute', 'Dataset')
+    rows = [
+        (
+            docid(d.ckan_id), d.ckan_id, d.title or '', d.notes or '',
+            d.organization_title or '', ' '.join(d.tags or []),
+        )
+        for d in Dataset.objects.using(conn.alias).iterator(chunk_size=500)
+    ]
+    with conn.cursor() as cursor:
+        cursor.execute(CREATE_INDEX)
+        cursor.executemany(INSERT_ROW, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0012_resource_ckan_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
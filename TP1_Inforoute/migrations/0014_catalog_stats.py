@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0013_dataset_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField()),
+                ('data', models.JSONField()),
+            ],
+        ),
+    ]
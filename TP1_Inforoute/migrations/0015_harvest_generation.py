@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0014_catalog_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='harveststate',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
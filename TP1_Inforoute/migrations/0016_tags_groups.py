@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:44
+
+from django.db import migrations, models
+
+
+def populate_labels(apps, schema_editor):
+    # Reprend les listes JSON existantes dans les nouvelles tables
+    Dataset = apps.get_model('TP1_Inforoute', 'Dataset')
+    db = schema_editor.connection.alias
+    for attr, relation in (('tags', 'tag_set'), ('groups', 'group_set')):
+        field = Dataset._meta.get_field(relation)
+        label_model, through = field.related_model, field.remote_field.through
+        rows = list(Dataset.objects.using(db).values_list('ckan_id', attr))
+        names = {name for _, values in rows for name in (values or []) if name}
+        label_model.objects.using(db).bulk_create([label_model(name=name) for name in names], batch_size=500)
+        ids = dict(label_model.objects.using(db).values_list('name', 'id'))
+        fk = f'{label_model._meta.model_name}_id'
+        through.objects.using(db).bulk_create(
+            [
+                through(dataset_id=ckan_id, **{fk: ids[name]})
+                for ckan_id, values in rows
+                for name in set(values or []) if name
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0015_harvest_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='group_set',
+            field=models.ManyToManyField(blank=True, related_name='datasets', to='TP1_Inforoute.group'),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='datasets', to='TP1_Inforoute.tag'),
+        ),
+        migrations.RunPython(populate_labels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0016_tags_groups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('owner', models.CharField(max_length=100)),
+                ('acquired_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('running', 'En cours'), ('success', 'Réussie'), ('failed', 'Échouée')], default='running', max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('message', models.TextField(blank=True)),
+                ('details', models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-started_at'], name='TP1_Inforou_job_39ffef_idx')],
+            },
+        ),
+    ]
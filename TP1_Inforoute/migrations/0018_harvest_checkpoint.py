@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0017_job_scheduler'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='harveststate',
+            name='checkpoint_incremental',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='harveststate',
+            name='checkpoint_offset',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='harveststate',
+            name='checkpoint_watermark',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:58
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0018_harvest_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['-metadata_modified', '-ckan_id'], name='dataset_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['metadata_created'], name='dataset_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['title'], name='dataset_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['organization_title'], name='dataset_org_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['organization_id'], name='dataset_org_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['license_title'], name='dataset_license_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['license_id'], name='dataset_license_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['state'], name='dataset_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['private', '-metadata_modified'], name='dataset_private_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(django.db.models.functions.text.Upper('format'), name='resource_format_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['format', 'dataset'], name='resource_format_dataset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['url'], name='resource_url_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0019_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceLinkStatus',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='link_status', serialize=False, to='TP1_Inforoute.resource')),
+                ('url', models.URLField()),
+                ('ok', models.BooleanField()),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('content_length', models.BigIntegerField(blank=True, null=True)),
+                ('content_type', models.CharField(blank=True, max_length=255)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('checked_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('ok', False)), fields=['resource'], name='link_status_broken_idx'), models.Index(fields=['checked_at'], name='link_status_checked_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0020_resource_link_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceProfile',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile', serialize=False, to='TP1_Inforoute.resource')),
+                ('url', models.URLField()),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('row_count', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('invalid_rows', models.PositiveIntegerField(default=0)),
+                ('columns', models.JSONField(default=list)),
+                ('byte_size', models.BigIntegerField(blank=True, null=True)),
+                ('truncated', models.BooleanField(default=False)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('profiled_at', models.DateTimeField()),
+                ('checked_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['checked_at'], name='profile_checked_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0021_resource_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetSignature',
+            fields=[
+                ('dataset', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='TP1_Inforoute.dataset')),
+                ('minhash', models.BinaryField()),
+                ('cluster', models.CharField(blank=True, max_length=36, null=True)),
+                ('dirty', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cluster'], name='signature_cluster_idx'), models.Index(condition=models.Q(('dirty', True)), fields=['dataset'], name='signature_dirty_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DedupBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('key', models.BigIntegerField()),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dedup_buckets', to='TP1_Inforoute.dataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'key', 'dataset'], name='dedup_bucket_idx')],
+            },
+        ),
+    ]
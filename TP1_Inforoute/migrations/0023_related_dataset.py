@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TP1_Inforoute', '0022_dataset_signatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedDataset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related', to='TP1_Inforoute.dataset')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='TP1_Inforoute.dataset')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dataset', 'rank'), name='related_dataset_rank_uniq')],
+            },
+        ),
+    ]
@@ -1,6 +1,19 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
 
+class Tag(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+class Group(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
 class Dataset(models.Model):
     # Identifiants
     ckan_id = models.CharField(max_length=36, primary_key=True)  # UUID CKAN
@@ -32,21 +45,200 @@ class Dataset(models.Model):
     # Tags et groupes stockés en JSON
     tags = models.JSONField(blank=True, null=True)
     groups = models.JSONField(blank=True, null=True)
+    # Mêmes tags et groupes en tables normalisées (filtres et facettes par index)
+    tag_set = models.ManyToManyField(Tag, related_name='datasets', blank=True)
+    group_set = models.ManyToManyField(Group, related_name='datasets', blank=True)
+
+    # Empreinte du contenu moissonné (évite de réécrire un dataset inchangé)
+    content_hash = models.CharField(max_length=40, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Tri par défaut des listes et pagination par curseur (-metadata_modified, -ckan_id)
+            models.Index(fields=["-metadata_modified", "-ckan_id"], name="dataset_modified_idx"),
+            models.Index(fields=["metadata_created"], name="dataset_created_idx"),
+            models.Index(fields=["title"], name="dataset_title_idx"),
+            # Filtres et facettes (organisation et licence acceptent le titre ou l'id)
+            models.Index(fields=["organization_title"], name="dataset_org_title_idx"),
+            models.Index(fields=["organization_id"], name="dataset_org_id_idx"),
+            models.Index(fields=["license_title"], name="dataset_license_title_idx"),
+            models.Index(fields=["license_id"], name="dataset_license_id_idx"),
+            models.Index(fields=["state"], name="dataset_state_idx"),
+            # private seul est peu sélectif : indexé avec le tri par défaut
+            models.Index(fields=["private", "-metadata_modified"], name="dataset_private_modified_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.name})"
     
 class Resource(models.Model):
     dataset = models.ForeignKey(Dataset, related_name='resources', on_delete=models.CASCADE)
+    ckan_id = models.CharField(max_length=36, unique=True, blank=True, null=True)  # UUID CKAN de la ressource
     name = models.CharField(max_length=200, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     format = models.CharField(max_length=50, blank=True, null=True)
     url = models.URLField(blank=True, null=True)
     resource_type = models.CharField(max_length=50, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Les filtres de format sont insensibles à la casse : index sur UPPER(format)
+            models.Index(Upper("format"), name="resource_format_upper_idx"),
+            # Facette des formats : GROUP BY format, COUNT(DISTINCT dataset) couvert par l'index
+            models.Index(fields=["format", "dataset"], name="resource_format_dataset_idx"),
+            models.Index(fields=["url"], name="resource_url_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.format})"
     
+class ResourceLinkStatus(models.Model):
+    # Dernière vérification du lien d'une ressource (manage.py check_links)
+    resource = models.OneToOneField(Resource, primary_key=True, related_name='link_status', on_delete=models.CASCADE)
+    url = models.URLField()  # URL vérifiée : si elle change, les validateurs ne valent plus
+    ok = models.BooleanField()
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)  # nul : erreur réseau
+    error = models.CharField(max_length=255, blank=True)
+    latency_ms = models.PositiveIntegerField(blank=True, null=True)
+    content_length = models.BigIntegerField(blank=True, null=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    # Validateurs renvoyés par le serveur : requête conditionnelle à la vérification suivante
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Filtre ?broken= : index partiel sur les seuls liens brisés (minoritaires)
+            models.Index(fields=["resource"], condition=models.Q(ok=False), name="link_status_broken_idx"),
+            models.Index(fields=["checked_at"], name="link_status_checked_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.url} ({self.status_code or self.error})"
+
+class ResourceProfile(models.Model):
+    # Profil d'une ressource CSV / JSON / GeoJSON (manage.py profile_resources)
+    resource = models.OneToOneField(Resource, primary_key=True, related_name='profile', on_delete=models.CASCADE)
+    url = models.URLField()  # URL profilée : si elle change, les validateurs ne valent plus
+    error = models.CharField(max_length=255, blank=True)  # vide : profil valide
+    row_count = models.PositiveBigIntegerField(blank=True, null=True)
+    invalid_rows = models.PositiveIntegerField(default=0)  # lignes CSV mal formées, ignorées
+    columns = models.JSONField(default=list)  # [{"name", "type", "null_ratio"}, ...]
+    byte_size = models.BigIntegerField(blank=True, null=True)
+    truncated = models.BooleanField(default=False)  # fichier plus gros que PROFILE_MAX_BYTES : début seulement
+    # Validateurs du fichier profilé : inchangés (304), il n'est pas retraité
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    duration_ms = models.PositiveIntegerField(blank=True, null=True)
+    profiled_at = models.DateTimeField()  # dernier calcul du profil
+    checked_at = models.DateTimeField()  # dernière requête (304 compris)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["checked_at"], name="profile_checked_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.url} ({self.row_count} lignes)"
+
+class DatasetSignature(models.Model):
+    # Signature MinHash du titre, des notes et des tags (détection des quasi-doublons, dedup.py)
+    dataset = models.OneToOneField(Dataset, primary_key=True, related_name='signature', on_delete=models.CASCADE)
+    minhash = models.BinaryField()  # DEDUP_NUM_PERM entiers 32 bits
+    cluster = models.CharField(max_length=36, blank=True, null=True)  # ckan_id du plus petit membre ; nul : pas de doublon
+    dirty = models.BooleanField(default=True)  # signature modifiée : groupe à recalculer
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cluster"], name="signature_cluster_idx"),
+            models.Index(fields=["dataset"], condition=models.Q(dirty=True), name="signature_dirty_idx"),
+        ]
+
+class DedupBucket(models.Model):
+    # Seau LSH : les datasets dont une bande de signature est identique sont candidats
+    dataset = models.ForeignKey(Dataset, related_name='dedup_buckets', on_delete=models.CASCADE)
+    band = models.PositiveSmallIntegerField()
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["band", "key", "dataset"], name="dedup_bucket_idx"),
+        ]
+
+class RelatedDataset(models.Model):
+    # Voisin précalculé d'un dataset (similarité cosinus TF-IDF, related.py), du rang 1 au rang RELATED_TOP_K
+    dataset = models.ForeignKey(Dataset, related_name='related', on_delete=models.CASCADE)
+    target = models.ForeignKey(Dataset, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Sert aussi d'index : les voisins d'un dataset se lisent dans l'ordre, sans tri
+            models.UniqueConstraint(fields=["dataset", "rank"], name="related_dataset_rank_uniq"),
+        ]
+
+class HarvestState(models.Model):
+    CATALOG = "catalog"
+
+    # Un enregistrement par type de moissonnage (ex. "catalog")
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(blank=True, null=True)  # plus grand metadata_modified moissonné
+    last_started = models.DateTimeField(blank=True, null=True)
+    last_finished = models.DateTimeField(blank=True, null=True)
+    # Incrémenté à chaque moissonnage terminé : sert de version du catalogue pour les caches
+    generation = models.PositiveIntegerField(default=0)
+    # Point de reprise du moissonnage en cours (nul une fois terminé)
+    checkpoint_offset = models.PositiveIntegerField(blank=True, null=True)  # pages écrites sans trou jusqu'ici
+    checkpoint_watermark = models.DateTimeField(blank=True, null=True)  # incrémental : date atteinte
+    checkpoint_incremental = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.name} ({self.watermark})"
+
+class CatalogStats(models.Model):
+    # Instantané des statistiques du catalogue, recalculé à la fin de chaque moissonnage
+    computed_at = models.DateTimeField()
+    data = models.JSONField()
+
+    def __str__(self):
+        return f"Statistiques du {self.computed_at}"
+
+class JobLock(models.Model):
+    # Verrou d'une tâche planifiée : une seule exécution à la fois, tous processus confondus.
+    # Le bail expire si le processus meurt sans le libérer.
+    name = models.CharField(max_length=50, unique=True)
+    owner = models.CharField(max_length=100)
+    acquired_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} ({self.owner})"
+
+class JobRun(models.Model):
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (RUNNING, "En cours"),
+        (SUCCESS, "Réussie"),
+        (FAILED, "Échouée"),
+    ]
+
+    job = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(blank=True, null=True)
+    message = models.TextField(blank=True)
+    details = models.JSONField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["job", "-started_at"])]
+
+    def __str__(self):
+        return f"{self.job} {self.started_at} ({self.status})"
+
 class Profile(models.Model):
     ROLE_CHOICES = [
         ("user", "Utilisateur"),
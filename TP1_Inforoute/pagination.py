@@ -0,0 +1,148 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
+
+
+class DatasetCursorPagination(CursorPagination):
+    """Pagination par clé (keyset) : le coût d'une page ne dépend pas de sa position.
+
+    Le curseur de DRF ne filtre que sur le premier champ du tri (les égalités
+    sont sautées par décalage, borné à offset_cutoff) et ne sait pas encoder
+    une date NULL. La position contient ici le champ trié et la clé primaire ;
+    les valeurs NULL viennent en dernier dans l'ordre décroissant (en premier
+    dans l'ordre croissant), comme le fait SQLite. Une page est lue par l'index
+    du tri, en deux requêtes au plus quand elle chevauche les valeurs NULL.
+    """
+    ordering = ("-metadata_modified", "-ckan_id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        ordering = self.get_ordering(request, queryset, view)[0]
+        self.field = queryset.model._meta.get_field(ordering.lstrip("-"))
+        self.descending = ordering.startswith("-")
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        self.position = self.decode_position(self.cursor.position) if self.cursor else None
+
+        # Une page de plus un élément : indique s'il en reste après celle-ci
+        limit = self.page_size + 1
+        results = []
+        for segment in self.segments(queryset, self.position, self.descending != reverse):
+            results.extend(segment[:limit - len(results)])
+            if len(results) == limit:
+                break
+
+        self.page = results[:self.page_size]
+        following = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+        self.has_next = self.position is not None if reverse else following
+        self.has_previous = following if reverse else self.position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def segments(self, queryset, position, descending):
+        """Requêtes successives des éléments qui suivent la position, dans le sens demandé."""
+        name = self.field.name
+        sign = "-" if descending else ""
+        after, after_or_equal = ("lt", "lte") if descending else ("gt", "gte")
+
+        values = queryset.order_by(f"{sign}{name}", f"{sign}pk")
+        nulls = queryset.filter(**{f"{name}__isnull": True}).order_by(f"{sign}pk") if self.field.null else None
+        if self.field.null:
+            values = values.filter(**{f"{name}__isnull": False})
+
+        if position is not None:
+            value, pk = position
+            if value is None:
+                nulls = nulls.filter(**{f"pk__{after}": pk})
+                values = None if descending else values
+            else:
+                # Borne sur le champ trié seul : la requête part de la position dans l'index
+                values = values.filter(
+                    Q(**{f"{name}__{after_or_equal}": value})
+                    & (Q(**{f"{name}__{after}": value}) | Q(**{f"pk__{after}": pk}))
+                )
+                nulls = nulls if descending else None
+
+        segments = [values, nulls] if descending else [nulls, values]
+        return [segment for segment in segments if segment is not None]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.encode_position(self.page[-1]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.encode_position(self.page[0]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def encode_position(self, instance):
+        if isinstance(instance, dict):
+            value, pk = instance[self.field.name], instance[self.field.model._meta.pk.name]
+        else:
+            value, pk = getattr(instance, self.field.attname), instance.pk
+        return json.dumps([None if value is None else str(value), str(pk)])
+
+    def decode_position(self, position):
+        if position is None:
+            return None
+        try:
+            value, pk = json.loads(position)
+            value = None if value is None else self.field.to_python(value)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None and not self.field.null:
+            # Position NULL sur un champ qui ne l'est jamais : curseur fabriqué
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+
+class SearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class DatasetPagination(DatasetCursorPagination):
+    """Curseur pour parcourir le catalogue ; numéros de page pour une recherche.
+
+    Les résultats d'une recherche sont triés par pertinence (score calculé),
+    ce qu'un curseur ne sait pas paginer.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.search_paginator = None
+        if request.query_params.get(api_settings.SEARCH_PARAM, "").strip():
+            self.search_paginator = SearchPagination()
+            return self.search_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.search_paginator is not None:
+            return self.search_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class ResourceCursorPagination(CursorPagination):
+    ordering = ("id",)
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
@@ -0,0 +1,437 @@
+"""Profil d'un fichier CSV / JSON / GeoJSON distant : lignes, colonnes, types, valeurs nulles.
+
+Module sans Django : profile_url() tourne dans les processus du pool (profiling.py).
+Le fichier est lu en flux, coupé à max_bytes, et analysé bloc par bloc.
+"""
+import codecs
+import csv
+import io
+import json
+import re
+import time
+
+import httpx
+
+CHUNK_SIZE = 64 * 1024
+CSV_BLOCK_SIZE = 1 << 20  # octets analysés à la fois par le lecteur CSV
+JSON_BATCH_SIZE = 1000  # enregistrements JSON par lot de statistiques
+CSV_DELIMITERS = ",;\t|"
+NULL_VALUES = ["", "NA", "N/A", "n/a", "null", "NULL", "None"]
+
+# Types reconnus dans les valeurs texte, du plus précis au plus général (un motif par type).
+# Une colonne prend le premier type dont le motif couvre toutes ses valeurs non nulles.
+TYPE_PATTERNS = [
+    ("integer", r"^[+-]?\d+$"),
+    ("number", r"^[+-]?(\d+([.,]\d*)?|[.,]\d+)([eE][+-]?\d+)?$"),
+    ("boolean", r"^(?i:true|false|vrai|faux|oui|non)$"),
+    ("date", r"^\d{4}-\d{2}-\d{2}$"),
+    ("datetime", r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?$"),
+    ("json", r"^[\[{]"),
+]
+USER_AGENT = "TP2-Inforoute-profiler/1.0"
+
+_client = None
+
+
+class ProfilingUnavailable(Exception):
+    pass
+
+
+def require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        raise ProfilingUnavailable("Le profilage des ressources nécessite le paquet pyarrow.")
+    return pa, pc, pa_csv
+
+
+def get_client(timeout):
+    # Un client par processus du pool : les connexions sont réutilisées d'une ressource à l'autre
+    global _client
+    if _client is None:
+        _client = httpx.Client(timeout=timeout, follow_redirects=True, headers={"User-Agent": USER_AGENT})
+    return _client
+
+
+class CappedStream(io.RawIOBase):
+    """Fichier en lecture sur les morceaux d'une réponse, coupé à max_bytes octets."""
+
+    def __init__(self, chunks, max_bytes, whole_lines=False):
+        self.chunks = iter(chunks)
+        self.max_bytes = max_bytes
+        self.whole_lines = whole_lines
+        self.bytes_read = 0
+        self.truncated = False
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def next_chunk(self):
+        if self.pending:
+            chunk, self.pending = self.pending, b""
+            return chunk
+        if self.truncated:
+            return b""
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            remaining = self.max_bytes - self.bytes_read
+            if len(chunk) > remaining:
+                # Plafond atteint : la suite n'est jamais téléchargée
+                chunk = chunk[:remaining]
+                if self.whole_lines:
+                    # Coupé après la dernière fin de ligne : pas de ligne CSV incomplète
+                    chunk = chunk[:chunk.rfind(b"\n") + 1]
+                self.truncated = True
+            self.bytes_read += len(chunk)
+            return chunk
+        return b""
+
+    def peek_chunk(self):
+        self.pending = self.next_chunk()
+        return self.pending
+
+    def readinto(self, buffer):
+        chunk = self.next_chunk()
+        size = min(len(buffer), len(chunk))
+        buffer[:size] = chunk[:size]
+        self.pending = chunk[size:]
+        return size
+
+
+class ColumnStats:
+    def __init__(self, name):
+        self.name = name
+        self.values = 0  # valeurs non nulles
+        self.matches = {name: 0 for name, _ in TYPE_PATTERNS}
+
+    def update(self, array, pa, pc):
+        if array.type != pa.string():
+            array = pc.cast(array, pa.string())
+        valid = len(array) - array.null_count
+        if not valid:
+            return
+        previous, self.values = self.values, self.values + valid
+        trimmed = pc.utf8_trim_whitespace(array)
+        for name, pattern in TYPE_PATTERNS:
+            # Un type déjà écarté par un lot précédent n'est plus testé
+            if self.matches[name] == previous:
+                self.matches[name] += pc.sum(pc.match_substring_regex(trimmed, pattern)).as_py() or 0
+
+    def inferred_type(self):
+        if not self.values:
+            return "empty"
+        for name, _ in TYPE_PATTERNS:
+            if self.matches[name] == self.values:
+                return name
+        return "string"
+
+    def as_dict(self, rows):
+        return {
+            "name": self.name,
+            "type": self.inferred_type(),
+            "null_ratio": round((rows - self.values) / rows, 4) if rows else None,
+        }
+
+
+class Profile:
+    def __init__(self):
+        self.rows = 0
+        self.invalid_rows = 0
+        self.columns = {}
+
+    def add(self, columns, rows, pa, pc):
+        # columns : {nom: tableau pyarrow} pour `rows` lignes
+        self.rows += rows
+        for name, array in columns.items():
+            if name not in self.columns:
+                self.columns[name] = ColumnStats(name)
+            self.columns[name].update(array, pa, pc)
+
+    def as_dict(self):
+        return {
+            "row_count": self.rows,
+            "invalid_rows": self.invalid_rows,
+            "columns": [column.as_dict(self.rows) for column in self.columns.values()],
+        }
+
+
+def sniff_csv(sample):
+    """Encodage, séparateur et noms de colonnes d'après le début du fichier."""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        # Fichiers gouvernementaux plus anciens : Windows-1252 (Excel)
+        encoding = "cp1252"
+    text = sample.decode(encoding, errors="replace")
+    # Dernière ligne probablement incomplète : écartée de l'échantillon
+    lines = text.splitlines()[:-1] or text.splitlines()
+    try:
+        delimiter = csv.Sniffer().sniff("\n".join(lines[:50]), delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ","
+    header = next(csv.reader(io.StringIO("\n".join(lines)), delimiter=delimiter), [])
+
+    names, seen = [], set()
+    for position, name in enumerate(header, start=1):
+        name = name.strip() or f"colonne_{position}"
+        unique, suffix = name, 2
+        while unique in seen:
+            unique, suffix = f"{name}_{suffix}", suffix + 1
+        seen.add(unique)
+        names.append(unique)
+    return encoding, delimiter, names
+
+
+def profile_csv(stream):
+    pa, pc, pa_csv = require_pyarrow()
+    sample = stream.peek_chunk()
+    if sample.startswith(codecs.BOM_UTF8):
+        stream.pending = sample = sample[len(codecs.BOM_UTF8):]
+    encoding, delimiter, names = sniff_csv(sample)
+    profile = Profile()
+    if not names:
+        return profile
+
+    def skip_invalid(row):
+        profile.invalid_rows += 1
+        return "skip"
+
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(
+            column_names=names, skip_rows=1, encoding=encoding, block_size=CSV_BLOCK_SIZE,
+        ),
+        parse_options=pa_csv.ParseOptions(
+            delimiter=delimiter, newlines_in_values=True, invalid_row_handler=skip_invalid,
+        ),
+        # Tout en texte : les types sont déduits ensuite sur l'ensemble du fichier, pas sur le premier bloc
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            null_values=NULL_VALUES, strings_can_be_null=True,
+            # Encodage deviné sur le premier morceau seulement : un accent Windows-1252 plus loin
+            # ne doit pas faire échouer le fichier (seuls les motifs ASCII des types comptent)
+            check_utf8=False,
+        ),
+    )
+    try:
+        for batch in reader:
+            profile.add(dict(zip(names, batch.columns)), batch.num_rows, pa, pc)
+    except pa.ArrowInvalid:
+        # Dernière ligne coupée par le plafond d'octets : on garde les lignes complètes
+        if not stream.truncated:
+            raise
+    return profile
+
+
+class JsonReader:
+    """Lit un document JSON par morceaux de texte, une valeur à la fois."""
+
+    WHITESPACE = re.compile(r"\s*")
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, min_size=1):
+        # Taille demandée doublée à chaque échec : un gros élément n'est pas réanalysé en O(n²)
+        added = []
+        size = 0
+        while size < min_size and not self.eof:
+            chunk = self.stream.next_chunk()
+            if not chunk:
+                self.eof = True
+                added.append(self.text_decoder.decode(b"", final=True))
+                break
+            text = self.text_decoder.decode(chunk)
+            added.append(text)
+            size += len(text)
+        self.text = self.text[self.pos:] + "".join(added)
+        self.pos = 0
+        return size > 0
+
+    def peek(self):
+        while True:
+            self.pos = self.WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return None
+
+    def peek_next(self):
+        # Premier caractère significatif après celui de peek(), sans rien consommer
+        self.peek()
+        while True:
+            end = self.WHITESPACE.match(self.text, self.pos + 1).end()
+            if end < len(self.text):
+                return self.text[end]
+            if not self.fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON invalide : « {char} » attendu")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(max(CHUNK_SIZE, len(self.text) - self.pos)):
+                    raise
+                continue
+            # Un nombre en fin de tampon peut être coupé (12|34) : on attend la suite
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_records(stream):
+    """Éléments du tableau d'enregistrements d'un document JSON, lus un par un.
+
+    Tableau au premier niveau ([...]) ou première clé dont la valeur est un
+    tableau d'objets ({"features": [...]} en GeoJSON) ; le reste est ignoré.
+    """
+    reader = JsonReader(stream)
+    first = reader.peek()
+    if first == "[":
+        reader.pos += 1
+    elif first == "{":
+        reader.pos += 1
+        while True:
+            if reader.peek() in ("}", None):
+                return
+            reader.value()  # clé
+            reader.expect(":")
+            if reader.peek() == "[" and reader.peek_next() in ("{", "]"):
+                reader.pos += 1
+                break
+            reader.value()  # autre valeur (ex. bbox, crs) : ignorée
+            if reader.peek() == ",":
+                reader.pos += 1
+    else:
+        raise ValueError("JSON sans tableau d'enregistrements")
+
+    while reader.peek() not in ("]", None):
+        yield reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _flatten(record):
+    if not isinstance(record, dict):
+        return {"value": record}
+    if record.get("type") == "Feature":
+        # GeoJSON : propriétés de l'entité et type de géométrie
+        row = dict(record.get("properties") or {})
+        row["geometry"] = (record.get("geometry") or {}).get("type")
+        return row
+    return record
+
+
+def profile_json(stream):
+    pa, pc, _ = require_pyarrow()
+    profile = Profile()
+
+    def add(batch):
+        columns = {}
+        for i, record in enumerate(batch):
+            for name, value in _flatten(record).items():
+                if name not in columns:
+                    columns[name] = [None] * len(batch)
+                columns[name][i] = _text(value)
+        profile.add(
+            {name: pa.array(values, type=pa.string()) for name, values in columns.items()}, len(batch), pa, pc,
+        )
+
+    batch = []
+    try:
+        for record in iter_json_records(stream):
+            batch.append(record)
+            if len(batch) >= JSON_BATCH_SIZE:
+                add(batch)
+                batch = []
+    except ValueError:
+        # Document coupé par le plafond d'octets : on garde les enregistrements complets
+        if not stream.truncated:
+            raise
+    if batch:
+        add(batch)
+    return profile
+
+
+PARSERS = {
+    "csv": profile_csv,
+    "json": profile_json,
+}
+
+
+def profile_url(url, kind, etag="", last_modified="", max_bytes=50 * 1024 * 1024, timeout=30):
+    """Télécharge (en flux, au plus max_bytes octets) et profile une ressource.
+
+    Retourne un dict ; status vaut "ok", "not_modified" (ETag / Last-Modified
+    inchangés : rien n'est relu) ou "error".
+    """
+    started = time.perf_counter()
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    result = {"status": "error", "error": "", "etag": "", "last_modified": ""}
+    try:
+        with get_client(timeout).stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return {"status": "not_modified"}
+            response.raise_for_status()
+            result["etag"] = response.headers.get("etag", "")[:255]
+            result["last_modified"] = response.headers.get("last-modified", "")[:64]
+            stream = CappedStream(response.iter_bytes(CHUNK_SIZE), max_bytes, whole_lines=kind == "csv")
+            profile = PARSERS[kind](stream)
+            try:
+                declared = int(response.headers["content-length"])
+            except (KeyError, ValueError):
+                declared = None
+    except httpx.HTTPStatusError as e:
+        result["error"] = f"HTTP {e.response.status_code}"
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        result["error"] = (str(e) or type(e).__name__)[:255]
+    except ProfilingUnavailable:
+        raise
+    except Exception as e:
+        # Fichier illisible (CSV mal formé, JSON invalide, encodage...) : erreur enregistrée
+        result["error"] = f"Analyse impossible : {e}"[:255]
+    else:
+        result.update(profile.as_dict())
+        result.update(
+            status="ok",
+            truncated=stream.truncated,
+            byte_size=stream.bytes_read,
+        )
+        if stream.truncated:
+            # Fichier lu en partie : taille annoncée par le serveur (inconnue si compressée)
+            result["byte_size"] = None if response.headers.get("content-encoding") else declared
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000)
+    return result
@@ -0,0 +1,153 @@
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .models import Resource, ResourceProfile
+from .profiler import profile_url, require_pyarrow
+
+# Formats profilés (format CKAN en majuscules) -> analyseur de profiler.PARSERS
+PROFILE_FORMATS = {"CSV": "csv", "JSON": "json", "GEOJSON": "json"}
+RESULT_FIELDS = [
+    "url", "error", "row_count", "invalid_rows", "columns", "byte_size", "truncated",
+    "etag", "last_modified", "duration_ms", "profiled_at", "checked_at",
+]
+
+
+class ProfilingStats:
+    def __init__(self):
+        self.profiled = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.truncated = 0
+
+    def as_dict(self):
+        return {
+            "profiled": self.profiled, "not_modified": self.not_modified,
+            "errors": self.errors, "truncated": self.truncated,
+        }
+
+
+def resources_to_profile(max_age=None, queryset=None):
+    queryset = (queryset if queryset is not None else Resource.objects.all()).annotate(
+        format_upper=Upper("format")
+    ).filter(format_upper__in=PROFILE_FORMATS).exclude(
+        Q(url__isnull=True) | Q(url="")
+    ).exclude(
+        # Lien brisé à la dernière vérification (check_links) : inutile de le télécharger
+        link_status__ok=False
+    )
+    if max_age:
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+        queryset = queryset.filter(Q(profile__isnull=True) | Q(profile__checked_at__lt=cutoff))
+    return queryset
+
+
+def _batches(queryset, batch_size):
+    # Pagination par clé (id) : mémoire bornée, pas d'OFFSET
+    last_id = 0
+    while True:
+        batch = list(
+            queryset.filter(id__gt=last_id).order_by("id").values(
+                "id", "url", "format_upper", "profile__url", "profile__etag", "profile__last_modified",
+            )[:batch_size]
+        )
+        if not batch:
+            return
+        last_id = batch[-1]["id"]
+        yield batch
+
+
+def save_results(results, now):
+    ids = [resource_id for resource_id, _, _ in results]
+    existing = set(Resource.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    unchanged = [resource_id for resource_id, _, result in results if result["status"] == "not_modified"]
+    ResourceProfile.objects.filter(pk__in=unchanged).update(checked_at=now)
+
+    profiles = []
+    for resource_id, url, result in results:
+        if result["status"] == "not_modified" or resource_id not in existing:
+            continue
+        profiles.append(ResourceProfile(
+            resource_id=resource_id,
+            url=url,
+            error=result["error"],
+            row_count=result.get("row_count"),
+            invalid_rows=result.get("invalid_rows", 0),
+            columns=result.get("columns", []),
+            byte_size=result.get("byte_size"),
+            truncated=result.get("truncated", False),
+            etag=result["etag"],
+            last_modified=result["last_modified"],
+            duration_ms=result["duration_ms"],
+            profiled_at=now,
+            checked_at=now,
+        ))
+    ResourceProfile.objects.bulk_create(
+        profiles, update_conflicts=True, unique_fields=["resource"], update_fields=RESULT_FIELDS,
+    )
+
+
+def profile_resources(queryset=None, max_age=None, workers=None, max_bytes=None, timeout=None,
+                      batch_size=None, force=False, log=None):
+    """Profile les ressources CSV / JSON / GeoJSON dans un pool de processus.
+
+    Au plus 2 × workers téléchargements sont en cours ; la base n'est lue et
+    écrite que par ce processus, par lots. Avec force=True, les fichiers
+    inchangés (ETag / Last-Modified) sont quand même retraités.
+    """
+    require_pyarrow()  # ProfilingUnavailable avant de lancer les processus
+    workers = workers or settings.PROFILE_WORKERS
+    batch_size = batch_size or settings.PROFILE_BATCH_SIZE
+    options = {
+        "max_bytes": max_bytes or settings.PROFILE_MAX_BYTES,
+        "timeout": timeout or settings.PROFILE_TIMEOUT,
+    }
+    stats = ProfilingStats()
+    pending = {}
+    results = []
+
+    def collect(done):
+        for future in done:
+            resource_id, url = pending.pop(future)
+            result = future.result()
+            if result["status"] == "not_modified":
+                stats.not_modified += 1
+            elif result["error"]:
+                stats.errors += 1
+            else:
+                stats.profiled += 1
+                stats.truncated += result["truncated"]
+            results.append((resource_id, url, result))
+        if len(results) >= batch_size:
+            save_results(results, timezone.now())
+            results.clear()
+            if log:
+                log(f"{stats.profiled + stats.not_modified + stats.errors} ressources traitées")
+
+    # spawn : les processus ne partagent ni les connexions à la base ni les threads du parent
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for batch in _batches(resources_to_profile(max_age, queryset), batch_size):
+            for item in batch:
+                known = not force and item["profile__url"] == item["url"]
+                future = pool.submit(
+                    profile_url,
+                    item["url"],
+                    PROFILE_FORMATS[item["format_upper"]],
+                    etag=item["profile__etag"] if known else "",
+                    last_modified=item["profile__last_modified"] if known else "",
+                    **options,
+                )
+                pending[future] = (item["id"], item["url"])
+                if len(pending) >= workers * 2:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        while pending:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+
+    if results:
+        save_results(results, timezone.now())
+    return stats
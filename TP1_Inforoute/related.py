@@ -0,0 +1,186 @@
+"""Index des datasets similaires (TF-IDF creux, k plus proches voisins).
+
+Chaque dataset est une ligne d'une matrice TF-IDF creuse (scipy.sparse) sur
+les mots de son titre, de ses notes et de ses tags, normalisée (similarité
+cosinus = produit scalaire). Les RELATED_TOP_K voisins de chaque dataset sont
+calculés hors ligne par blocs de lignes : le produit X[bloc] @ X.T donne les
+scores du bloc contre tout le catalogue, et argpartition les k meilleurs.
+Le résultat est stocké dans RelatedDataset : l'affichage est une seule
+lecture par index.
+
+Pour borner le coût sur un grand catalogue, les termes présents dans plus de
+RELATED_MAX_DF du catalogue (mots vides) ou dans un seul dataset sont ignorés,
+chaque ligne ne garde que ses RELATED_MAX_TERMS termes les plus lourds et
+chaque colonne de X.T ses RELATED_MAX_POSTINGS datasets les plus lourds : le
+coût par dataset est borné et le recalcul croît linéairement avec le catalogue.
+"""
+from array import array
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .dedup import words
+from .models import Dataset, RelatedDataset
+
+# Poids de chaque champ dans la fréquence des termes
+FIELD_WEIGHTS = (("title", 3), ("notes", 1), ("tags", 2))
+BATCH_SIZE = 500
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class RelatedStats:
+    def __init__(self):
+        self.datasets = 0
+        self.terms = 0  # termes retenus (ni trop rares ni trop fréquents)
+        self.links = 0  # paires (dataset, voisin) enregistrées
+
+    def as_dict(self):
+        return {"datasets": self.datasets, "terms": self.terms, "links": self.links}
+
+
+def term_counts(dataset):
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        value = getattr(dataset, field)
+        text = " ".join(value) if isinstance(value, list) else value
+        for word in words(text or ""):
+            if len(word) > 1:
+                counts[word] += weight
+    return counts
+
+
+def keep_largest(matrix, k):
+    """Garde les k plus grandes valeurs de chaque ligne d'une matrice creuse (CSR)."""
+    matrix = sparse.csr_matrix(matrix)
+    counts = np.diff(matrix.indptr)
+    if not matrix.nnz or counts.max() <= k:
+        return matrix
+    rows = np.repeat(np.arange(matrix.shape[0]), counts)
+    # Tri par ligne puis par valeur décroissante : le rang dans la ligne sélectionne les k premières
+    order = np.lexsort((-matrix.data, rows))
+    rank = np.arange(matrix.nnz) - matrix.indptr[rows[order]]
+    keep = order[rank < k]
+    return sparse.csr_matrix((matrix.data[keep], (rows[keep], matrix.indices[keep])), shape=matrix.shape)
+
+
+class TfidfMatrix:
+    """Matrice TF-IDF creuse (une ligne par dataset) et sa transposée tronquée (listes inversées)."""
+
+    def __init__(self, ids, matrix, max_postings=None):
+        self.ids = ids
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        # Listes tronquées aux datasets où le terme pèse le plus : sans cela, le coût
+        # du produit croît comme le carré du catalogue pour les termes moyennement fréquents
+        max_postings = max_postings or settings.RELATED_MAX_POSTINGS
+        self.postings = keep_largest(self.matrix.T, max_postings)
+
+    @property
+    def terms(self):
+        return self.matrix.shape[1]
+
+    @classmethod
+    def build(cls, datasets, max_df=None, max_terms=None, max_postings=None):
+        """Fréquences des termes par dataset, puis pondération TF-IDF et normalisation sur la matrice."""
+        max_df = settings.RELATED_MAX_DF if max_df is None else max_df
+        max_terms = max_terms or settings.RELATED_MAX_TERMS
+
+        vocabulary = {}
+        ids, rows, terms, counts = [], array("I"), array("I"), array("f")
+        for row, dataset in enumerate(datasets):
+            for word, count in term_counts(dataset).items():
+                rows.append(row)
+                terms.append(vocabulary.setdefault(word, len(vocabulary)))
+                counts.append(count)
+            ids.append(dataset.ckan_id)
+        shape = (len(ids), len(vocabulary))
+        del vocabulary
+        rows, terms = np.asarray(rows, dtype=np.int64), np.asarray(terms, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.float64)
+
+        total = len(ids)
+        df = np.bincount(terms, minlength=shape[1])
+        # Seuil minimal de 2 : sur un petit catalogue, un terme partagé par deux datasets reste utile
+        limit = max(2, max_df * total)
+        idf = np.where((df > 1) & (df <= limit), np.log((1 + total) / (1 + df)) + 1, 0.0)
+
+        matrix = sparse.csr_matrix(((1 + np.log(counts)) * idf[terms], (rows, terms)), shape=shape)
+        matrix.eliminate_zeros()
+        # Norme sur tous les termes retenus, avant de ne garder que les plus lourds
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        matrix = sparse.diags(1 / norms) @ keep_largest(matrix, max_terms)
+
+        # Renumérote les termes retenus : les listes inversées ne contiennent que ceux-là
+        matrix = sparse.csr_matrix(matrix)[:, np.unique(matrix.indices)]
+        return cls(ids, matrix, max_postings)
+
+    def neighbors(self, start, stop, k, min_score=0.0):
+        """Produit des lignes [start, stop) par la matrice transposée ; les k meilleurs voisins de chaque ligne."""
+        scores = sparse.csr_matrix(self.matrix[start:stop] @ self.postings)
+        for offset, row in enumerate(range(start, stop)):
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            others, values = scores.indices[begin:end], scores.data[begin:end]
+            keep = (others != row) & (values >= min_score)
+            others, values = others[keep], values[keep]
+            if len(values) > k:
+                best = np.argpartition(-values, k)[:k]
+                others, values = others[best], values[best]
+            # Score décroissant, puis rang dans le catalogue : ordre stable entre deux calculs
+            order = np.lexsort((others, -values))
+            yield row, [(int(others[i]), float(values[i])) for i in order]
+
+
+def rebuild(top_k=None, min_score=None, batch_size=None, log=None):
+    """Recalcule l'index des datasets similaires de tout le catalogue.
+
+    Les voisins d'un lot remplacent les anciens dans une transaction : l'index
+    reste lisible pendant le calcul.
+    """
+    top_k = top_k or settings.RELATED_TOP_K
+    min_score = settings.RELATED_MIN_SCORE if min_score is None else min_score
+    batch_size = batch_size or settings.RELATED_BATCH_SIZE
+    stats = RelatedStats()
+
+    datasets = Dataset.objects.only("ckan_id", "title", "notes", "tags").order_by("ckan_id")
+    matrix = TfidfMatrix.build(datasets.iterator(chunk_size=BATCH_SIZE))
+    ids = matrix.ids
+    stats.datasets = len(ids)
+    stats.terms = matrix.terms
+
+    for start in range(0, len(ids), batch_size):
+        stop = min(start + batch_size, len(ids))
+        links = [
+            RelatedDataset(dataset_id=ids[row], target_id=ids[other], rank=rank, score=round(score, 4))
+            for row, best in matrix.neighbors(start, stop, top_k, min_score)
+            for rank, (other, score) in enumerate(best, start=1)
+        ]
+        # Un dataset supprimé pendant le calcul n'a plus de voisins, ni de place parmi ceux des autres
+        linked = set(ids[start:stop]) | {link.target_id for link in links}
+        with transaction.atomic():
+            existing = set()
+            for chunk in _chunks(linked):
+                existing.update(Dataset.objects.filter(ckan_id__in=chunk).values_list("ckan_id", flat=True))
+            links = [link for link in links if link.dataset_id in existing and link.target_id in existing]
+            RelatedDataset.objects.filter(dataset_id__in=ids[start:stop]).delete()
+            RelatedDataset.objects.bulk_create(links, batch_size=BATCH_SIZE)
+        stats.links += len(links)
+        if log:
+            log(f"{stop} / {len(ids)} datasets traités")
+    return stats
+
+
+def neighbors(ckan_id):
+    """Voisins précalculés d'un dataset, par rang : une lecture par l'index (dataset, rank)."""
+    return (
+        RelatedDataset.objects.filter(dataset_id=ckan_id)
+        .order_by("rank")
+        .values("target_id", "target__title", "target__organization_title", "score")
+    )
@@ -0,0 +1,117 @@
+import hashlib
+import json
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .catalog_cache import params_digest
+from .conditional import catalog_version, acatalog_version
+
+# En-têtes rejoués avec la réponse mise en cache (jamais les cookies)
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Vary", "Allow")
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def request_key(prefix, request, generation):
+    # Paramètres normalisés (ordre indifférent) + Accept + corps des POST GraphQL
+    parts = {
+        "path": request.path,
+        "query": params_digest(request.GET),
+        "accept": request.META.get("HTTP_ACCEPT", ""),
+    }
+    if request.method == "POST":
+        parts["body"] = hashlib.sha1(request.body).hexdigest()
+    return f"response:{prefix}:{generation}:{params_digest(parts)}"
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming
+
+
+def graphql_succeeded(response):
+    # Erreur d'exécution (résolveur en échec, argument refusé) : statut 200 avec "errors", à ne pas figer
+    return b'"errors"' not in response.content or "errors" not in json.loads(response.content)
+
+
+def _freeze(response):
+    if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+        response.render()
+    headers = [(name, response[name]) for name in CACHED_HEADERS if response.has_header(name)]
+    return response.content, headers
+
+
+def _thaw(request, frozen):
+    content, headers = frozen
+    response = HttpResponse(content)
+    for name, value in headers:
+        response[name] = value
+    # Les validateurs de la réponse mise en cache restent vérifiés (304)
+    last_modified = parse_http_date_safe(response.get("Last-Modified", ""))
+    return get_conditional_response(
+        request, etag=response.get("ETag"), last_modified=last_modified, response=response
+    )
+
+
+def cache_response(prefix, methods=("GET", "HEAD"), cacheable=None):
+    """Met en cache la réponse complète de la vue pour la génération courante du catalogue.
+
+    Un moissonnage terminé change la génération, donc toutes les clés :
+    les anciennes entrées ne sont plus lues et sortent par LRU.
+    Accepte aussi les vues async (cache et version lus sans bloquer).
+    `cacheable(response)` écarte en plus des réponses 200 à ne pas garder.
+    """
+    def should_cache(response):
+        return _cacheable(response) and (cacheable is None or cacheable(response))
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def ainner(request, *args, **kwargs):
+                if request.method not in methods:
+                    return await view(request, *args, **kwargs)
+                cache = response_cache()
+                generation, _ = await acatalog_version(request)
+                key = request_key(prefix, request, generation)
+                frozen = await cache.aget(key)
+                if frozen is not None:
+                    response = _thaw(request, frozen)
+                    response["X-Cache"] = "HIT"
+                    return response
+
+                response = await view(request, *args, **kwargs)
+                if should_cache(response):
+                    await cache.aset(key, _freeze(response), settings.CATALOG_CACHE_TIMEOUT)
+                response["X-Cache"] = "MISS"
+                return response
+            return ainner
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in methods:
+                return view(request, *args, **kwargs)
+            cache = response_cache()
+            # Même lecture que les validateurs ETag de la vue (mémorisée sur la requête)
+            generation, _ = catalog_version(request)
+            key = request_key(prefix, request, generation)
+            frozen = cache.get(key)
+            if frozen is not None:
+                response = _thaw(request, frozen)
+                response["X-Cache"] = "HIT"
+                return response
+
+            response = view(request, *args, **kwargs)
+            if should_cache(response):
+                cache.set(key, _freeze(response), settings.CATALOG_CACHE_TIMEOUT)
+            response["X-Cache"] = "MISS"
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,217 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import IntegrityError, DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .db_router import use_primary
+from .models import JobLock, JobRun
+
+logger = logging.getLogger(__name__)
+
+JOBS = {}
+
+
+class LockHeld(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name, func, interval, lock_ttl=None, after=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.lock_ttl = lock_ttl or settings.JOB_LOCK_TTL
+        self.after = after
+
+
+def register(name, interval=None, lock_ttl=None, after=None):
+    """Déclare une tâche de fond (décorateur), exécutée par run_scheduler.
+
+    Toutes les `interval` secondes, ou après chaque exécution réussie de la tâche `after`.
+    """
+    def decorator(func):
+        JOBS[name] = Job(name, func, interval, lock_ttl, after)
+        return func
+    return decorator
+
+
+def registered_jobs():
+    # Les tâches sont déclarées dans jobs.py
+    import_module("TP1_Inforoute.jobs")
+    return JOBS
+
+
+def lock_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lock(name, owner, ttl):
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    # Reprend un verrou expiré (processus mort) ; sinon tente de le créer
+    taken = JobLock.objects.filter(name=name, expires_at__lte=now).update(
+        owner=owner, acquired_at=now, expires_at=expires_at
+    )
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            JobLock.objects.create(name=name, owner=owner, acquired_at=now, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        return False
+
+
+def renew_lock(name, owner, ttl):
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    return bool(JobLock.objects.filter(name=name, owner=owner).update(expires_at=expires_at))
+
+
+def release_lock(name, owner):
+    JobLock.objects.filter(name=name, owner=owner).delete()
+
+
+class _Heartbeat(threading.Thread):
+    # Renouvelle le bail pendant toute la durée de la tâche
+    def __init__(self, name, owner, ttl):
+        super().__init__(name=f"lock-{name}", daemon=True)
+        self.lock_name = name
+        self.owner = owner
+        self.ttl = ttl
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.ttl / 3):
+                try:
+                    renew_lock(self.lock_name, self.owner, self.ttl)
+                except DatabaseError as e:
+                    logger.warning("Renouvellement du verrou %s impossible : %s", self.lock_name, e)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+@contextmanager
+def job_lock(name, ttl=None):
+    """Verrou exclusif en base : lève LockHeld si la tâche tourne déjà ailleurs."""
+    ttl = ttl or settings.JOB_LOCK_TTL
+    owner = lock_owner()
+    if not acquire_lock(name, owner, ttl):
+        raise LockHeld(name)
+    heartbeat = _Heartbeat(name, owner, ttl)
+    heartbeat.start()
+    try:
+        yield owner
+    finally:
+        heartbeat.stop()
+        release_lock(name, owner)
+
+
+@contextmanager
+def record_run(name):
+    """Historique d'exécution (JobRun) ; le bloc peut renseigner run.details."""
+    run = JobRun.objects.create(job=name, started_at=timezone.now())
+    try:
+        yield run
+    except BaseException as e:
+        run.status = JobRun.FAILED
+        run.message = str(e) or e.__class__.__name__
+        raise
+    else:
+        run.status = JobRun.SUCCESS
+    finally:
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "message", "details", "finished_at"])
+
+
+def run_job(job):
+    """Exécute une tâche sous verrou. Retourne le JobRun, ou None si elle tournait déjà."""
+    run = None
+    try:
+        # Les tâches écrivent : leurs lectures vont aussi sur la primaire
+        with use_primary(), job_lock(job.name, job.lock_ttl):
+            with record_run(job.name) as run:
+                run.details = job.func()
+    except LockHeld:
+        logger.info("Tâche %s déjà en cours ailleurs", job.name)
+        return None
+    except Exception:
+        logger.exception("Échec de la tâche %s", job.name)
+    return run
+
+
+def last_run(name):
+    return JobRun.objects.filter(job=name).order_by("-started_at").first()
+
+
+def next_due(job, previous=None):
+    """Prochaine échéance d'une tâche ; None si elle attend la tâche qui la déclenche."""
+    previous = previous if previous is not None else last_run(job.name)
+    if job.after:
+        trigger = (
+            JobRun.objects.filter(job=job.after, status=JobRun.SUCCESS)
+            .order_by("-finished_at").first()
+        )
+        if trigger is None or (previous is not None and trigger.finished_at <= previous.started_at):
+            return None
+        return trigger.finished_at
+    if previous is None:
+        return timezone.now()
+    return previous.started_at + timedelta(seconds=job.interval)
+
+
+def due_jobs():
+    due = [(job, next_due(job)) for job in registered_jobs().values()]
+    now = timezone.now()
+    return [job for job, next_run in due if next_run is not None and next_run <= now]
+
+
+def status():
+    """État de chaque tâche : dernière exécution, prochaine échéance, verrou."""
+    locks = {lock.name: lock for lock in JobLock.objects.filter(expires_at__gt=timezone.now())}
+    jobs = []
+    for job in registered_jobs().values():
+        previous = last_run(job.name)
+        lock = locks.get(job.name)
+        jobs.append({
+            "name": job.name,
+            "interval": job.interval,
+            "after": job.after,
+            "running": lock is not None,
+            "locked_by": lock.owner if lock else None,
+            "next_run": next_due(job, previous),
+            "last_run": previous and {
+                "status": previous.status,
+                "started_at": previous.started_at,
+                "finished_at": previous.finished_at,
+                "message": previous.message,
+                "details": previous.details,
+            },
+        })
+    return jobs
+
+
+def run_forever(poll=None, log=None):
+    """Boucle du planificateur : exécute les tâches dues, puis attend `poll` secondes."""
+    poll = poll or settings.SCHEDULER_POLL_INTERVAL
+    log = log or logger.info
+    while True:
+        for job in due_jobs():
+            log(f"Lancement de la tâche {job.name}")
+            run = run_job(job)
+            if run is not None:
+                log(f"Tâche {job.name} : {run.status} {run.message}".rstrip())
+        time.sleep(poll)
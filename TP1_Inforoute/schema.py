@@ -1,15 +1,66 @@
+import base64
+import json
+
 import graphene
+from graphene import relay
 from graphene_django import DjangoObjectType
+from graphql import GraphQLError
+from django.conf import settings
+from django.db.models import Q
+
 from .models import Dataset, Resource
+from .filters import DatasetFilter, resources_with_format
+from . import search
+
+
+class ResourceLoader:
+    """Chargement groupé des ressources (à la manière d'un DataLoader).
+
+    Les datasets d'une page sont annoncés avec prime() ; le premier load()
+    charge les ressources de tous ces datasets en une seule requête.
+    """
+
+    def __init__(self):
+        self.pending = set()
+        self.loaded = {}
+
+    def prime(self, dataset_ids):
+        self.pending.update(i for i in dataset_ids if i not in self.loaded)
+
+    def load(self, dataset_id):
+        if dataset_id not in self.loaded:
+            keys = self.pending | {dataset_id}
+            self.pending = set()
+            for key in keys:
+                self.loaded[key] = []
+            for resource in Resource.objects.filter(dataset_id__in=keys).order_by('id'):
+                self.loaded[resource.dataset_id].append(resource)
+        return self.loaded[dataset_id]
+
+
+def resource_loader(context):
+    # Un chargeur par requête HTTP (stocké sur le contexte GraphQL)
+    if context is None:
+        return ResourceLoader()
+    loader = getattr(context, '_resource_loader', None)
+    if loader is None:
+        loader = ResourceLoader()
+        context._resource_loader = loader
+    return loader
+
 
 class ResourceType(DjangoObjectType):
     class Meta:
         model = Resource
-        fields = ('id', 'name', 'description', 'format', 'url', 'created', 'last_modified')
+        interfaces = (relay.Node,)
+        fields = ('id', 'ckan_id', 'name', 'description', 'format', 'url', 'resource_type')
 
 class DatasetType(DjangoObjectType):
+    resources = graphene.List(graphene.NonNull(ResourceType))
+
     class Meta:
         model = Dataset
+        interfaces = (relay.Node,)
         fields = (
             'ckan_id', 'name', 'title', 'notes', 'author',
             'author_email', 'organization_title', 'license_title',
@@ -17,14 +68,132 @@ class DatasetType(DjangoObjectType):
             'tags', 'groups'
         )
 
+    def resolve_resources(root, info):
+        return resource_loader(info.context).load(root.pk)
+
+
+class DatasetConnection(relay.Connection):
+    class Meta:
+        node = DatasetType
+
+class ResourceConnection(relay.Connection):
+    class Meta:
+        node = ResourceType
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise GraphQLError("Curseur invalide.")
+
+
+def page_size(first, last=None, before=None):
+    if last is not None or before is not None:
+        raise GraphQLError("Seule la pagination vers l'avant (first/after) est supportée.")
+    if first is None:
+        return settings.GRAPHQL_PAGE_SIZE
+    if first < 0:
+        raise GraphQLError("`first` doit être positif.")
+    return min(first, settings.GRAPHQL_MAX_PAGE_SIZE)
+
+
+def build_connection(connection_type, nodes, cursors, has_next_page, has_previous_page):
+    edges = [connection_type.Edge(node=node, cursor=cursor) for node, cursor in zip(nodes, cursors)]
+    return connection_type(
+        edges=edges,
+        page_info=relay.PageInfo(
+            has_next_page=has_next_page,
+            has_previous_page=has_previous_page,
+            start_cursor=cursors[0] if cursors else None,
+            end_cursor=cursors[-1] if cursors else None,
+        ),
+    )
+
+
+def keyset_page(connection_type, queryset, size, after, keys, after_filter):
+    # Pagination par clé : la position est portée par le curseur, jamais par un OFFSET
+    if after:
+        queryset = queryset.filter(after_filter(decode_cursor(after)))
+    rows = list(queryset[:size + 1])
+    nodes = rows[:size]
+    cursors = [encode_cursor(keys(node)) for node in nodes]
+    return build_connection(connection_type, nodes, cursors, len(rows) > size, bool(after))
+
+
+def dataset_keys(dataset):
+    modified = dataset.metadata_modified.isoformat() if dataset.metadata_modified else None
+    return [modified, dataset.ckan_id]
+
+
+def datasets_after(position):
+    # Tri (-metadata_modified, -ckan_id) ; les dates nulles sont en fin de liste
+    modified, ckan_id = position
+    if modified is None:
+        return Q(metadata_modified__isnull=True, ckan_id__lt=ckan_id)
+    return (
+        Q(metadata_modified__lt=modified) |
+        Q(metadata_modified__isnull=True) |
+        Q(metadata_modified=modified, ckan_id__lt=ckan_id)
+    )
+
+
+def offset_page(connection_type, queryset, size, after):
+    # Résultats classés par pertinence : le curseur porte la position dans le classement
+    position = decode_cursor(after) if after else -1
+    if not isinstance(position, int) or isinstance(position, bool):
+        raise GraphQLError("Curseur invalide.")
+    start = position + 1
+    rows = list(queryset[start:start + size + 1])
+    nodes = rows[:size]
+    cursors = [encode_cursor(start + i) for i in range(len(nodes))]
+    return build_connection(connection_type, nodes, cursors, len(rows) > size, start > 0)
+
+
+def prime_resources(info, connection):
+    resource_loader(info.context).prime(edge.node.pk for edge in connection.edges)
+    return connection
+
+
 class Query(graphene.ObjectType):
-    all_datasets = graphene.List(DatasetType)
+    node = relay.Node.Field()
+    all_datasets = relay.ConnectionField(
+        DatasetConnection,
+        organization=graphene.String(),
+        license=graphene.String(),
+        state=graphene.String(),
+        private=graphene.Boolean(),
+        tags=graphene.List(graphene.NonNull(graphene.String)),
+        res_format=graphene.List(graphene.NonNull(graphene.String)),
+    )
+    all_resources = relay.ConnectionField(ResourceConnection, res_format=graphene.String())
     dataset_by_id = graphene.Field(DatasetType, ckan_id=graphene.String(required=True))
-    search_datasets = graphene.List(DatasetType, keyword=graphene.String(required=True))
+    search_datasets = relay.ConnectionField(DatasetConnection, keyword=graphene.String(required=True))
 
-    # Obtenir tous les datasets
-    def resolve_all_datasets(root, info):
-        return Dataset.objects.all()
+    # Parcourir les datasets, page par page (curseurs)
+    def resolve_all_datasets(root, info, first=None, after=None, last=None, before=None, **filters):
+        size = page_size(first, last, before)
+        filterset = DatasetFilter(filters, queryset=Dataset.objects.all())
+        if not filterset.is_valid():
+            raise GraphQLError(json.dumps(filterset.errors))
+        queryset = filterset.qs.order_by('-metadata_modified', '-ckan_id')
+        connection = keyset_page(DatasetConnection, queryset, size, after, dataset_keys, datasets_after)
+        return prime_resources(info, connection)
+
+    def resolve_all_resources(root, info, first=None, after=None, last=None, before=None, res_format=None):
+        size = page_size(first, last, before)
+        queryset = Resource.objects.order_by('id')
+        if res_format:
+            queryset = resources_with_format([res_format], queryset)
+        return keyset_page(
+            ResourceConnection, queryset, size, after,
+            keys=lambda resource: [resource.id],
+            after_filter=lambda position: Q(id__gt=position[0]),
+        )
 
     # Rechercher un dataset précis par ckan_id
     def resolve_dataset_by_id(root, info, ckan_id):
@@ -33,8 +202,10 @@ class Query(graphene.ObjectType):
         except Dataset.DoesNotExist:
             return None
 
-    # Recherche par mot-clé dans le titre ou la description
-    def resolve_search_datasets(root, info, keyword):
-        return Dataset.objects.filter(title__icontains=keyword) | Dataset.objects.filter(notes__icontains=keyword)
+    # Recherche plein texte, résultats triés par pertinence
+    def resolve_search_datasets(root, info, keyword, first=None, after=None, last=None, before=None):
+        size = page_size(first, last, before)
+        queryset = search.search(Dataset.objects.all(), keyword)
+        return prime_resources(info, offset_page(DatasetConnection, queryset, size, after))
 
-schema = graphene.Schema(query=Query)
\ No newline at end of file
+schema = graphene.Schema(query=Query)
@@ -0,0 +1,145 @@
+import hashlib
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Dataset
+
+# Index plein texte SQLite FTS5 : unicode61 + remove_diacritics replie les accents
+# ("Québec" et "quebec" donnent le même terme), dans l'index comme dans la requête.
+SEARCH_TABLE = "dataset_search"
+SEARCH_COLUMNS = ("title", "notes", "organization_title", "tags")
+# Poids bm25 par colonne (ckan_id non indexé, puis SEARCH_COLUMNS)
+SEARCH_WEIGHTS = (0.0, 10.0, 1.0, 3.0, 5.0)
+BATCH_SIZE = 500
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_supported(conn=None):
+    return (conn or connection).vendor == "sqlite"
+
+
+def _docid(ckan_id):
+    # rowid FTS stable dérivé de l'id CKAN (la clé primaire de Dataset n'est pas entière)
+    digest = hashlib.blake2b(ckan_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def index_row(dataset):
+    return (
+        _docid(dataset.ckan_id),
+        dataset.ckan_id,
+        dataset.title or "",
+        dataset.notes or "",
+        dataset.organization_title or "",
+        " ".join(dataset.tags or []),
+    )
+
+
+def create_index(conn=None):
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            f"ckan_id UNINDEXED, {', '.join(SEARCH_COLUMNS)}, "
+            f"tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+
+def drop_index(conn=None):
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def remove_datasets(ckan_ids):
+    if not is_supported():
+        return
+    docids = [_docid(ckan_id) for ckan_id in ckan_ids]
+    with connection.cursor() as cursor:
+        for i in range(0, len(docids), BATCH_SIZE):
+            batch = docids[i:i + BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", batch)
+
+
+def index_datasets(datasets):
+    """(Ré)indexe les datasets donnés ; appelé par le moissonnage à chaque page."""
+    if not is_supported():
+        return
+    datasets = list(datasets)
+    remove_datasets([d.ckan_id for d in datasets])
+    # rowid et ckan_id, puis une valeur par colonne indexée (voir index_row)
+    placeholders = ", ".join(["%s"] * (len(SEARCH_COLUMNS) + 2))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, ckan_id, {', '.join(SEARCH_COLUMNS)}) VALUES ({placeholders})",
+            [index_row(d) for d in datasets],
+        )
+
+
+def rebuild_index():
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    count = 0
+    batch = []
+    fields = ("ckan_id",) + SEARCH_COLUMNS
+    for dataset in Dataset.objects.only(*fields).iterator(chunk_size=BATCH_SIZE):
+        batch.append(dataset)
+        if len(batch) >= BATCH_SIZE:
+            index_datasets(batch)
+            count += len(batch)
+            batch = []
+    index_datasets(batch)
+    return count + len(batch)
+
+
+def match_expression(text):
+    # Chaque mot devient un préfixe entre guillemets : pas d'injection de syntaxe FTS5,
+    # et la recherche fonctionne dès les premières lettres tapées
+    terms = TERM_RE.findall(text or "")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search(queryset, text, ranked=True):
+    """Filtre `queryset` sur `text` et le trie par pertinence (bm25).
+
+    Avec ranked=False, simple filtre pk IN (identifiants trouvés par l'index) :
+    utilisable comme sous-requête (facettes), où la jointure avec l'index ne
+    peut pas nommer la table des datasets. Sur un autre moteur que SQLite,
+    repli sur des icontains sans classement.
+    """
+    if not is_supported():
+        return queryset.filter(
+            Q(title__icontains=text) |
+            Q(notes__icontains=text) |
+            Q(organization_title__icontains=text) |
+            Q(tags__icontains=text)
+        )
+
+    expression = match_expression(text)
+    if not expression:
+        return queryset.none()
+
+    if not ranked:
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT ckan_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [expression])
+        )
+
+    table = connection.ops.quote_name(Dataset._meta.db_table)
+    weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=[f"{SEARCH_TABLE}.ckan_id = {table}.ckan_id", f"{SEARCH_TABLE} MATCH %s"],
+        params=[expression],
+        select={"search_rank": f"bm25({SEARCH_TABLE}, {weights})"},
+    ).order_by("search_rank")
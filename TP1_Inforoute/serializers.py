@@ -1,7 +1,40 @@
 from rest_framework import serializers
-from .models import Dataset, Resource, Profile
+from .models import Dataset, Resource, ResourceLinkStatus, Profile
 from django.contrib.auth.models import User
 from rest_framework.serializers import ModelSerializer
+from .aggregation import DIMENSIONS, DATE_FIELDS, GRANULARITIES, METRICS, MAX_ROWS
+from .facets import FACETS, DEFAULT_LIMIT, MAX_LIMIT
+
+NOTES_EXCERPT_LENGTH = 300
+
+
+def query_param_list(request, name):
+    # ?fields=a,b,c -> {"a", "b", "c"}
+    if request is None:
+        return set()
+    value = request.query_params.get(name, "")
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+class SparseFieldsMixin:
+    """Champs à la demande : ?fields=ckan_id,title limite la réponse,
+    ?expand=resources ajoute les champs coûteux listés dans expandable_fields.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+
+        expand = query_param_list(request, "expand") & set(self.expandable_fields)
+        for name in expand:
+            self.fields[name] = self.expandable_fields[name]()
+
+        requested = query_param_list(request, "fields")
+        if requested:
+            for name in set(self.fields) - requested - expand:
+                self.fields.pop(name)
+
 
 class ResourceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,7 +42,21 @@ class ResourceSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'format', 'url', 'resource_type']
 
 
-class DatasetSerializer(serializers.ModelSerializer):
+class ResourceLinkStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResourceLinkStatus
+        fields = ['ok', 'status_code', 'error', 'latency_ms', 'content_length', 'content_type', 'checked_at']
+
+
+class ResourceWithStatusSerializer(ResourceSerializer):
+    # Null tant que le lien n'a pas été vérifié
+    link_status = ResourceLinkStatusSerializer(read_only=True, default=None)
+
+    class Meta(ResourceSerializer.Meta):
+        fields = ResourceSerializer.Meta.fields + ['link_status']
+
+
+class DatasetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     resources = ResourceSerializer(many=True, read_only=True)
 
     class Meta:
@@ -20,6 +67,23 @@ class DatasetSerializer(serializers.ModelSerializer):
             'metadata_modified', 'state', 'private', 'tags', 'groups', 'resources'
         ]
 
+
+class DatasetListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Représentation légère pour les listes : extrait des notes, ressources sur demande
+    notes_excerpt = serializers.CharField(read_only=True)
+
+    expandable_fields = {
+        "resources": lambda: ResourceSerializer(many=True, read_only=True),
+    }
+
+    class Meta:
+        model = Dataset
+        fields = [
+            'ckan_id', 'name', 'title', 'notes_excerpt', 'author',
+            'organization_title', 'license_title', 'metadata_created',
+            'metadata_modified', 'state', 'private', 'tags', 'groups'
+        ]
+
 class UserSerializer(serializers.ModelSerializer):
     phone_number = serializers.CharField(source="profile.phone_number", allow_blank=True, required=False)
     role = serializers.CharField(source="profile.role", read_only=True)
@@ -73,4 +137,37 @@ class ChangePasswordSerializer(serializers.Serializer):
         user = self.context["request"].user
         if not user.check_password(value):
             raise serializers.ValidationError("Ancien mot de passe incorrect.")
-        return value
\ No newline at end of file
+        return value
+
+class CommaListField(serializers.CharField):
+    # "organization,month" -> ["organization", "month"], limité à une liste de choix
+    def __init__(self, choices, **kwargs):
+        self.choices = list(choices)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        items = [item.strip() for item in super().to_internal_value(data).split(",") if item.strip()]
+        unknown = [item for item in items if item not in self.choices]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Valeur(s) inconnue(s) : {', '.join(unknown)}. Choix possibles : {', '.join(self.choices)}."
+            )
+        return list(dict.fromkeys(items))
+
+
+class AggregateQuerySerializer(serializers.Serializer):
+    group_by = CommaListField(choices=DIMENSIONS, required=False, default=list)
+    date_field = serializers.ChoiceField(choices=DATE_FIELDS, default=DATE_FIELDS[0])
+    granularity = serializers.ChoiceField(choices=list(GRANULARITIES), required=False)
+    metrics = CommaListField(choices=METRICS, required=False, default=lambda: ["datasets"])
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_ROWS, default=1000)
+
+    def validate_metrics(self, value):
+        return value or ["datasets"]
+
+
+class FacetQuerySerializer(serializers.Serializer):
+    facets = CommaListField(choices=FACETS, required=False, default=list)
+    facet_limit = serializers.IntegerField(min_value=1, max_value=MAX_LIMIT, default=DEFAULT_LIMIT)
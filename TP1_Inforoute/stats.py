@@ -0,0 +1,101 @@
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Dataset, Resource, CatalogStats
+
+# Fréquence depuis dernière mise à jour (en jours)
+FRESHNESS_BINS = [0, 30, 60, 90, 180, 365, 10000]
+FRESHNESS_LABELS = ["0-30", "31-60", "61-90", "91-180", "181-365", "365+"]
+TOP_ORGANIZATIONS = 10
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def freshness_filters(today):
+    # "modifié il y a moins de N jours" <=> metadata_modified >= début du jour (today - N + 1)
+    def since(days):
+        return _day_start(today - timedelta(days=days - 1))
+
+    return [
+        Q(metadata_modified__gte=since(FRESHNESS_BINS[i + 1]), metadata_modified__lt=since(FRESHNESS_BINS[i]))
+        for i in range(len(FRESHNESS_BINS) - 1)
+    ]
+
+
+def compute_catalog_stats():
+    """Calcule toutes les répartitions du catalogue en SQL (agrégats groupés)."""
+    now = timezone.now()
+    today = timezone.localdate(now)
+    month_start = _day_start(today.replace(day=1))
+
+    # Compteurs globaux et histogramme de fraîcheur : une seule requête
+    counters = {
+        "total_datasets": Count("pk"),
+        "total_orgs": Count("organization_title", distinct=True),
+        "public_count": Count("pk", filter=Q(private=False)),
+        "private_count": Count("pk", filter=Q(private=True)),
+        "recent_updates": Count("pk", filter=Q(metadata_modified__gte=month_start)),
+    }
+    for i, condition in enumerate(freshness_filters(today)):
+        counters[f"freq_{i}"] = Count("pk", filter=condition)
+    totals = Dataset.objects.aggregate(**counters)
+
+    org_data = (
+        Dataset.objects
+        .values('organization_title')
+        .annotate(total=Count('pk'))
+        .order_by('-total')[:TOP_ORGANIZATIONS]
+    )
+    state_data = Dataset.objects.values('state').annotate(total=Count('pk')).order_by('-total')
+    license_data = Dataset.objects.values('license_title').annotate(total=Count('pk')).order_by('-total')
+    temporal_data = (
+        Dataset.objects
+        .exclude(metadata_created__isnull=True)
+        .annotate(month=TruncMonth('metadata_created'))
+        .values('month')
+        .annotate(total=Count('pk'))
+        .order_by('month')
+    )
+    temporal_data = [d for d in temporal_data if d['month'] is not None]
+
+    return {
+        'org_labels': [d['organization_title'] or "Inconnue" for d in org_data],
+        'org_values': [d['total'] for d in org_data],
+        'state_labels': [d['state'] or "Non spécifiée" for d in state_data],
+        'state_values': [d['total'] for d in state_data],
+        'temporal_labels': [d['month'].strftime('%Y-%m') for d in temporal_data],
+        'temporal_values': [d['total'] for d in temporal_data],
+        'freq_labels': FRESHNESS_LABELS,
+        'freq_values': [totals.pop(f"freq_{i}") for i in range(len(FRESHNESS_LABELS))],
+        'license_labels': [d['license_title'] or "Non spécifiée" for d in license_data],
+        'license_values': [d['total'] for d in license_data],
+        'total_resources': Resource.objects.count(),
+        **totals,
+    }
+
+
+def refresh_catalog_stats():
+    data = compute_catalog_stats()
+    with transaction.atomic():
+        CatalogStats.objects.all().delete()
+        return CatalogStats.objects.create(computed_at=timezone.now(), data=data)
+
+
+def get_catalog_stats():
+    # Lit l'instantané ; le calcule au besoin (avant le tout premier moissonnage)
+    snapshot = CatalogStats.objects.order_by('-computed_at').first()
+    return snapshot or refresh_catalog_stats()
+
+
+async def aget_catalog_stats():
+    snapshot = await CatalogStats.objects.order_by('-computed_at').afirst()
+    # Le calcul initial (transaction) reste synchrone, dans un thread
+    return snapshot or await sync_to_async(refresh_catalog_stats)()
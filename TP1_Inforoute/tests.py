@@ -1,3 +1,1333 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import io
+import json
+import pickle
+import re
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import httpx
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.handlers.asgi import ASGIHandler
+from django.contrib.auth.models import User
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as django_timezone
+
+from . import ckan_cache, dedup, related, scheduler, search
+from .catalog_cache import catalog_generation
+from .db_router import PrimaryForWritesMiddleware, PrimaryReplicaRouter, pinned_to_primary, use_primary
+from .bench_catalog import SyntheticCatalog, FakeCkanServer
+from .cache_backends import LRUBytesCache
+from .benchmark import BenchmarkSuite, compare
+from .ckan import CkanClient, CkanError
+from .export import CSV_COLUMNS, export, parquet_schema
+from .facets import FACETS
+from .filters import DatasetFilter, ResourceFilter
+from .harvest import Harvester, sync_labels, write_page
+from .jobs import HARVEST_JOB, RELATED_JOB
+from .linkcheck import check_links, run_link_check
+from .models import (
+    CatalogStats, Dataset, DatasetSignature, HarvestState, JobLock, JobRun, Resource, ResourceLinkStatus, Tag,
+)
+from .pagination import DatasetCursorPagination
+from .profiler import CappedStream, profile_csv, profile_json
+from .response_cache import response_cache
+from .stats import compute_catalog_stats, refresh_catalog_stats
+
+
+def query_plan(queryset):
+    """Plan d'exécution SQLite (EXPLAIN QUERY PLAN) d'un queryset : liste des lignes « detail »."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+# "SCAN <table>" sans "USING ... INDEX" : parcours complet de la table
+FULL_SCAN_RE = re.compile(r"^SCAN (\S+)$")
+
+
+@skipUnless(connection.vendor == "sqlite", "Plans d'exécution propres à SQLite")
+class QueryPlanTests(TestCase):
+    """Les requêtes principales du catalogue doivent passer par un index.
+
+    Un test échoue si le plan contient un parcours complet d'une table du
+    catalogue ou un tri temporaire là où l'index doit fournir l'ordre.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        base = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        datasets = []
+        for i in range(30):
+            dataset = Dataset.objects.create(
+                ckan_id=f"id{i:03}", name=f"n{i}", title=f"Titre {i}",
+                organization_id=f"org{i % 3}", organization_title=f"Organisation {i % 3}",
+                license_id="cc-by", license_title="CC-BY", state="active", private=i % 7 == 0,
+                tags=["eau"] if i % 2 else ["air"],
+                metadata_created=base, metadata_modified=base + timedelta(days=i),
+            )
+            resource = Resource.objects.create(dataset=dataset, ckan_id=f"r{i}", format="CSV", url=f"https://x/{i}")
+            ResourceLinkStatus.objects.create(
+                resource=resource, url=resource.url, ok=i % 5 != 0, checked_at=base + timedelta(days=i),
+            )
+            datasets.append(dataset)
+        sync_labels(datasets)
+        search.index_datasets(datasets)
+
+    def assertUsesIndexes(self, queryset, ordered=False):
+        plan = query_plan(queryset)
+        scans = [line for line in plan if FULL_SCAN_RE.match(line)]
+        self.assertEqual(scans, [], f"Parcours complet : {plan}")
+        if ordered:
+            self.assertFalse(
+                any("TEMP B-TREE FOR ORDER BY" in line for line in plan),
+                f"Tri sans index : {plan}",
+            )
+        return plan
+
+    def filtered(self, **params):
+        return DatasetFilter(params, queryset=Dataset.objects.all()).qs
+
+    def test_default_list_ordering(self):
+        self.assertUsesIndexes(Dataset.objects.order_by("-metadata_modified", "-ckan_id")[:20], ordered=True)
+
+    def test_cursor_next_page(self):
+        position = datetime(2024, 1, 15, tzinfo=dt_timezone.utc)
+        queryset = Dataset.objects.filter(metadata_modified__lt=position).order_by("-metadata_modified", "-ckan_id")
+        self.assertUsesIndexes(queryset[:20], ordered=True)
+
+    def test_cursor_pages_around_null_dates(self):
+        pagination = DatasetCursorPagination()
+        pagination.field = Dataset._meta.get_field("metadata_modified")
+        for position in ((datetime(2024, 1, 15, tzinfo=dt_timezone.utc), "id014"), (None, "id014")):
+            for descending in (True, False):
+                for segment in pagination.segments(Dataset.objects.all(), position, descending):
+                    self.assertUsesIndexes(segment[:21], ordered=True)
+
+    def test_ordering_by_title(self):
+        self.assertUsesIndexes(Dataset.objects.order_by("title")[:20], ordered=True)
+
+    def test_organization_filter(self):
+        self.assertUsesIndexes(self.filtered(organization="Organisation 1"))
+
+    def test_license_filter(self):
+        self.assertUsesIndexes(self.filtered(license="cc-by"))
+
+    def test_state_filter(self):
+        self.assertUsesIndexes(self.filtered(state="active"))
+
+    def test_private_filter_with_default_ordering(self):
+        queryset = self.filtered(private=False).order_by("-metadata_modified", "-ckan_id")[:20]
+        self.assertUsesIndexes(queryset, ordered=True)
+
+    def test_tag_filters(self):
+        self.assertUsesIndexes(self.filtered(tags=["eau"]).filter(organization_title="Organisation 1"))
+        self.assertUsesIndexes(self.filtered(tags=["eau", "air"], tags_mode="any").filter(state="active"))
+
+    def test_format_filters(self):
+        self.assertUsesIndexes(self.filtered(res_format=["csv"]).filter(state="active"))
+        self.assertUsesIndexes(ResourceFilter({"res_format": "csv"}, queryset=Resource.objects.all()).qs)
+
+    def test_broken_links_filter(self):
+        self.assertUsesIndexes(ResourceFilter({"broken": "true"}, queryset=Resource.objects.all()).qs)
+
+    def test_resources_of_datasets(self):
+        self.assertUsesIndexes(Resource.objects.filter(dataset_id__in=["id001", "id002"]))
+        self.assertUsesIndexes(Resource.objects.filter(url="https://x/1"))
+
+    def test_related_datasets(self):
+        self.assertUsesIndexes(related.neighbors("id001"), ordered=True)
+
+    def test_full_text_search(self):
+        self.assertUsesIndexes(search.search(Dataset.objects.all(), "titre")[:20])
+
+    def test_facets(self):
+        # Sans filtre, chaque facette parcourt un index couvrant plutôt que la table
+        for name, facet in FACETS.items():
+            with self.subTest(facet=name):
+                self.assertUsesIndexes(facet(Dataset.objects.all(), 20))
+
+    def test_facets_with_search(self):
+        # La recherche passe en sous-requête (dataset IN ...) : pas de référence à la table externe
+        self.assertUsesIndexes(FACETS["tag"](search.search(Dataset.objects.all(), "titre", ranked=False), 20))
+        response = self.client.get("/api/facets/", {"search": "titre 7", "facets": "tag,format"})
+        self.assertEqual(response.status_code, 200)
+        facets = response.json()["facets"]
+        self.assertEqual(facets["tag"], [{"value": "eau", "count": 1}])
+        self.assertEqual(facets["format"], [{"value": "CSV", "count": 1}])
+
+    def test_latest_modified(self):
+        # Point de reprise du moissonnage incrémental (plus grand metadata_modified)
+        queryset = Dataset.objects.order_by("-metadata_modified").values("metadata_modified")[:1]
+        self.assertUsesIndexes(queryset, ordered=True)
+
+
+@skipUnless(search.is_supported(), "Index plein texte FTS5 propre à SQLite")
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        datasets = [
+            Dataset.objects.create(ckan_id="notes", name="notes", title="Stations", notes="Qualité de l'air mesurée"),
+            Dataset.objects.create(ckan_id="titre", name="titre", title="Qualité de l'air", notes="Mesures"),
+            Dataset.objects.create(ckan_id="tags", name="tags", title="Stations", tags=["qualité"]),
+            Dataset.objects.create(ckan_id="autre", name="autre", title="Arbres publics"),
+        ]
+        search.index_datasets(datasets)
+
+    def ids(self, text):
+        return list(search.search(Dataset.objects.all(), text).values_list("ckan_id", flat=True))
+
+    def test_accents_are_folded(self):
+        self.assertEqual(self.ids("qualite"), self.ids("qualité"))
+        self.assertEqual(set(self.ids("QUALITE")), {"notes", "titre", "tags"})
+
+    def test_ranked_by_weighted_bm25(self):
+        # Poids bm25 : titre (10) > tags (5) > notes (1)
+        self.assertEqual(self.ids("qualite"), ["titre", "tags", "notes"])
+        # Préfixe du dernier mot tapé
+        self.assertEqual(self.ids("arbr"), ["autre"])
+
+    def test_migration_rowids_match_the_index(self):
+        # Les lignes remplies par la migration 0013 doivent pouvoir être supprimées par remove_datasets
+        migration = import_module("TP1_Inforoute.migrations.0013_dataset_search_index")
+        self.assertEqual(migration.docid("notes"), search._docid("notes"))
+
+
+class DatasetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        base = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for i in range(10):
+            # Dates en double pour les égalités, et trois datasets sans date de modification
+            modified = base + timedelta(days=i // 2) if i < 7 else None
+            Dataset.objects.create(ckan_id=f"id{i:03}", name=f"n{i}", title=f"Titre {i}", metadata_modified=modified)
+
+    def pages(self, url, key):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([dataset["ckan_id"] for dataset in response.json()["results"]])
+            url = response.json()[key]
+        return pages
+
+    def test_cursor_walks_through_null_dates(self):
+        expected = [f"id{i:03}" for i in (6, 5, 4, 3, 2, 1, 0, 9, 8, 7)]
+        pages = self.pages("/api/datasets/?page_size=3", "next")
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+
+        # Retour en arrière depuis la dernière page, curseurs « previous »
+        last = self.client.get("/api/datasets/?page_size=3").json()
+        while last["next"]:
+            last = self.client.get(last["next"]).json()
+        self.assertEqual(sum(reversed(self.pages(last["previous"], "previous")), []), expected[:9])
+
+    def test_ascending_order_starts_with_null_dates(self):
+        pages = self.pages("/api/datasets/?page_size=4&ordering=metadata_modified", "next")
+        self.assertEqual(sum(pages, []), [f"id{i:03}" for i in (7, 8, 9, 0, 1, 2, 3, 4, 5, 6)])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/datasets/?cursor=cD1ub3Rqc29u").status_code, 404)
+        # Position NULL sur un tri par un champ non nullable (p=[null,"id001"])
+        cursor = base64.b64encode(b'p=[null,"id001"]').decode()
+        self.assertEqual(self.client.get(f"/api/datasets/?ordering=title&cursor={cursor}").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/datasets/?cursor={cursor}").status_code, 200)
+
+
+class DatasetSparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        base = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for i in range(30):
+            dataset = Dataset.objects.create(
+                ckan_id=f"id{i:03}", name=f"n{i}", title=f"Titre {i}", notes="Notes " * 100, author="Auteur",
+                metadata_modified=base + timedelta(days=i),
+            )
+            for k in range(2):
+                Resource.objects.create(dataset=dataset, ckan_id=f"r{i}-{k}", format="CSV", url=f"https://x/{i}/{k}")
+
+    def setUp(self):
+        # Réponses en cache d'un test à l'autre : chaque requête doit être calculée
+        response_cache().clear()
+
+    def get(self, query):
+        response = self.client.get(f"/api/datasets/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_fields_limit_response_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            results = self.get("fields=ckan_id,title&page_size=5")
+        self.assertEqual([set(result) for result in results], [{"ckan_id", "title"}] * 5)
+        sql = next(query["sql"] for query in queries if 'FROM "TP1_Inforoute_dataset"' in query["sql"])
+        self.assertNotIn('"author"', sql)
+        self.assertNotIn('"notes"', sql)
+
+    def test_expand_resources(self):
+        self.assertNotIn("resources", self.get("page_size=5")[0])
+        results = self.get("expand=resources&page_size=5")
+        self.assertEqual([len(result["resources"]) for result in results], [2] * 5)
+        self.assertIn("notes_excerpt", results[0])
+        # Champs choisis et ressources
+        results = self.get("fields=ckan_id&expand=resources&page_size=5")
+        self.assertEqual(set(results[0]), {"ckan_id", "resources"})
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        counts = []
+        for page_size in (2, 10, 25):
+            response_cache().clear()
+            with CaptureQueriesContext(connection) as queries:
+                results = self.get(f"expand=resources&page_size={page_size}")
+            self.assertEqual(len(results), page_size)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, counts)
+
+        # Version du catalogue, page de datasets, ressources préchargées en une requête (IN)
+        response_cache().clear()
+        with self.assertNumQueries(3):
+            self.get("expand=resources&page_size=20")
+
+
+class DatasetFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        datasets = []
+        for i, (tags, fmt) in enumerate([(["eau"], "CSV"), (["air"], "json"), (["eau", "air"], "PDF"), ([], None)]):
+            dataset = Dataset.objects.create(ckan_id=f"d{i}", name=f"d{i}", title=f"Titre {i}", tags=tags)
+            if fmt:
+                Resource.objects.create(dataset=dataset, ckan_id=f"r{i}", format=fmt, url=f"https://x/{i}")
+            datasets.append(dataset)
+        sync_labels(datasets)
+
+    def ids(self, query):
+        response = self.client.get(f"/api/datasets/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return sorted(dataset["ckan_id"] for dataset in response.json()["results"])
+
+    def test_tags_comma_or_repeated(self):
+        self.assertEqual(self.ids("tags=eau"), ["d0", "d2"])
+        self.assertEqual(self.ids("tags=eau,air"), ["d2"])
+        self.assertEqual(self.ids("tags=eau&tags=air"), ["d2"])
+        self.assertEqual(self.ids("tags=eau,air&tags_mode=any"), ["d0", "d1", "d2"])
+        self.assertEqual(self.ids("tags=eau&tags=air&tags_mode=any"), ["d0", "d1", "d2"])
+
+    def test_formats_comma_or_repeated(self):
+        self.assertEqual(self.ids("res_format=csv,json"), ["d0", "d1"])
+        self.assertEqual(self.ids("res_format=csv&res_format=JSON"), ["d0", "d1"])
+        self.assertEqual(self.ids("res_format=,pdf,"), ["d2"])
+
+
+class AggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = django_timezone.now()
+        rows = [
+            # organisation, créé le, modifié il y a (jours), ressources, tags
+            ("Ville", datetime(2024, 1, 5, 12, tzinfo=dt_timezone.utc), 5, ["CSV", "JSON"], ["eau"]),
+            ("Ville", datetime(2024, 1, 20, 12, tzinfo=dt_timezone.utc), 45, ["CSV"], ["eau", "air"]),
+            ("Ville", datetime(2024, 2, 1, 12, tzinfo=dt_timezone.utc), 400, [], ["air"]),
+            ("Province", datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc), None, ["PDF"], []),
+        ]
+        datasets = []
+        for i, (organization, created, age, formats, tags) in enumerate(rows):
+            dataset = Dataset.objects.create(
+                ckan_id=f"d{i}", name=f"d{i}", title=f"Titre {i}", organization_title=organization, tags=tags,
+                metadata_created=created, metadata_modified=None if age is None else now - timedelta(days=age),
+            )
+            for k, fmt in enumerate(formats):
+                Resource.objects.create(dataset=dataset, ckan_id=f"r{i}-{k}", format=fmt, url=f"https://x/{i}/{k}")
+            datasets.append(dataset)
+        sync_labels(datasets)
+
+    def results(self, query, status=200):
+        response = self.client.get(f"/api/aggregate/?{query}")
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()["results"] if status == 200 else response.json()
+
+    def test_group_by_with_metrics(self):
+        self.assertEqual(self.results("group_by=organization&metrics=datasets,resources"), [
+            {"organization": "Ville", "datasets": 3, "resources": 3},
+            {"organization": "Province", "datasets": 1, "resources": 1},
+        ])
+        self.assertEqual(self.results(""), [{"datasets": 4}])
+        self.assertEqual(
+            {(row["tag"], row["datasets"]) for row in self.results("group_by=tag")},
+            {("eau", 2), ("air", 2), (None, 1)},
+        )
+        # Mêmes filtres que la liste des datasets
+        self.assertEqual(
+            self.results("group_by=format&res_format=csv"),
+            [{"format": "CSV", "datasets": 2}, {"format": "JSON", "datasets": 1}],
+        )
+
+    def test_granularity(self):
+        self.assertEqual(self.results("granularity=month&date_field=metadata_created"), [
+            {"period": "2024-01-01", "datasets": 2},
+            {"period": "2024-02-01", "datasets": 1},
+            {"period": "2024-03-01", "datasets": 1},
+        ])
+        self.assertEqual(
+            self.results("group_by=organization&granularity=year&date_field=metadata_created&since=2024-01-10T00:00:00Z"),
+            [{"organization": "Ville", "period": "2024-01-01", "datasets": 2},
+             {"organization": "Province", "period": "2024-01-01", "datasets": 1}],
+        )
+
+    def test_freshness_matches_catalog_stats(self):
+        rows = {row["freshness"]: row["datasets"] for row in self.results("group_by=freshness")}
+        self.assertEqual(rows, {"0-30": 1, "31-60": 1, "365+": 1, None: 1})
+        stats = compute_catalog_stats()
+        self.assertEqual(
+            [rows.get(label, 0) for label in stats["freq_labels"]],
+            stats["freq_values"],
+        )
+
+    def test_unknown_parameters_are_rejected(self):
+        errors = self.results("group_by=organization,couleur", status=400)
+        self.assertIn("couleur", errors["group_by"][0])
+        self.assertIn("granularity", self.results("granularity=heure", status=400))
+        self.assertIn("metrics", self.results("metrics=moyenne", status=400))
+
+
+class CatalogStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = django_timezone.now()
+        # Âge de la dernière modification (jours) : une tranche de fraîcheur chacun, 0-30 deux fois
+        for i, age in enumerate([3, 12, 35, 70, 100, 200, 500, None]):
+            dataset = Dataset.objects.create(
+                ckan_id=f"d{i}", name=f"d{i}", title=f"Titre {i}", private=i % 4 == 0,
+                organization_title="Ville" if i % 2 else "Province", state="active",
+                metadata_created=now - timedelta(days=600),
+                metadata_modified=None if age is None else now - timedelta(days=age),
+            )
+            Resource.objects.create(dataset=dataset, ckan_id=f"r{i}", format="CSV", url=f"https://x/{i}")
+
+    def test_snapshot_matches_direct_counts(self):
+        data = refresh_catalog_stats().data
+        self.assertEqual(data["total_datasets"], Dataset.objects.count())
+        self.assertEqual(data["total_resources"], Resource.objects.count())
+        self.assertEqual(data["total_orgs"], 2)
+        self.assertEqual(
+            (data["public_count"], data["private_count"]),
+            (Dataset.objects.filter(private=False).count(), Dataset.objects.filter(private=True).count()),
+        )
+        self.assertEqual(dict(zip(data["org_labels"], data["org_values"])), {"Ville": 4, "Province": 4})
+        self.assertEqual(data["freq_labels"], ["0-30", "31-60", "61-90", "91-180", "181-365", "365+"])
+        self.assertEqual(data["freq_values"], [2, 1, 1, 1, 1, 1])
+        month_start = django_timezone.make_aware(datetime.combine(django_timezone.localdate().replace(day=1), datetime.min.time()))
+        self.assertEqual(data["recent_updates"], Dataset.objects.filter(metadata_modified__gte=month_start).count())
+
+    def test_endpoint_serves_the_snapshot(self):
+        # Aucun instantané : le premier appel le calcule, les suivants le relisent
+        first = self.client.get("/api/stats/").json()
+        self.assertEqual(first["total_datasets"], 8)
+        self.assertEqual(CatalogStats.objects.count(), 1)
+
+        Dataset.objects.create(ckan_id="nouveau", name="nouveau", title="Nouveau")
+        with mock.patch("TP1_Inforoute.stats.compute_catalog_stats") as compute:
+            data = self.client.get("/api/stats/").json()
+        compute.assert_not_called()
+        self.assertEqual(data, first)
+
+        # Recalculé à la fin du moissonnage (refresh_catalog_stats)
+        refresh_catalog_stats()
+        self.assertEqual(self.client.get("/api/stats/").json()["total_datasets"], 9)
+        self.assertEqual(CatalogStats.objects.count(), 1)
+
+
+class DatasetConditionalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = Dataset.objects.create(ckan_id="d1", name="d1", title="Dataset", content_hash="abc")
+        cls.resource = Resource.objects.create(dataset=cls.dataset, ckan_id="r1", format="CSV", url="https://x/1")
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get("/api/datasets/d1/", HTTP_ACCEPT="application/json", **headers)
+
+    def test_unchanged_dataset_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Last-Modified"))
+        self.assertEqual(self.get(response["ETag"]).status_code, 304)
+
+    def test_resource_writes_change_the_etag(self):
+        etag = self.get()["ETag"]
+        response = self.client.patch(
+            f"/api/resources/{self.resource.pk}/", {"format": "JSON"}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["format"] for r in response.json()["resources"]], ["JSON"])
+
+        etag = response["ETag"]
+        self.assertEqual(self.client.delete(f"/api/resources/{self.resource.pk}/").status_code, 204)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["resources"], [])
+        self.assertEqual(self.get(response["ETag"]).status_code, 304)
+
+
+class GraphQLTests(TestCase):
+    DATASETS = """
+        query($after: String) {
+          allDatasets(first: 2, after: $after) {
+            edges { node { ckanId resources { name } } }
+            pageInfo { hasNextPage endCursor }
+          }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        base = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for i in range(5):
+            dataset = Dataset.objects.create(
+                ckan_id=f"id{i:03}", name=f"n{i}", title=f"Titre {i}",
+                metadata_modified=base + timedelta(days=i) if i else None,
+            )
+            Resource.objects.create(dataset=dataset, ckan_id=f"r{i}", name=f"Ressource {i}")
+        cls.user = User.objects.create_user("lecteur")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def execute(self, query, **variables):
+        return self.client.post("/graphql/", {"query": query, "variables": variables}, content_type="application/json")
+
+    def test_connection_follows_cursors(self):
+        ids, after = [], None
+        while True:
+            response = self.execute(self.DATASETS, after=after)
+            self.assertEqual(response.status_code, 200)
+            connection = response.json()["data"]["allDatasets"]
+            ids += [edge["node"]["ckanId"] for edge in connection["edges"]]
+            if not connection["pageInfo"]["hasNextPage"]:
+                break
+            after = connection["pageInfo"]["endCursor"]
+        # Dates décroissantes, puis le dataset sans date de modification
+        self.assertEqual(ids, ["id004", "id003", "id002", "id001", "id000"])
+
+    def test_search_rejects_foreign_cursors(self):
+        query = 'query($after: String) { searchDatasets(keyword: "titre", first: 2, after: $after) { edges { node { ckanId } } } }'
+        for value in ("abc", [1, 2], True):
+            after = base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+            response = self.execute(query, after=after)
+            self.assertEqual([error["message"] for error in response.json()["errors"]], ["Curseur invalide."])
+
+    @override_settings(GRAPHQL_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        response = self.execute("{ allDatasets(first: 50) { edges { node { ckanId } } } }")
+        self.assertEqual(len(response.json()["data"]["allDatasets"]["edges"]), 3)
+
+    def test_depth_limit(self):
+        query = "{ allDatasets { edges { node { " + "a { " * 10 + "b" + " }" * 10 + " } } } }"
+        response = self.execute(query)
+        self.assertEqual(response.status_code, 400)
+        messages = [error["message"] for error in response.json()["errors"]]
+        self.assertIn("'anonymous' exceeds maximum operation depth of 10.", messages)
+
+    def test_cost_limit(self):
+        page = "allDatasets(first: 100) { edges { node { ckanId title resources { name format url } } } }"
+        self.assertEqual(self.execute("{ " + page + " }").status_code, 200)
+
+        # Deux pages de 100 datasets et de leurs ressources (coût 2 × 3501) dépassent GRAPHQL_MAX_COST (5000)
+        query = "{ " + " ".join(f"p{k}: {page}" for k in range(2)) + " }"
+        response = self.execute(query)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Requête trop coûteuse", response.json()["errors"][0]["message"])
+
+    def test_nested_lists_are_costed_with_fanout(self):
+        # Les ressources d'un dataset comptent GRAPHQL_LIST_FANOUT (10) fois : coût 1 + 100 × 74
+        fields = "id ckanId name description format url resourceType"
+        query = "{ allDatasets(first: 100) { edges { node { ckanId resources { " + fields + " } } } } }"
+        response = self.execute(query)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("coût estimé 7401", response.json()["errors"][0]["message"])
+        with override_settings(GRAPHQL_LIST_FANOUT=1):
+            self.assertEqual(self.execute(query).status_code, 200)
+
+
+    def test_only_successful_responses_are_cached(self):
+        query = "{ allDatasets(first: 1) { edges { node { ckanId } } } }"
+        self.assertEqual(self.execute(query)["X-Cache"], "MISS")
+        self.assertEqual(self.execute(query)["X-Cache"], "HIT")
+
+        # Erreur d'exécution : statut 200 avec "errors", jamais rejouée depuis le cache
+        query = "{ allDatasets(first: -1) { edges { node { ckanId } } } }"
+        for _ in range(2):
+            response = self.execute(query)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("errors", response.json())
+            self.assertEqual(response["X-Cache"], "MISS")
+
+
+class LRUBytesCacheTests(SimpleTestCase):
+    VALUE = b"x" * 1000
+
+    def make_cache(self, entries):
+        # Budget de `entries` valeurs ; un stockage propre à chaque test (partagé par nom)
+        size = len(pickle.dumps(self.VALUE, pickle.HIGHEST_PROTOCOL))
+        return LRUBytesCache(self.id(), {"OPTIONS": {"MAX_BYTES": entries * size}}), size
+
+    def test_least_recently_used_entries_are_evicted_first(self):
+        lru, size = self.make_cache(3)
+        for key in "abc":
+            lru.set(key, self.VALUE)
+        lru.get("a")  # "b" devient la plus ancienne
+        lru.set("d", self.VALUE)
+        lru.set("e", self.VALUE)
+        stats = lru.stats()
+        self.assertEqual([key for key in "abcde" if lru.has_key(key)], ["a", "d", "e"])
+        self.assertEqual((stats["evictions"], stats["entries"], stats["bytes"]), (2, 3, 3 * size))
+
+        # Remplacer une clé ne compte pas deux fois ; une valeur plus grande que le budget n'est pas gardée
+        lru.set("a", self.VALUE)
+        lru.set("big", self.VALUE * 4)
+        stats = lru.stats()
+        self.assertFalse(lru.has_key("big"))
+        self.assertEqual((stats["evictions"], stats["bytes"]), (2, 3 * size))
+
+    def test_hit_and_miss_counters(self):
+        lru, _ = self.make_cache(2)
+        self.assertIsNone(lru.stats()["hit_ratio"])
+        lru.set("a", self.VALUE)
+        lru.set("expired", self.VALUE, timeout=0)
+        self.assertEqual(lru.get("a"), self.VALUE)
+        self.assertEqual(lru.get("a"), self.VALUE)
+        self.assertIsNone(lru.get("missing"))
+        self.assertIsNone(lru.get("expired"))  # expirée : un échec, et l'entrée est retirée
+
+        stats = lru.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_ratio"]), (2, 2, 0.5))
+        self.assertEqual((stats["entries"], stats["evictions"]), (1, 0))
+
+
+class BenchmarkSuiteTests(TestCase):
+    """La suite de mesures doit rester exécutable (petit catalogue, une itération)."""
+
+    def test_catalog_is_deterministic(self):
+        first, second = SyntheticCatalog(50, seed=3), SyntheticCatalog(50, seed=3)
+        self.assertEqual(first.package(7), second.package(7))
+        self.assertEqual(first.index_of(first.dataset_id(7)), 7)
+        self.assertNotEqual(first.package(7), SyntheticCatalog(50, seed=4).package(7))
+
+    def test_fake_ckan_server(self):
+        catalog = SyntheticCatalog(25, resources_per_dataset=2)
+        with FakeCkanServer(catalog) as server:
+            client = CkanClient(base_url=server.url, retries=0)
+            try:
+                page = client.package_search(start=20, rows=10)
+                package = client.package_show(catalog.dataset_id(3))
+            finally:
+                client.close()
+        self.assertEqual(page["count"], 25)
+        self.assertEqual([d["id"] for d in page["results"]], [catalog.dataset_id(i) for i in range(20, 25)])
+        self.assertEqual(package["title"], catalog.package(3)["title"])
+
+    def test_suite_runs_every_benchmark(self):
+        catalog = SyntheticCatalog(20, resources_per_dataset=2, change_ratio=0.5)
+        with FakeCkanServer(catalog) as server:
+            suite = BenchmarkSuite(catalog, server, iterations=1, warmup=0, rows=8, workers=2, trace_memory=False)
+            suite.run()
+            report = suite.report()
+
+        names = [name for name, *_ in suite.harvest_cases() + suite.read_cases()]
+        self.assertEqual(list(report["results"]), names)
+        self.assertEqual(report["results"]["harvest_full"]["items"], 20)
+        self.assertEqual(Dataset.objects.count(), 20)
+        for name, result in report["results"].items():
+            with self.subTest(benchmark=name):
+                self.assertGreater(result["queries"], 0)
+                self.assertIsNotNone(result["latency_ms"]["p95"])
+
+        # Une requête SQL de plus sur la même mesure est signalée comme régression
+        slower = {"results": {"rest_list": dict(report["results"]["rest_list"], queries=0)}}
+        regressions = [row for row in compare(slower, report) if row[-1]]
+        self.assertEqual([row[:2] for row in regressions], [("rest_list", "queries")])
+
+
+# Nouvelles tentatives sans attente : les tests ne dorment pas entre deux 503
+@override_settings(CKAN_BACKOFF_FACTOR=0, CKAN_BACKOFF_JITTER=0)
+class HarvesterTests(TestCase):
+    """Moissonnage contre le faux serveur CKAN (catalogue synthétique, aucun accès réseau)."""
+
+    def harvest(self, server, retries=0, resume=False, **options):
+        client = CkanClient(base_url=server.url, retries=retries)
+        try:
+            return Harvester(client=client, rows=10, workers=2, **options).run(resume=resume)
+        finally:
+            client.close()
+
+    def test_second_harvest_skips_unchanged_datasets(self):
+        catalog = SyntheticCatalog(30, resources_per_dataset=2, change_ratio=0.2)
+        with FakeCkanServer(catalog) as server:
+            stats = self.harvest(server)
+            self.assertEqual((stats.created, stats.updated, stats.unchanged), (30, 0, 0))
+            self.assertEqual(Dataset.objects.count(), 30)
+            self.assertEqual(Resource.objects.count(), sum(len(catalog.package(i)["resources"]) for i in range(30)))
+
+            # Même catalogue : empreintes identiques, aucune écriture sur les datasets ni les ressources
+            with CaptureQueriesContext(connection) as queries:
+                stats = self.harvest(server)
+            self.assertEqual((stats.created, stats.updated, stats.unchanged), (0, 0, 30))
+            writes = [
+                query["sql"] for query in queries
+                if re.match(r'(INSERT INTO|UPDATE) "TP1_Inforoute_(dataset|resource)"', query["sql"])
+            ]
+            self.assertEqual(writes, [])
+
+            # Nouvelle révision : seuls les datasets modifiés sont réécrits
+            catalog.revision = 1
+            changed = [i for i in range(30) if catalog.last_change(i)]
+            self.assertTrue(changed)
+            stats = self.harvest(server)
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (0, len(changed), 30 - len(changed)))
+        self.assertEqual(Dataset.objects.get(pk=catalog.dataset_id(changed[0])).title, catalog.package(changed[0])["title"])
+
+    def test_resources_are_added_updated_and_removed(self):
+        catalog = SyntheticCatalog(20, resources_per_dataset=3)
+        first, second = [p for p in map(catalog.package, range(20)) if len(p["resources"]) >= 3][:2]
+        write_page([first, second])
+        pks = dict(Resource.objects.values_list("ckan_id", "pk"))
+
+        kept, updated, removed = first["resources"][:3]
+        updated["format"] = "PARQUET"
+        added = {"id": "nouvelle-ressource", "name": "Nouvelle", "format": "CSV", "url": "https://x/nouvelle"}
+        moved = second["resources"][0]
+        first["resources"] = [kept, updated, added, moved] + first["resources"][3:]
+        second["resources"] = second["resources"][1:]
+        self.assertEqual(write_page([first, second]), (0, 2, 0, len(first["resources"]) + len(second["resources"])))
+
+        resources = {r.ckan_id: r for r in Resource.objects.all()}
+        self.assertNotIn(removed["id"], resources)
+        self.assertEqual(resources["nouvelle-ressource"].dataset_id, first["id"])
+        self.assertEqual(resources[updated["id"]].format, "PARQUET")
+        # Même ligne (même clé primaire) pour une ressource modifiée ou passée à un autre dataset
+        self.assertEqual(resources[updated["id"]].pk, pks[updated["id"]])
+        self.assertEqual((resources[moved["id"]].pk, resources[moved["id"]].dataset_id), (pks[moved["id"]], first["id"]))
+        self.assertEqual(
+            sorted(resources),
+            sorted(r["id"] for r in first["resources"] + second["resources"]),
+        )
+
+    def test_datasets_removed_upstream_are_deleted(self):
+        catalog = SyntheticCatalog(12, resources_per_dataset=2)
+        gone = catalog.dataset_id(11)
+        with FakeCkanServer(catalog) as server:
+            self.harvest(server)
+            self.assertTrue(Resource.objects.filter(dataset_id=gone).exists())
+
+            # Liste des identifiants en échec : on ne supprime rien plutôt que de supprimer à tort
+            catalog.datasets = 11
+            with mock.patch.object(Harvester, "upstream_ids", side_effect=CkanError("liste incomplète")):
+                self.assertEqual(self.harvest(server).deleted, 0)
+            self.assertTrue(Dataset.objects.filter(pk=gone).exists())
+
+            stats = self.harvest(server)
+        self.assertEqual(stats.deleted, 1)
+        self.assertEqual(Dataset.objects.count(), 11)
+        self.assertFalse(Dataset.objects.filter(pk=gone).exists())
+        self.assertFalse(Resource.objects.filter(dataset_id=gone).exists())
+
+    def test_resume_starts_from_checkpoint(self):
+        catalog = SyntheticCatalog(50, resources_per_dataset=1)
+        with FakeCkanServer(catalog) as server:
+            failing, starts = {30}, []
+            action = server.action
+
+            def flaky_action(name, params):
+                if name == "package_search" and "fl" not in params:
+                    starts.append(int(params["start"]))
+                    if starts[-1] in failing:
+                        return 503, {"success": False, "error": {"message": "Service Unavailable"}}
+                return action(name, params)
+
+            with mock.patch.object(server, "action", flaky_action):
+                with self.assertRaises(CkanError):
+                    self.harvest(server)
+                # Pages 0 à 20 écrites : le point de reprise s'arrête à la page en échec
+                state = HarvestState.objects.get(name=HarvestState.CATALOG)
+                self.assertEqual(state.checkpoint_offset, 30)
+                self.assertIsNone(state.last_finished)
+                self.assertGreaterEqual(Dataset.objects.count(), 30)
+
+                failing.clear()
+                starts.clear()
+                stats = self.harvest(server, resume=True)
+
+        self.assertEqual(starts[0], 30)
+        self.assertNotIn(0, starts)
+        self.assertEqual(stats.created + stats.unchanged, 20)
+        self.assertEqual(Dataset.objects.count(), 50)
+        state.refresh_from_db()
+        self.assertIsNone(state.checkpoint_offset)
+        self.assertIsNotNone(state.last_finished)
+
+    def test_tags_and_groups_follow_upstream_changes(self):
+        catalog = SyntheticCatalog(20, resources_per_dataset=1)
+        index = next(i for i in range(20) if catalog.package(i)["groups"])
+        target = catalog.dataset_id(index)
+        relabel = {}
+        tag_links = Dataset.tag_set.through.objects
+
+        def links(queryset):
+            return sorted(queryset.values_list("dataset_id", "tag__name"))
+
+        with FakeCkanServer(catalog) as server:
+            action = server.action
+
+            def relabelled_action(name, params):
+                status, payload = action(name, params)
+                for package in payload.get("result", {}).get("results", []) if name == "package_search" else []:
+                    if package.get("id") == target and relabel:
+                        package.update(relabel)
+                return status, payload
+
+            with mock.patch.object(server, "action", relabelled_action):
+                self.harvest(server)
+                package = catalog.package(index)
+                dataset = Dataset.objects.get(pk=target)
+                self.assertEqual(
+                    sorted(dataset.tag_set.values_list("name", flat=True)),
+                    sorted(tag["display_name"] for tag in package["tags"]),
+                )
+                self.assertTrue(dataset.group_set.exists())
+                others = links(tag_links.exclude(dataset_id=target))
+                shared = next(name for _, name in others if name not in {t["display_name"] for t in package["tags"]})
+
+                # Tags remplacés (un existant, un nouveau), groupes retirés
+                relabel.update(
+                    tags=[{"name": name, "display_name": name} for name in (shared, "tout-nouveau")], groups=[],
+                )
+                stats = self.harvest(server)
+
+        self.assertEqual((stats.updated, stats.unchanged), (1, 19))
+        dataset = Dataset.objects.get(pk=target)
+        self.assertEqual(dataset.tags, [shared, "tout-nouveau"])
+        self.assertEqual(links(tag_links.filter(dataset_id=target)), [(target, shared), (target, "tout-nouveau")])
+        self.assertFalse(dataset.group_set.exists())
+        # Un seul Tag par nom ; les liens des autres datasets sont intacts
+        self.assertEqual(Tag.objects.filter(name=shared).count(), 1)
+        self.assertEqual(links(tag_links.exclude(dataset_id=target)), others)
+
+    def test_label_backfill_migration(self):
+        # Datasets d'avant la migration 0016 : listes JSON seulement, aucun lien
+        for i, (tags, groups) in enumerate([(["eau", "air"], ["Environnement"]), (["eau", ""], []), ([], None)]):
+            Dataset.objects.create(ckan_id=f"d{i}", name=f"d{i}", title=f"Titre {i}", tags=tags, groups=groups)
+        migration = import_module("TP1_Inforoute.migrations.0016_tags_groups")
+        migration.populate_labels(django_apps, mock.Mock(connection=connection))
+
+        self.assertEqual(sorted(Tag.objects.values_list("name", flat=True)), ["air", "eau"])
+        self.assertEqual(
+            sorted(Dataset.tag_set.through.objects.values_list("dataset_id", "tag__name")),
+            [("d0", "air"), ("d0", "eau"), ("d1", "eau")],
+        )
+        self.assertEqual(
+            list(Dataset.group_set.through.objects.values_list("dataset_id", "group__name")),
+            [("d0", "Environnement")],
+        )
+        # Mêmes liens que sync_labels, utilisé par le moissonnage
+        sync_labels(list(Dataset.objects.all()))
+        self.assertEqual(Dataset.tag_set.through.objects.count(), 3)
+
+    def test_failed_harvest_command_exits_with_an_error(self):
+        catalog = SyntheticCatalog(10, resources_per_dataset=1)
+        with FakeCkanServer(catalog, error_rate=1.0) as server:
+            with override_settings(CKAN_BASE_URL=server.url, CKAN_RETRIES=0):
+                stdout = io.StringIO()
+                with self.assertRaisesMessage(CommandError, "Erreur lors de la récupération des datasets"):
+                    call_command("fetch_data", stdout=stdout)
+        self.assertIn("--resume", stdout.getvalue())
+        self.assertEqual(JobRun.objects.get(job=HARVEST_JOB).status, JobRun.FAILED)
+
+    def test_client_retries_transient_errors(self):
+        catalog = SyntheticCatalog(30, resources_per_dataset=1)
+        with FakeCkanServer(catalog, error_rate=0.3, seed=1) as server:
+            stats = self.harvest(server, retries=10)
+            # 3 pages de datasets + 1 page d'identifiants, et des 503 réessayés
+            self.assertGreater(server.requests, 4)
+        self.assertEqual(stats.created, 30)
+        self.assertEqual(Dataset.objects.count(), 30)
+
+    def test_client_gives_up_after_retries(self):
+        with FakeCkanServer(SyntheticCatalog(5), error_rate=1.0) as server:
+            client = CkanClient(base_url=server.url, retries=2)
+            try:
+                with self.assertRaisesMessage(CkanError, "HTTP 503"):
+                    client.package_search(rows=5)
+            finally:
+                client.close()
+            self.assertEqual(server.requests, 3)
+
+
+class LinkCheckTests(TestCase):
+    """Vérification des liens contre un transport httpx simulé (aucun accès réseau)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset = Dataset.objects.create(ckan_id="d1", name="d1", title="Dataset")
+        urls = [f"https://a.test/ok/{i}" for i in range(6)] + [
+            "https://b.test/no-head", "https://b.test/missing", "ftp://c.test/file",
+        ]
+        for i, url in enumerate(urls):
+            Resource.objects.create(dataset=dataset, ckan_id=f"r{i}", url=url)
+
+    def setUp(self):
+        self.requests = []
+        self.active = {}
+        self.max_active = 0
+
+    async def handler(self, request):
+        host = request.url.host
+        self.requests.append((request.method, str(request.url)))
+        self.active[host] = self.active.get(host, 0) + 1
+        self.max_active = max(self.max_active, self.active[host])
+        await asyncio.sleep(0.01)
+        self.active[host] -= 1
+
+        if request.url.path.startswith("/ok"):
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+            return httpx.Response(200, headers={
+                "ETag": '"v1"', "Content-Type": "text/csv; charset=utf-8", "Content-Length": "1234",
+            })
+        if request.url.path == "/no-head":
+            if request.method == "HEAD":
+                return httpx.Response(405)
+            return httpx.Response(200, content=b"{}", headers={"Content-Type": "application/json"})
+        return httpx.Response(404)
+
+    def check(self, **options):
+        return run_link_check(transport=httpx.MockTransport(self.handler), host_delay=0, per_host=2, **options)
+
+    async def test_unexpected_error_cancels_other_workers(self):
+        finished = []
+
+        async def handler(request):
+            if request.url.path == "/missing":
+                raise RuntimeError("bogue du transport")
+            await asyncio.sleep(5)
+            finished.append(str(request.url))
+            return httpx.Response(200)
+
+        with self.assertRaisesMessage(RuntimeError, "bogue du transport"):
+            await check_links(transport=httpx.MockTransport(handler), host_delay=0, concurrency=10)
+        # Les vérifications en cours sont annulées, pas laissées en arrière-plan dans la boucle
+        self.assertEqual([task for task in asyncio.all_tasks() if task is not asyncio.current_task()], [])
+        self.assertEqual(finished, [])
+        self.assertFalse(await ResourceLinkStatus.objects.aexists())
+
+    async def test_write_error_stops_the_check(self):
+        # Écriture en échec : les travailleurs, bloqués sur la file des résultats, sont annulés
+        with mock.patch("TP1_Inforoute.linkcheck.save_results", side_effect=RuntimeError("base indisponible")):
+            with self.assertRaisesMessage(RuntimeError, "base indisponible"):
+                await asyncio.wait_for(
+                    check_links(transport=httpx.MockTransport(self.handler), host_delay=0, batch_size=2), 5,
+                )
+
+    def test_statuses_are_stored(self):
+        stats = self.check()
+        self.assertEqual((stats.checked, stats.ok, stats.broken), (9, 7, 2))
+        self.assertLessEqual(self.max_active, 2)
+
+        status = ResourceLinkStatus.objects.get(resource__ckan_id="r0")
+        self.assertEqual(
+            (status.ok, status.status_code, status.content_length, status.content_type, status.etag),
+            (True, 200, 1234, "text/csv", '"v1"'),
+        )
+        # HEAD refusé : nouvelle tentative en GET
+        self.assertIn(("GET", "https://b.test/no-head"), self.requests)
+        self.assertTrue(ResourceLinkStatus.objects.get(resource__ckan_id="r6").ok)
+        self.assertEqual(ResourceLinkStatus.objects.get(resource__ckan_id="r7").status_code, 404)
+        self.assertEqual(ResourceLinkStatus.objects.get(resource__ckan_id="r8").error, "URL non HTTP")
+
+    def test_known_links_use_conditional_requests(self):
+        self.check()
+        generation = catalog_generation()
+        stats = self.check()
+        self.assertEqual((stats.not_modified, stats.changed), (6, 0))
+        # Aucun changement d'état, mais checked_at et la latence servis par l'API ont changé
+        self.assertEqual(catalog_generation(), generation + 1)
+        status = ResourceLinkStatus.objects.get(resource__ckan_id="r0")
+        self.assertEqual((status.status_code, status.content_length), (200, 1234))
+        # Vérifiés à l'instant : sautés
+        self.assertEqual(self.check(max_age=3600).checked, 0)
+
+    def test_broken_filter(self):
+        self.check()
+        self.assertEqual(catalog_generation(), 1)
+        broken = ResourceFilter({"broken": "true"}, queryset=Resource.objects.all()).qs
+        working = ResourceFilter({"broken": "false"}, queryset=Resource.objects.all()).qs
+        self.assertEqual(sorted(broken.values_list("ckan_id", flat=True)), ["r7", "r8"])
+        self.assertEqual(working.count(), 7)
+
+
+class ResourceProfilerTests(TestCase):
+    """Profil des fichiers lus par petits morceaux, comme une réponse HTTP en flux."""
+
+    def stream(self, content, max_bytes=10 ** 9, chunk_size=1000, **options):
+        chunks = (content[i:i + chunk_size] for i in range(0, len(content), chunk_size))
+        return CappedStream(chunks, max_bytes, **options)
+
+    def test_csv_types_and_nulls(self):
+        rows = "".join(f"{i};Ville {i};{'' if i % 4 == 0 else i / 2};2024-01-{i % 28 + 1:02d}\n" for i in range(400))
+        # Accent Windows-1252 après le premier morceau
+        content = ("id;nom;montant;date\n" + rows + "400;Montréal;1,5;2024-01-01\n").encode("cp1252")
+        profile = profile_csv(self.stream(content)).as_dict()
+
+        self.assertEqual(profile["row_count"], 401)
+        self.assertEqual(
+            [(column["name"], column["type"]) for column in profile["columns"]],
+            [("id", "integer"), ("nom", "string"), ("montant", "number"), ("date", "date")],
+        )
+        self.assertAlmostEqual(profile["columns"][2]["null_ratio"], 100 / 401, places=4)
+
+    def test_byte_cap(self):
+        content = ("a,b\n" + "1,2\n" * 10000).encode()
+        stream = self.stream(content, max_bytes=2002, whole_lines=True)
+        profile = profile_csv(stream)
+        self.assertTrue(stream.truncated)
+        self.assertEqual(stream.bytes_read, 2000)
+        self.assertEqual(profile.rows, 499)
+
+    def test_geojson_features(self):
+        features = [
+            {"type": "Feature", "properties": {"code": i, "nom": None if i % 2 else f"R{i}"},
+             "geometry": {"type": "Point", "coordinates": [0, 0]}}
+            for i in range(50)
+        ]
+        content = json.dumps({"type": "FeatureCollection", "bbox": [0, 0, 1, 1], "features": features}).encode()
+        profile = profile_json(self.stream(content, chunk_size=7)).as_dict()
+
+        self.assertEqual(profile["row_count"], 50)
+        self.assertEqual(
+            [(column["name"], column["type"], column["null_ratio"]) for column in profile["columns"]],
+            [("code", "integer", 0.0), ("nom", "string", 0.5), ("geometry", "string", 0.0)],
+        )
+
+
+class DedupTests(TestCase):
+    NOTES = (
+        "Inventaire annuel des arbres publics de la ville avec l'espèce, le diamètre, "
+        "l'état de santé et la position de chaque arbre planté sur le domaine public"
+    )
+
+    def create(self, ckan_id, title, notes=NOTES):
+        return Dataset.objects.create(ckan_id=ckan_id, name=ckan_id, title=title, notes=notes, tags=["arbres"])
+
+    def test_estimate_close_to_jaccard(self):
+        first = {f"mot{i}" for i in range(300)}
+        second = {f"mot{i}" for i in range(100, 400)}
+        estimate = dedup.similarity(dedup.minhash(first), dedup.minhash(second))
+        self.assertAlmostEqual(estimate, 0.5, delta=0.12)
+
+    def test_clusters_follow_changes(self):
+        datasets = [self.create(f"d{i}", f"Arbres publics - {city}") for i, city in enumerate(["Laval", "Québec", "Lévis"])]
+        datasets.append(self.create("d3", "Collisions routières", "Accidents de la route par intersection et par gravité"))
+        dedup.index_datasets(datasets)
+        dedup.update_clusters()
+
+        self.assertEqual({ckan_id for ckan_id, _ in dedup.duplicates_of("d1")}, {"d0", "d2"})
+        self.assertEqual(dedup.duplicates_of("d3"), [])
+        self.assertEqual(set(DatasetSignature.objects.filter(cluster="d0").values_list("dataset_id", flat=True)),
+                         {"d0", "d1", "d2"})
+
+        # Le texte de d0 change : le groupe perd d0 et prend l'identifiant de d1
+        datasets[0].notes = "Stationnements incitatifs du réseau de transport collectif"
+        dedup.index_datasets(datasets[:1])
+        stats = dedup.update_clusters()
+        self.assertFalse(DatasetSignature.objects.filter(dirty=True).exists())
+        self.assertEqual(dict(DatasetSignature.objects.values_list("dataset_id", "cluster")),
+                         {"d0": None, "d1": "d1", "d2": "d1", "d3": None})
+        self.assertEqual(stats.clusters, 1)
+
+
+class RelatedDatasetTests(TestCase):
+    def test_neighbors_share_vocabulary(self):
+        topics = {
+            "eau": "qualité de l'eau potable des réseaux de distribution et des usines de traitement",
+            "arbres": "inventaire des arbres publics avec l'espèce, le diamètre et l'état de santé",
+            "routes": "collisions routières par intersection, gravité et conditions météorologiques",
+        }
+        for i in range(12):
+            topic = list(topics)[i % 3]
+            Dataset.objects.create(
+                ckan_id=f"d{i:02}", name=f"d{i}", title=f"{topic.capitalize()} {i}", notes=topics[topic], tags=[topic],
+            )
+
+        stats = related.rebuild(top_k=3)
+        self.assertEqual((stats.datasets, stats.links), (12, 36))
+        for i in range(12):
+            targets = [neighbor["target_id"] for neighbor in related.neighbors(f"d{i:02}")]
+            self.assertNotIn(f"d{i:02}", targets)
+            # Trois voisins, tous du même sujet
+            self.assertEqual([int(target[1:]) % 3 for target in targets], [i % 3] * 3)
+
+        response = self.client.get("/api/datasets/d00/related/")
+        self.assertEqual([result["ckan_id"] for result in response.json()["results"]],
+                         [neighbor["target_id"] for neighbor in related.neighbors("d00")])
+        self.assertEqual(self.client.get("/api/datasets/inconnu/related/").status_code, 404)
+
+    def test_rebuilt_after_each_harvest(self):
+        for i, title in enumerate(["Qualité de l'eau", "Arbres publics"] * 2):
+            Dataset.objects.create(ckan_id=f"d{i}", name=f"d{i}", title=title)
+        job = scheduler.registered_jobs()[RELATED_JOB]
+        self.assertNotIn(job, scheduler.due_jobs())
+
+        # Tâche déclenchée par un moissonnage réussi, hors de son verrou
+        with scheduler.record_run(HARVEST_JOB):
+            pass
+        self.assertIn(job, scheduler.due_jobs())
+        run = scheduler.run_job(job)
+        self.assertEqual((run.status, run.details["links"]), (JobRun.SUCCESS, 4))
+        self.assertEqual([neighbor["target_id"] for neighbor in related.neighbors("d0")], ["d2"])
+        self.assertNotIn(job, scheduler.due_jobs())
+
+
+class SchedulerTests(TestCase):
+    def jobs(self):
+        response = self.client.get("/api/jobs/")
+        self.assertEqual(response.status_code, 200)
+        return {job["name"]: job for job in response.json()["jobs"]}
+
+    def test_lock_is_exclusive_until_it_expires(self):
+        with scheduler.job_lock(HARVEST_JOB, ttl=60) as owner:
+            with self.assertRaises(scheduler.LockHeld):
+                with scheduler.job_lock(HARVEST_JOB):
+                    pass
+            self.assertEqual(self.jobs()[HARVEST_JOB]["locked_by"], owner)
+
+            # Bail expiré (processus mort) : un autre processus reprend le verrou
+            JobLock.objects.update(expires_at=django_timezone.now() - timedelta(seconds=1))
+            self.assertFalse(self.jobs()[HARVEST_JOB]["running"])
+            with scheduler.job_lock(HARVEST_JOB) as other:
+                self.assertNotEqual(other, owner)
+                self.assertEqual(self.jobs()[HARVEST_JOB]["locked_by"], other)
+        self.assertFalse(JobLock.objects.exists())
+        self.assertFalse(self.jobs()[HARVEST_JOB]["running"])
+
+    def test_failed_job_is_recorded(self):
+        def failing():
+            raise RuntimeError("CKAN injoignable")
+
+        job = scheduler.Job("en_echec", failing, interval=3600)
+        with mock.patch.dict(scheduler.JOBS, {job.name: job}):
+            self.assertIn(job, scheduler.due_jobs())
+            with self.assertLogs("TP1_Inforoute.scheduler", "ERROR"):
+                run = scheduler.run_job(job)
+            self.assertEqual((run.status, run.message), (JobRun.FAILED, "CKAN injoignable"))
+            self.assertIsNotNone(run.finished_at)
+            self.assertFalse(JobLock.objects.exists())
+            self.assertNotIn(job, scheduler.due_jobs())
+
+            status = self.jobs()[job.name]
+        self.assertFalse(status["running"])
+        self.assertEqual(status["last_run"]["status"], JobRun.FAILED)
+        self.assertEqual(status["last_run"]["message"], "CKAN injoignable")
+        self.assertEqual(
+            datetime.fromisoformat(status["next_run"].replace("Z", "+00:00")),
+            run.started_at + timedelta(seconds=3600),
+        )
+
+
+# Le battement de cœur renouvelle le bail depuis un autre thread (autre connexion) :
+# ses écritures doivent être visibles, hors de la transaction d'un TestCase
+class SchedulerHeartbeatTests(TransactionTestCase):
+    def test_heartbeat_extends_the_lease(self):
+        with scheduler.job_lock(HARVEST_JOB, ttl=0.3):
+            acquired = JobLock.objects.get().expires_at
+            # Plus long que le bail : sans renouvellement (toutes les ttl / 3 s), il aurait expiré
+            time.sleep(0.5)
+            lock = JobLock.objects.get()
+            self.assertGreater(lock.expires_at, acquired)
+            self.assertGreater(lock.expires_at, django_timezone.now())
+            jobs = {job["name"]: job for job in self.client.get("/api/jobs/").json()["jobs"]}
+            self.assertTrue(jobs[HARVEST_JOB]["running"])
+        self.assertFalse(JobLock.objects.exists())
+
+
+class DatabaseRoutingTests(SimpleTestCase):
+    def with_replica(self):
+        # Réplique déclarée (même base) : le routeur ne la choisit que si l'alias existe
+        return mock.patch.dict(connections.databases, {"replica": connections.databases["default"]})
+
+    def test_reads_go_to_the_replica_writes_to_the_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Dataset), "default")
+        with self.with_replica():
+            self.assertEqual(router.db_for_read(Dataset), "replica")
+            self.assertEqual(router.db_for_write(Dataset), "default")
+            self.assertEqual(router.db_for_read(JobRun), "default")
+            self.assertFalse(router.allow_migrate("replica", "TP1_Inforoute"))
+            with mock.patch.object(connections["default"], "in_atomic_block", True):
+                self.assertEqual(router.db_for_read(Dataset), "default")
+
+    def test_use_primary_pins_reads(self):
+        router = PrimaryReplicaRouter()
+        with self.with_replica():
+            with use_primary():
+                self.assertTrue(pinned_to_primary())
+                self.assertEqual(router.db_for_read(Dataset), "default")
+            self.assertFalse(pinned_to_primary())
+            self.assertEqual(router.db_for_read(Dataset), "replica")
+
+    def pinned_during(self, method, path="/api/datasets/", is_async=True):
+        seen = []
+
+        def view(request):
+            seen.append(pinned_to_primary())
+            return HttpResponse()
+
+        async def async_view(request):
+            return view(request)
+
+        middleware = PrimaryForWritesMiddleware(async_view if is_async else view)
+        self.assertEqual(iscoroutinefunction(middleware), is_async)
+        request = getattr(RequestFactory(), method)(path)
+        (async_to_sync(middleware) if is_async else middleware)(request)
+        return seen[0]
+
+    def test_middleware_pins_writes(self):
+        self.assertFalse(self.pinned_during("get", is_async=False))
+        self.assertTrue(self.pinned_during("post", is_async=False))
+        # GraphQL : POST en lecture seule (replica_reads)
+        self.assertFalse(self.pinned_during("post", "/graphql/", is_async=False))
+        self.assertFalse(pinned_to_primary())
+
+    def test_async_middleware_pins_writes(self):
+        self.assertFalse(self.pinned_during("get"))
+        self.assertTrue(self.pinned_during("post"))
+        self.assertFalse(pinned_to_primary())
+
+    def test_asgi_stack_needs_no_adapter(self):
+        # Un middleware synchrone obligerait Django à passer chaque requête par un thread
+        # (adaptation journalisée seulement avec DEBUG)
+        with self.settings(DEBUG=True), self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler().load_middleware(is_async=True)
+
+
+class ExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(250):
+            Dataset.objects.create(ckan_id=f"id{i:03}", name=f"n{i}", title=f"Titre {i}")
+
+    async def test_asgi_export_is_streamed(self):
+        response = await self.async_client.get("/api/export/ndjson/")
+        self.assertEqual(response.status_code, 200)
+        # Itérateur async : envoyé par morceaux au lieu d'être lu en entier par Django
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 1)
+        lines = b"".join(chunks).splitlines()
+        self.assertEqual([json.loads(line)["ckan_id"] for line in lines], [f"id{i:03}" for i in range(250)])
+
+    def test_wsgi_export(self):
+        response = self.client.get("/api/export/csv/")
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 251)
+
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class ExportFormatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        modified = datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc)
+        dataset = Dataset.objects.create(
+            ckan_id="d0", name="d0", title='Titre, avec "guillemets"', notes="Ligne 1\nLigne 2",
+            tags=["eau", "air"], groups=["Environnement"], private=True, metadata_modified=modified,
+        )
+        for k, fmt in enumerate(["CSV", "JSON"]):
+            Resource.objects.create(
+                dataset=dataset, ckan_id=f"r{k}", name=f"Ressource {k}", format=fmt, url=f"https://x/{k}",
+            )
+        Dataset.objects.create(ckan_id="d1", name="d1", title="Sans ressource")
+
+    def content(self, export_format, **options):
+        return b"".join(export(Dataset.objects.order_by("ckan_id"), export_format, **options))
+
+    def test_csv_round_trip(self):
+        rows = list(csv.reader(io.StringIO(self.content("csv").decode("utf-8"), newline="")))
+        self.assertEqual(rows[0], CSV_COLUMNS)
+        records = [dict(zip(rows[0], row)) for row in rows[1:]]
+        # Une ligne par ressource, une ligne vide de ressource pour un dataset sans ressource
+        self.assertEqual(
+            [(r["ckan_id"], r["resource_ckan_id"]) for r in records],
+            [("d0", "r0"), ("d0", "r1"), ("d1", "")],
+        )
+        first = records[0]
+        self.assertEqual(first["title"], 'Titre, avec "guillemets"')
+        self.assertEqual(first["notes"], "Ligne 1\nLigne 2")
+        self.assertEqual((first["tags"], first["groups"]), ("eau|air", "Environnement"))
+        self.assertEqual((first["private"], first["metadata_modified"]), ("True", "2024-05-01 12:30:00+00:00"))
+        self.assertEqual([r["resource_format"] for r in records], ["CSV", "JSON", ""])
+
+    @skipUnless(pyarrow, "L'export Parquet nécessite pyarrow")
+    def test_parquet_round_trip(self):
+        # Un groupe de lignes par dataset : plusieurs blocs écrits puis relus
+        content = self.content("parquet", chunk_size=1)
+        parquet = pyarrow.parquet.ParquetFile(io.BytesIO(content))
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+        table = parquet.read()
+        self.assertEqual(table.num_rows, 2)
+        self.assertTrue(table.schema.equals(parquet_schema(pyarrow)))
+        first, second = table.to_pylist()
+        self.assertEqual((first["ckan_id"], first["tags"], first["private"]), ("d0", ["eau", "air"], True))
+        self.assertEqual(first["metadata_modified"], datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual([(r["ckan_id"], r["format"]) for r in first["resources"]], [("r0", "CSV"), ("r1", "JSON")])
+        self.assertEqual((second["ckan_id"], second["resources"]), ("d1", []))
+
+
+class CkanExtrasCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+        class FakeClient:
+            async def package_show(client, ckan_id):
+                self.calls.append(ckan_id)
+                return {"temporal": "2020-2024", "title": "ignoré"}
+
+        async def get_async_client():
+            return FakeClient()
+
+        patcher = mock.patch.object(ckan_cache, "get_async_client", get_async_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stale_refresh_outlives_the_request_loop(self):
+        cache.set(ckan_cache._cache_key("abc"), (0, {"temporal": "ancien"}))
+        # Comme sous WSGI : une boucle par appel, fermée dès la réponse
+        self.assertEqual(async_to_sync(ckan_cache.aget_extra_fields)("abc"), {"temporal": "ancien"})
+        for task in list(ckan_cache._background_tasks):
+            task.result(timeout=5)
+        self.assertEqual(self.calls, ["abc"])
+        self.assertEqual(cache.get(ckan_cache._cache_key("abc"))[1], {"temporal": "2020-2024"})
+
+    def test_cache_miss_does_not_wait_for_ckan(self):
+        # CKAN en panne ou lent : la page est rendue tout de suite, sans les champs
+        self.assertEqual(async_to_sync(ckan_cache.aget_extra_fields)("xyz"), {})
+        for task in list(ckan_cache._background_tasks):
+            task.result(timeout=5)
+        self.assertEqual(async_to_sync(ckan_cache.aget_extra_fields)("xyz"), {"temporal": "2020-2024"})
+        self.assertEqual(self.calls, ["xyz"])
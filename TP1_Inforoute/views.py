@@ -1,141 +1,345 @@
-from rest_framework import viewsets
-from .models import Dataset, Resource
-from .serializers import DatasetSerializer, ResourceSerializer, RegisterSerializer
-from rest_framework import filters
-from django.shortcuts import render
-from django.db.models import Count
-from .models import Dataset
-from django.db.models.functions import TruncMonth
-from django.shortcuts import render, get_object_or_404
-import json
-import requests
-from datetime import date
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Prefetch
+from django.db.models.functions import Substr
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
 from django.utils import timezone
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.utils.dateparse import parse_datetime
-from rest_framework import generics
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_safe
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, generics, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from . import dedup, related, scheduler, search
+from .aggregation import aggregate
+from .catalog_cache import bump_generation, cached_for_generation, catalog_generation
+from .ckan_cache import aget_extra_fields
+from .conditional import catalog_conditional, dataset_conditional, stats_conditional
+from .export import aiter_content, export, ExportUnavailable, CONTENT_TYPES
+from .facets import compute_facets
+from .filters import FullTextSearchFilter, DatasetFilter, ResourceFilter, filtered_datasets
+from .models import Dataset, DatasetSignature, HarvestState, Resource
+from .pagination import DatasetPagination, ResourceCursorPagination, SearchPagination
+from .response_cache import cache_response, response_cache
+from .serializers import (
+    AggregateQuerySerializer, DatasetSerializer, DatasetListSerializer, FacetQuerySerializer,
+    ResourceWithStatusSerializer, RegisterSerializer, NOTES_EXCERPT_LENGTH, query_param_list,
+)
+from .stats import get_catalog_stats, aget_catalog_stats
 
+DUPLICATES_LIMIT = 100
+
+
+@method_decorator(cache_response('datasets'), name='dispatch')
 class DatasetViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Dataset.objects.all()
     serializer_class = DatasetSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'notes', 'tags', 'organization_title']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
+    filterset_class = DatasetFilter
     ordering_fields = ['metadata_modified', 'title']
+    pagination_class = DatasetPagination
+
+    # 304 si le catalogue (liste) ou le dataset (détail) n'a pas changé, avant toute sérialisation
+    @method_decorator(catalog_conditional)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(dataset_conditional)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    # Les groupes changent quand d'autres datasets changent : version du catalogue, pas du dataset
+    @action(detail=True)
+    @method_decorator(catalog_conditional)
+    def duplicates(self, request, pk=None):
+        """Quasi-doublons du dataset (même groupe MinHash / LSH), du plus similaire au moins similaire."""
+        dataset = get_object_or_404(Dataset.objects.only('ckan_id'), pk=pk)
+        ranked = dedup.duplicates_of(dataset.ckan_id, limit=DUPLICATES_LIMIT)
+        details = Dataset.objects.in_bulk([ckan_id for ckan_id, _ in ranked])
+        return Response({
+            'results': [
+                {
+                    'ckan_id': ckan_id,
+                    'title': details[ckan_id].title,
+                    'organization_title': details[ckan_id].organization_title,
+                    'similarity': round(score, 3),
+                }
+                for ckan_id, score in ranked if ckan_id in details
+            ],
+        })
+
+    @action(detail=True)
+    @method_decorator(catalog_conditional)
+    def related(self, request, pk=None):
+        """Datasets similaires précalculés (related.rebuild), du plus au moins similaire."""
+        neighbors = list(related.neighbors(pk))
+        if not neighbors and not Dataset.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response({
+            'results': [
+                {
+                    'ckan_id': neighbor['target_id'],
+                    'title': neighbor['target__title'],
+                    'organization_title': neighbor['target__organization_title'],
+                    'score': neighbor['score'],
+                }
+                for neighbor in neighbors
+            ],
+        })
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return DatasetListSerializer
+        return DatasetSerializer
+
+    def get_queryset(self):
+        queryset = Dataset.objects.all()
+        expand = query_param_list(self.request, 'expand')
+        requested = query_param_list(self.request, 'fields')
+
+        if self.action == 'list':
+            # Pas de notes complètes dans les listes : seulement un extrait calculé en SQL (s'il est demandé)
+            queryset = queryset.defer('notes')
+            if not requested or 'notes_excerpt' in requested:
+                queryset = queryset.annotate(notes_excerpt=Substr('notes', 1, NOTES_EXCERPT_LENGTH))
+            if requested:
+                # Charge seulement les colonnes demandées (+ celles dont la pagination a besoin)
+                model_fields = {f.name for f in Dataset._meta.concrete_fields}
+                queryset = queryset.only(*((requested & model_fields) | {'ckan_id', *self.ordering_fields}))
+            if 'resources' in expand:
+                queryset = queryset.prefetch_related('resources')
+        elif not requested or 'resources' in requested:
+            queryset = queryset.prefetch_related('resources')
+        return queryset
 
 class ResourceViewSet(viewsets.ModelViewSet):
-    queryset = Resource.objects.all()
-    serializer_class = ResourceSerializer
+    queryset = Resource.objects.select_related('link_status')
+    serializer_class = ResourceWithStatusSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ResourceFilter
+    pagination_class = ResourceCursorPagination
+
+    @method_decorator(catalog_conditional)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-def dataset_list(request):
+    @method_decorator(catalog_conditional)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    # Écriture hors moissonnage : nouvelle version du catalogue, sinon les ETag resteraient valides
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        bump_generation()
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        bump_generation()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        bump_generation()
+
+# Vues async (ASGI) : aucune ne retient un thread pendant les accès base ou CKAN
+@cache_response('dataset_list')
+async def dataset_list(request):
     datasets = Dataset.objects.all()
     
     # Recherche
     search_query = request.GET.get('search', '')
     if search_query:
-        datasets = datasets.filter(
-            Q(title__icontains=search_query) |
-            Q(notes__icontains=search_query) |
-            Q(organization_title__icontains=search_query) |
-            Q(tags__name__icontains=search_query)
-        ).distinct()
+        datasets = search.search(datasets, search_query)
     
-    # Tri
-    ordering = request.GET.get('ordering', '-metadata_modified')
+    # Tri (par défaut : pertinence si recherche, sinon plus récents)
+    ordering = request.GET.get('ordering', '' if search_query else '-metadata_modified')
     if ordering:
         datasets = datasets.order_by(ordering)
     
-    return render(request, 'datasets_list.html', {'datasets': datasets})
-
-def dataset_detail(request, ckan_id):
-    response = requests.get(f"https://www.donneesquebec.ca/recherche/api/3/action/package_show?id={ckan_id}")
-    data = response.json()
+    # Chargé avant le rendu : le gabarit ne doit pas interroger la base
+    return render(request, 'datasets_list.html', {'datasets': [d async for d in datasets]})
 
-    dataset = data["result"]
-    resources = dataset.get("resources", [])
-    dataset["metadata_created"] = parse_datetime(dataset.get("metadata_created"))
-    dataset["metadata_modified"] = parse_datetime(dataset.get("metadata_modified"))
-    dataset["organization_title"] = dataset.get("organization_title") or dataset.get("organization", {}).get("title")
-    dataset["organization_id"] = dataset.get("organization_id") or dataset.get("organization", {}).get("id")
+async def dataset_detail(request, ckan_id):
+    # Rendu depuis la base locale : CKAN n'est consulté (via cache) que pour les champs non stockés
+    resources = Prefetch('resources', queryset=Resource.objects.select_related('profile'))
+    dataset = await aget_object_or_404(Dataset.objects.prefetch_related(resources), ckan_id=ckan_id)
 
     return render(request, "dataset_detail.html", {
         "dataset": dataset,
-        "resources": resources
+        "resources": dataset.resources.all(),
+        "extras": await aget_extra_fields(ckan_id),
+        "related": [neighbor async for neighbor in related.neighbors(ckan_id)],
     })
 
+@cache_response('stats')
+@stats_conditional
 def stats_view(request):
-    # Nombre de jeux par organisation
-    org_data = (
-        Dataset.objects
-        .values('organization_title')
-        .annotate(total=Count('organization_title'))
-        .order_by('-total')[:10]
-    )
+    # Instantané calculé à la fin du moissonnage : une seule lecture
+    snapshot = get_catalog_stats()
+    context = dict(snapshot.data, computed_at=snapshot.computed_at)
+    return render(request, 'stats.html', context)
 
-    # Répartition par état
-    state_data = (
-        Dataset.objects
-        .values('state')
-        .annotate(total=Count('state'))
-        .order_by('-total')
+@require_safe
+@stats_conditional
+async def catalog_stats(request):
+    snapshot = await aget_catalog_stats()
+    return JsonResponse(
+        dict(snapshot.data, computed_at=snapshot.computed_at),
+        json_dumps_params={"ensure_ascii": False},
     )
 
-    # Nombre de jeux créés par mois
-    temporal_data = (
-        Dataset.objects
-        .exclude(metadata_created__isnull=True)
-        .annotate(month=TruncMonth('metadata_created'))
-        .values('month')
-        .annotate(total=Count('ckan_id'))
-        .order_by('month')
-    )
+class AggregateView(APIView):
+    """Agrégats à la demande : ?group_by=organization,format&granularity=month&date_field=metadata_created
 
-    # Fréquence depuis dernière mise à jour (en jours)
-    datasets_with_update = Dataset.objects.exclude(metadata_modified__isnull=True)
-    today = timezone.now().date()
-    days_since_update = [(today - d.metadata_modified.date()).days for d in datasets_with_update]
-    bins = [0, 30, 60, 90, 180, 365, 10000]  # en jours
-    labels = ["0-30", "31-60", "61-90", "91-180", "181-365", "365+"]
-    freq_values = [0] * (len(bins)-1)
-
-    for days in days_since_update:
-        for i in range(len(bins)-1):
-            if bins[i] <= days < bins[i+1]:
-                freq_values[i] += 1
-                break
-
-    # Répartition par licence
-    license_data = (
-        Dataset.objects
-        .values('license_title')
-        .annotate(total=Count('license_title'))
-        .order_by('-total')
-    )
+    Dimensions : organization, license, state, format, tag et freshness (tranches de fraîcheur
+    de /api/stats/). Accepte aussi les filtres de la liste (organization, license, state, private,
+    tags, res_format) et since/until sur date_field. Résultats mis en cache jusqu'au prochain moissonnage.
+    """
 
-    # Public vs Privé
-    public_count = Dataset.objects.filter(private=False).count()
-    private_count = Dataset.objects.filter(private=True).count()
-
-    context = {
-        'org_labels': [d['organization_title'] or "Inconnue" for d in org_data],
-        'org_values': [d['total'] for d in org_data],
-        'state_labels': [d['state'] or "Non spécifiée" for d in state_data],
-        'state_values': [d['total'] for d in state_data],
-        'temporal_labels': [d['month'].strftime('%Y-%m') for d in temporal_data if d['month'] is not None],
-        'temporal_values': [d['total'] for d in temporal_data if d['month'] is not None],
-        'freq_labels': labels,
-        'freq_values': freq_values,
-        'license_labels': [d['license_title'] or "Non spécifiée" for d in license_data],
-        'license_values': [d['total'] for d in license_data],
-        'public_count': public_count,
-        'private_count': private_count,
-        'total_datasets': Dataset.objects.count(),
-        'total_orgs': Dataset.objects.values('organization_title').distinct().count(),
-        'recent_updates': Dataset.objects.filter(metadata_modified__month=today.month).count()
-    }
+    def get(self, request):
+        query = AggregateQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        options = query.validated_data
 
-    return render(request, 'stats.html', context)
+        filterset = DatasetFilter(request.query_params, queryset=Dataset.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        def compute():
+            queryset = filterset.qs
+            date_field = options['date_field']
+            if 'since' in options:
+                queryset = queryset.filter(**{f'{date_field}__gte': options['since']})
+            if 'until' in options:
+                queryset = queryset.filter(**{f'{date_field}__lt': options['until']})
+            return aggregate(
+                queryset,
+                group_by=options['group_by'],
+                date_field=date_field,
+                granularity=options.get('granularity'),
+                metrics=options['metrics'],
+                limit=options['limit'],
+            )
+
+        generation = catalog_generation()
+        # Les tranches de fraîcheur dépendent du jour : un résultat d'hier ne sert pas
+        prefix = f'aggregate:{timezone.localdate()}' if 'freshness' in options['group_by'] else 'aggregate'
+        results = cached_for_generation(prefix, request.query_params, compute, generation)
+        return Response({
+            'generation': generation,
+            'group_by': options['group_by'],
+            'granularity': options.get('granularity'),
+            'results': results,
+        })
+
+class FacetsView(APIView):
+    """Compteurs par facette (organization, license, format, tag, state) pour les filtres courants.
+
+    Mêmes paramètres que la liste des datasets (filtres et ?search=), plus
+    ?facets=organization,tag et ?facet_limit=. Sans recherche plein texte,
+    le résultat est mis en cache jusqu'au prochain moissonnage.
+    """
+
+    def get(self, request):
+        query = FacetQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        options = query.validated_data
+
+        filterset = DatasetFilter(request.query_params, queryset=Dataset.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        text = request.query_params.get('search', '').strip()
+
+        def compute():
+            queryset = filterset.qs
+            if text:
+                # Sans classement : les facettes reprennent le queryset en sous-requête
+                queryset = search.search(queryset, text, ranked=False)
+            return compute_facets(queryset, options['facets'], options['facet_limit'])
+
+        generation = catalog_generation()
+        if text:
+            # Texte libre : trop de combinaisons pour que le cache serve
+            facets = compute()
+        else:
+            facets = cached_for_generation('facets', request.query_params, compute, generation)
+        return Response({'generation': generation, 'facets': facets})
+
+class ExportView(APIView):
+    """Export complet en flux : /api/export/ndjson/, /api/export/csv/ ou /api/export/parquet/.
+
+    Accepte les filtres de la liste ; les datasets sont lus par blocs et
+    envoyés au fur et à mesure (mémoire constante).
+    """
+
+    def get(self, request, export_format):
+        if export_format not in CONTENT_TYPES:
+            raise NotFound(f"Format inconnu : {export_format}. Choix possibles : {', '.join(CONTENT_TYPES)}.")
+        queryset = filtered_datasets(request.query_params)
+        try:
+            content = export(queryset, export_format)
+        except ExportUnavailable as e:
+            raise ValidationError(str(e))
+        if isinstance(request._request, ASGIRequest):
+            # Sous ASGI, un itérateur synchrone serait lu en entier avant l'envoi
+            content = aiter_content(content)
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="catalogue.{export_format}"'
+        return response
+
+class SchedulerStatusView(APIView):
+    # État des tâches planifiées et du dernier moissonnage
+    def get(self, request):
+        state = HarvestState.objects.filter(name=HarvestState.CATALOG).first()
+        return Response({
+            'harvest': state and {
+                'generation': state.generation,
+                'watermark': state.watermark,
+                'last_started': state.last_started,
+                'last_finished': state.last_finished,
+            },
+            'jobs': scheduler.status(),
+        })
+
+class ResponseCacheStatsView(APIView):
+    # Compteurs du cache de réponses (propres à ce processus)
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache().stats())
+
+class DuplicateClustersView(APIView):
+    """Groupes de quasi-doublons (MinHash / LSH), du plus grand au plus petit : ?page=&page_size=
+
+    Recalculés à la fin de chaque moissonnage (dedup.update_clusters).
+    """
+
+    @method_decorator(catalog_conditional)
+    def get(self, request):
+        clusters = (
+            DatasetSignature.objects.filter(cluster__isnull=False)
+            .values('cluster')
+            .annotate(size=Count('dataset'))
+            .order_by('-size', 'cluster')
+        )
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(clusters, request, view=self)
+
+        members = {}
+        datasets = (
+            Dataset.objects.filter(signature__cluster__in=[cluster['cluster'] for cluster in page])
+            .order_by('title')
+            .values('ckan_id', 'title', 'organization_title', 'signature__cluster')
+        )
+        for dataset in datasets:
+            members.setdefault(dataset.pop('signature__cluster'), []).append(dataset)
+        return paginator.get_paginated_response([
+            {'cluster': cluster['cluster'], 'size': cluster['size'], 'datasets': members.get(cluster['cluster'], [])}
+            for cluster in page
+        ])
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
\ No newline at end of file
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TravailPratique1_Inforoute.settings')
+# Sous ASGI, chaque requête a son propre thread pour l'ORM : une connexion persistante
+# par thread ne serait jamais réutilisée. Lancement :
+#   gunicorn -k uvicorn.workers.UvicornWorker TravailPratique1_Inforoute.asgi:application
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -36,6 +36,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'TP1_Inforoute.db_router.PrimaryForWritesMiddleware',
 
 ]
 
@@ -61,12 +62,55 @@ ROOT_URLCONF = 'TravailPratique1_Inforoute.urls'
 WSGI_APPLICATION = 'TravailPratique1_Inforoute.wsgi.application'
 
 # === BASE DE DONNÉES ===
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Moteur et connexion par variables d'environnement (SQLite local par défaut) :
+# DB_ENGINE=django.db.backends.postgresql DB_NAME=... DB_USER=... DB_PASSWORD=... DB_HOST=... DB_PORT=...
+# Une réplique en lecture est ajoutée si DB_REPLICA_HOST (ou DB_REPLICA_NAME) est défini.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))  # secondes ; connexions réutilisées entre requêtes
+DB_TIMEOUT = 20  # secondes d'attente d'un verrou SQLite avant "database is locked"
+
+# Pragmas SQLite appliqués à chaque connexion. WAL : les lecteurs ne bloquent pas
+# l'écrivain (moissonnage) et l'écrivain ne bloque pas les lecteurs.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',  # sûr en WAL, un fsync par checkpoint plutôt que par transaction
+    'PRAGMA cache_size=-20000',  # 20 Mo de cache de pages par connexion
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=134217728',  # 128 Mo lus par mmap
+]
+
+
+def database(prefix, **defaults):
+    engine = os.environ.get(f'{prefix}ENGINE', defaults.get('ENGINE', DB_ENGINE))
+    config = {
+        'ENGINE': engine,
+        'NAME': os.environ.get(f'{prefix}NAME', defaults.get('NAME')),
+        'USER': os.environ.get(f'{prefix}USER', defaults.get('USER', '')),
+        'PASSWORD': os.environ.get(f'{prefix}PASSWORD', defaults.get('PASSWORD', '')),
+        'HOST': os.environ.get(f'{prefix}HOST', defaults.get('HOST', '')),
+        'PORT': os.environ.get(f'{prefix}PORT', defaults.get('PORT', '')),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,  # une connexion persistante coupée est rouverte, pas renvoyée en erreur
     }
+    if engine == 'django.db.backends.sqlite3':
+        config['OPTIONS'] = {
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+            'timeout': DB_TIMEOUT,
+            # Verrou d'écriture pris dès BEGIN : pas d'échec en cours de transaction
+            'transaction_mode': 'IMMEDIATE',
+        }
+    return config
+
+
+DATABASES = {
+    'default': database('DB_', NAME=str(BASE_DIR / 'db.sqlite3')),
 }
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    # Mêmes paramètres que la primaire sauf ceux redéfinis par DB_REPLICA_*
+    DATABASES['replica'] = database('DB_REPLICA_', **DATABASES['default'])
+    # Tests : la réplique pointe sur la base de test de la primaire
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['TP1_Inforoute.db_router.PrimaryReplicaRouter']
 
 # === FICHIERS STATIQUES ===
 STATIC_URL = '/static/'
@@ -85,7 +129,92 @@ REST_FRAMEWORK = {
 
 GRAPHENE = {
     'SCHEMA': 'TP1_Inforoute.schema.schema',
+    # Pas de champ DjangoDebug dans le schéma : sans cela, DEBUG=True ajoute un
+    # middleware qui instrumente tous les curseurs SQL (et ne les libère jamais)
+    'MIDDLEWARE': [],
+}
+GRAPHQL_PAGE_SIZE = 20  # taille de page par défaut des connexions
+GRAPHQL_MAX_PAGE_SIZE = 100
+GRAPHQL_MAX_DEPTH = 10  # profondeur maximale d'une requête
+GRAPHQL_MAX_COST = 5000  # coût estimé maximal (champs x taille des pages)
+GRAPHQL_LIST_FANOUT = 10  # éléments supposés par liste non paginée (ex. ressources d'un dataset)
+
+# === MOISSONNAGE CKAN ===
+CKAN_BASE_URL = os.environ.get('CKAN_BASE_URL', 'https://www.donneesquebec.ca/recherche/api/3/action')
+CKAN_TIMEOUT = 30  # secondes par requête
+HARVEST_WORKERS = 4  # pages téléchargées en parallèle
+HARVEST_PAGE_SIZE = 100  # nombre de datasets par page
+CKAN_RETRIES = 5  # nouvelles tentatives sur erreur réseau / 429 / 5xx
+CKAN_BACKOFF_FACTOR = 1  # attente 1 s, 2 s, 4 s... entre les tentatives
+CKAN_BACKOFF_JITTER = 1  # + aléa jusqu'à 1 s (évite que les threads réessaient ensemble)
+CKAN_BACKOFF_MAX = 60
+
+# Champs CKAN non stockés localement (page de détail), mis en cache en lecture
+CKAN_EXTRAS_CACHE_ENABLED = True
+CKAN_EXTRAS_TTL = 60 * 60  # frais pendant 1 h
+CKAN_EXTRAS_STALE_TTL = 24 * 60 * 60  # servis périmés (et rafraîchis en arrière-plan) jusqu'à 24 h
+CKAN_EXTRAS_TIMEOUT = 3  # secondes par appel de rafraîchissement (la page n'attend jamais CKAN)
+# Client async (vues ASGI) : un pool partagé par processus, borné
+CKAN_ASYNC_MAX_CONNECTIONS = 100
+CKAN_ASYNC_KEEPALIVE = 20
+CKAN_ASYNC_CONNECT_TIMEOUT = 1  # secondes
+
+# Résultats calculés sur le catalogue (agrégats, facettes) : invalidés par le prochain moissonnage
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60
+
+# === PLANIFICATEUR (manage.py run_scheduler) ===
+HARVEST_INTERVAL = int(os.environ.get('HARVEST_INTERVAL', 6 * 60 * 60))  # secondes entre deux moissonnages
+SCHEDULER_POLL_INTERVAL = 30  # secondes entre deux vérifications des tâches dues
+JOB_LOCK_TTL = 10 * 60  # bail du verrou, renouvelé tant que la tâche tourne
+LINKCHECK_INTERVAL = int(os.environ.get('LINKCHECK_INTERVAL', 24 * 60 * 60))  # secondes entre deux vérifications des liens
+PROFILE_INTERVAL = int(os.environ.get('PROFILE_INTERVAL', 24 * 60 * 60))  # secondes entre deux profilages des ressources
+
+# === VÉRIFICATION DES LIENS (manage.py check_links) ===
+LINKCHECK_CONCURRENCY = 50  # requêtes simultanées au total
+LINKCHECK_PER_HOST = 4  # requêtes simultanées par serveur
+LINKCHECK_HOST_DELAY = 0.1  # secondes entre deux requêtes vers un même serveur
+LINKCHECK_TIMEOUT = 15  # secondes par lien
+LINKCHECK_BATCH_SIZE = 500  # ressources lues et résultats écrits par lot
+LINKCHECK_MAX_AGE = 12 * 60 * 60  # tâche planifiée : ne revérifie pas un lien vérifié depuis moins de 12 h
+
+# === PROFILAGE DES RESSOURCES (manage.py profile_resources) ===
+PROFILE_WORKERS = int(os.environ.get('PROFILE_WORKERS', os.cpu_count() or 2))  # processus du pool
+PROFILE_MAX_BYTES = 50 * 1024 * 1024  # au-delà, seul le début du fichier est profilé
+PROFILE_TIMEOUT = 30  # secondes sans données avant d'abandonner un fichier
+PROFILE_BATCH_SIZE = 100  # ressources lues et profils écrits par lot
+PROFILE_MAX_AGE = 12 * 60 * 60  # tâche planifiée : ne recontacte pas une ressource vue depuis moins de 12 h
+
+# === QUASI-DOUBLONS (MinHash / LSH, manage.py find_duplicates) ===
+# Modifier DEDUP_NUM_PERM, DEDUP_BANDS ou DEDUP_SHINGLE_SIZE demande find_duplicates --rebuild
+DEDUP_NUM_PERM = 128  # valeurs par signature
+DEDUP_BANDS = 32  # 32 bandes de 4 valeurs : candidats dès ~42 % de similarité, 99 % des paires à 70 %
+DEDUP_SHINGLE_SIZE = 3  # n-grammes de mots
+DEDUP_THRESHOLD = 0.7  # similarité de Jaccard estimée à partir de laquelle deux datasets sont doublons
+DEDUP_MAX_BUCKET = 200  # au-delà, les membres d'un seau sont comparés en chaîne (coût linéaire)
+DEDUP_REBUILD_RATIO = 0.2  # plus de 20 % du catalogue à regrouper : recalcul complet plutôt que local
+
+# === DATASETS SIMILAIRES (TF-IDF, recalculés après chaque moissonnage, manage.py build_related) ===
+RELATED_TOP_K = 10  # voisins enregistrés par dataset
+RELATED_MIN_SCORE = 0.1  # similarité cosinus minimale d'un voisin
+RELATED_MAX_DF = 0.5  # termes présents dans plus de la moitié des datasets ignorés (mots vides)
+RELATED_MAX_TERMS = 32  # termes les plus lourds gardés par vecteur : borne le coût du produit
+RELATED_MAX_POSTINGS = 1000  # datasets gardés par terme (ceux où il pèse le plus) : coût linéaire
+RELATED_BATCH_SIZE = 1000  # datasets par lot de calcul et d'écriture
+
+# === CACHE ===
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Réponses complètes des vues en lecture, clé = paramètres + génération du catalogue
+    'responses': {
+        'BACKEND': 'TP1_Inforoute.cache_backends.LRUBytesCache',
+        'OPTIONS': {
+            'MAX_BYTES': int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        },
+    },
 }
+RESPONSE_CACHE_ALIAS = 'responses'
 
 # === CORS SETTINGS ===
 CORS_ALLOWED_ORIGINS = [
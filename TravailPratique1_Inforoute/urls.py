@@ -24,6 +24,10 @@ from drf_yasg import openapi
 from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 from TP1_Inforoute import views
+from TP1_Inforoute.graphql_limits import validation_rules
+from TP1_Inforoute.response_cache import cache_response, graphql_succeeded
+from TP1_Inforoute.db_router import replica_reads
+from django.utils.decorators import method_decorator
 
 router = routers.DefaultRouter()
 router.register(r'datasets', DatasetViewSet, basename='dataset')
@@ -41,17 +45,32 @@ schema_view = get_schema_view(
 )
 
 class AuthenticatedGraphQLView(GraphQLView):
+    validation_rules = validation_rules()
+
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             from django.http import JsonResponse
             return JsonResponse({'detail': 'Authentification requise.'}, status=401)
+        return self.cached_dispatch(request, *args, **kwargs)
+
+    # Schéma en lecture seule : même requête + même génération = même réponse
+    # (POST seulement : en GET, l'interface GraphiQL est servie ; jamais les réponses en erreur)
+    @method_decorator(cache_response('graphql', methods=('POST',), cacheable=graphql_succeeded))
+    def cached_dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/stats/', views.catalog_stats, name='catalog_stats'),
+    path('api/aggregate/', views.AggregateView.as_view(), name='catalog_aggregate'),
+    path('api/facets/', views.FacetsView.as_view(), name='catalog_facets'),
+    path('api/export/<str:export_format>/', views.ExportView.as_view(), name='catalog_export'),
+    path('api/jobs/', views.SchedulerStatusView.as_view(), name='scheduler_status'),
+    path('api/duplicates/', views.DuplicateClustersView.as_view(), name='duplicate_clusters'),
+    path('api/cache-stats/', views.ResponseCacheStatsView.as_view(), name='response_cache_stats'),
     path('api/', include(router.urls)),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('graphql/', csrf_exempt(AuthenticatedGraphQLView.as_view(graphiql=True))),
+    path('graphql/', replica_reads(csrf_exempt(AuthenticatedGraphQLView.as_view(graphiql=True)))),
     path('stats/', views.stats_view, name='stats_view'),
     path('', views.dataset_list, name='dataset_list'),
     path('dataset/<str:ckan_id>/', views.dataset_detail, name='dataset_detail'),
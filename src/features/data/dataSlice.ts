@@ -16,6 +16,7 @@ export interface Dataset {
   name: string;
   title: string;
   notes: string;
+  notes_excerpt?: string; // listes : extrait de notes (notes complètes sur le détail)
   author: string;
   organization_title: string;
   license_title: string;
@@ -25,18 +26,22 @@ export interface Dataset {
   private: boolean;
   tags: string[];
   groups: string[];
-  resources: Resource[];
+  resources?: Resource[]; // listes : seulement avec ?expand=resources
 }
 
 export type RootState = {
   data: DataState;
 };
 
+// Le catalogue est paginé par curseur (next/previous, sans count) ; une recherche
+// est paginée par numéro de page, avec count
 export interface Pagination {
   currentPage: number;
-  totalPages: number;
-  totalItems: number;
+  totalPages: number | null; // null : total inconnu (pagination par curseur)
+  totalItems: number | null;
   pageSize: number;
+  next: string | null;
+  previous: string | null;
 }
 
 export interface Filters {
@@ -49,8 +54,11 @@ export interface Filters {
 export interface Statistics {
   total_datasets?: number;
   total_resources?: number;
-  organizations_count?: number;
-  licenses_count?: number;
+  total_orgs?: number;
+  public_count?: number;
+  private_count?: number;
+  recent_updates?: number;
+  computed_at?: string;
   [key: string]: any;
 }
 
@@ -125,21 +133,40 @@ interface FetchDatasetsParams {
   page?: number;
   search?: string;
   filters?: Partial<Filters>;
+  cursor?: string | null; // lien next/previous renvoyé par l'API (contient déjà les filtres)
 }
 
+export const DATASETS_PAGE_SIZE = 20;
+export const RESOURCES_PAGE_SIZE = 50;
+
+// Total connu seulement si l'API renvoie count (pagination par numéro de page)
+const pageInfo = (payload: ApiResponse<unknown>, page: number, pageSize: number) => ({
+  currentPage: page,
+  totalPages: payload.count !== undefined ? Math.max(1, Math.ceil(payload.count / pageSize)) : null,
+  totalItems: payload.count !== undefined ? payload.count : null,
+  next: payload.next || null,
+  previous: payload.previous || null,
+});
+
 // Async Thunks
 export const fetchDatasets = createAsyncThunk(
   'data/fetchDatasets',
-  async ({ page = 1, search = '', filters = {} }: FetchDatasetsParams, { rejectWithValue }) => {
+  async ({ page = 1, search = '', filters = {}, cursor }: FetchDatasetsParams, { rejectWithValue }) => {
     try {
+      if (cursor) {
+        const response = await api.get<DatasetsResponse>(cursor);
+        return response.data;
+      }
+
       const params = new URLSearchParams();
       
       // Ajoute les paramètres de base
-      params.append('page', page.toString());
+      params.append('page_size', DATASETS_PAGE_SIZE.toString());
       
-      // Ajouter la recherche
+      // Ajouter la recherche (seule pagination par numéro de page)
       if (search) {
         params.append('search', search);
+        params.append('page', page.toString());
       }
       
       // Ajouter les filtres un par un
@@ -179,16 +206,12 @@ export const fetchDatasetDetail = createAsyncThunk(
 
 export const fetchResources = createAsyncThunk(
   'data/fetchResources',
-  async ({ page = 1 }: { page?: number }, { rejectWithValue }) => {
+  async ({ cursor }: { page?: number; cursor?: string | null }, { rejectWithValue }) => {
     try {
-      const response = await api.get<ResourcesResponse>(`/resources/?page=${page}`);
-      
-      return {
-        results: response.data.results || [],
-        count: response.data.count || 0,
-        current_page: response.data.current_page || page,
-        ...response.data
-      } as ResourcesResponse;
+      const response = await api.get<ResourcesResponse>(
+        cursor || `/resources/?page_size=${RESOURCES_PAGE_SIZE}`
+      );
+      return response.data;
     } catch (error) {
       const err = error as AxiosError;
       return rejectWithValue(err.response?.data || err.message);
@@ -196,67 +219,16 @@ export const fetchResources = createAsyncThunk(
   }
 );
 
-export const calculateStatsFromLoadedData = createAsyncThunk(
-  'data/calculateStatsFromLoadedData',
-  async (_, { getState, rejectWithValue }) => {
+// Statistiques précalculées côté serveur (instantané mis à jour après chaque moissonnage)
+export const fetchStatistics = createAsyncThunk(
+  'data/fetchStatistics',
+  async (_, { rejectWithValue }) => {
     try {
-      const state = getState() as any;
-      const datasets = state.data.datasets.list;
-      
-      if (!datasets || datasets.length === 0) {
-        return {
-          total_datasets: 0,
-          organizations_count: 0,
-          total_resources: 0,
-        };
-      }
-      
-      // Calculer les statistiques
-      const uniqueOrganizations = new Set<string>();
-      let totalResources = 0;
-      
-      datasets.forEach((dataset: Dataset) => {
-        if (dataset.organization_title) {
-          uniqueOrganizations.add(dataset.organization_title);
-        }
-        if (dataset.resources) {
-          totalResources += dataset.resources.length;
-        }
-      });
-      
-      return {
-        total_datasets: datasets.length,
-        organizations_count: uniqueOrganizations.size,
-        total_resources: totalResources,
-      };
-    } catch (error) {
-      return rejectWithValue('Erreur de calcul des statistiques');
-    }
-  }
-);
-
-export const calculateStatistics = createAsyncThunk(
-  'data/calculateStatistics',
-  async (_, { getState, rejectWithValue }) => {
-    try {
-      const state = getState() as RootState;
-      const datasets = state.data.datasets.list;
-      
-      const uniqueOrganizations = new Set(
-        datasets.map(d => d.organization_title).filter(Boolean)
-      );
-      
-      const totalResources = datasets.reduce(
-        (sum, dataset) => sum + (dataset.resources?.length || 0), 0
-      );
-      
-      return {
-        total_datasets: datasets.length,
-        organizations_count: uniqueOrganizations.size,
-        total_resources: totalResources,
-      };
+      const response = await api.get<Statistics>('/stats/');
+      return response.data;
     } catch (error) {
-      return rejectWithValue('Erreur lors du calcul des statistiques');
+      const err = error as AxiosError;
+      return rejectWithValue(err.response?.data || err.message);
     }
   }
 );
@@ -282,9 +254,11 @@ const initialState: DataState = {
     currentDataset: null,
     pagination: {
       currentPage: 1,
-      totalPages: 1,
-      totalItems: 0,
-      pageSize: 10,
+      totalPages: null,
+      totalItems: null,
+      pageSize: DATASETS_PAGE_SIZE,
+      next: null,
+      previous: null,
     },
     filters: {
       search: '',
@@ -299,8 +273,10 @@ const initialState: DataState = {
     list: [],
     pagination: {
       currentPage: 1,
-      totalPages: 1,
-      totalItems: 0,
+      totalPages: null,
+      totalItems: null,
+      next: null,
+      previous: null,
     },
     loading: false,
     error: null,
@@ -357,10 +333,10 @@ const dataSlice = createSlice({
         state.datasets.loading = true;
         state.datasets.error = null;
       })
-      .addCase(fetchDatasets.fulfilled, (state, action: PayloadAction<DatasetsResponse | Dataset[]>) => {
+      .addCase(fetchDatasets.fulfilled, (state, action) => {
         state.datasets.loading = false;
         
-        const payload = action.payload;
+        const payload: DatasetsResponse | Dataset[] = action.payload;
         
         const isDatasetsResponse = (data: any): data is DatasetsResponse => {
             return data && 
@@ -373,28 +349,11 @@ const dataSlice = createSlice({
         if (isDatasetsResponse(payload)) {
             state.datasets.list = payload.results || [];
             
-            if (payload.count !== undefined) {
-            const pageSize = payload.page_size || 
-                            (payload.results ? payload.results.length : 10) || 
-                            10;
-            
-            let currentPage = 1;
-            
-            if (payload.next) {
-                const nextPageMatch = payload.next.match(/page=(\d+)/);
-                currentPage = nextPageMatch ? parseInt(nextPageMatch[1]) - 1 : 1;
-            } else if (payload.previous) {
-                const prevPageMatch = payload.previous.match(/page=(\d+)/);
-                currentPage = prevPageMatch ? parseInt(prevPageMatch[1]) + 1 : 1;
-            }
-            
+            // Le numéro de page courant est celui demandé : un curseur n'en porte pas
             state.datasets.pagination = {
-                currentPage,
-                totalPages: Math.ceil(payload.count / pageSize),
-                totalItems: payload.count,
-                pageSize,
+                ...pageInfo(payload, action.meta.arg.page || 1, DATASETS_PAGE_SIZE),
+                pageSize: DATASETS_PAGE_SIZE,
             };
-            }
         } else if (Array.isArray(payload)) {
             state.datasets.list = payload;
             state.datasets.pagination = {
@@ -402,6 +361,8 @@ const dataSlice = createSlice({
             totalPages: 1,
             totalItems: payload.length,
             pageSize: payload.length,
+            next: null,
+            previous: null,
             };
         } else {
             state.datasets.list = [];
@@ -435,21 +396,27 @@ const dataSlice = createSlice({
         const payload = action.payload as ResourcesResponse;
         
         state.resources.list = payload.results || [];
-        
-        if (payload.count !== undefined) {
-            const pageSize = 10;
-            
-            state.resources.pagination = {
-            currentPage: payload.current_page || 1,
-            totalPages: Math.ceil(payload.count / pageSize),
-            totalItems: payload.count,
-            };
-        }
+        state.resources.pagination = pageInfo(payload, action.meta.arg.page || 1, RESOURCES_PAGE_SIZE);
         })
       .addCase(fetchResources.rejected, (state, action) => {
         state.resources.loading = false;
         state.resources.error = action.payload as string || 'Erreur lors du chargement des ressources';
       });
+
+    // fetchStatistics
+    builder
+      .addCase(fetchStatistics.pending, (state) => {
+        state.statistics.loading = true;
+        state.statistics.error = null;
+      })
+      .addCase(fetchStatistics.fulfilled, (state, action) => {
+        state.statistics.loading = false;
+        state.statistics.data = action.payload;
+      })
+      .addCase(fetchStatistics.rejected, (state, action) => {
+        state.statistics.loading = false;
+        state.statistics.error = action.payload as string || 'Erreur lors du chargement des statistiques';
+      });
   },
 });
 
@@ -51,6 +51,13 @@ const DatasetList: React.FC = () => {
     dispatch(fetchDatasets({ page, search: searchTerm, filters }));
   };
 
+  // Page voisine : on suit le lien next/previous de l'API (curseur ou numéro de page)
+  const handleCursorChange = (cursor: string | null, page: number) => {
+    if (!cursor) return;
+    dispatch(setPage(page));
+    dispatch(fetchDatasets({ page, cursor }));
+  };
+
   const handleOrderingChange = (order: string) => {
     setOrdering(order);
     dispatch(fetchDatasets({ 
@@ -161,7 +168,8 @@ const DatasetList: React.FC = () => {
                   </>
                 ) : (
                   <>
-                    <strong>{pagination.totalItems}</strong> jeu(x) de données disponible(s)
+                    <strong>{pagination.totalItems ?? datasets.length}</strong>
+                    {pagination.totalItems === null && pagination.next ? '+' : ''} jeu(x) de données disponible(s)
                   </>
                 )}
               </p>
@@ -208,9 +216,9 @@ const DatasetList: React.FC = () => {
                   
                   <CardContent className="flex-grow">
                     {/* Description */}
-                    {dataset.notes && (
+                    {dataset.notes_excerpt && (
                       <p className="text-gray-600 text-sm mb-4 line-clamp-3">
-                        {dataset.notes}
+                        {dataset.notes_excerpt}
                       </p>
                     )}
 
@@ -272,13 +280,13 @@ const DatasetList: React.FC = () => {
             </div>
 
             {/* Pagination */}
-            {pagination.totalPages > 1 && (
+            {(pagination.next || pagination.previous) && (
               <div className="flex justify-center items-center mt-12 space-x-2">
                 <button
-                  onClick={() => handlePageChange(pagination.currentPage - 1)}
-                  disabled={pagination.currentPage === 1}
+                  onClick={() => handleCursorChange(pagination.previous, pagination.currentPage - 1)}
+                  disabled={!pagination.previous}
                   className={`px-3 py-2 rounded-lg flex items-center ${
-                    pagination.currentPage === 1
+                    !pagination.previous
                       ? 'text-gray-400 cursor-not-allowed'
                       : 'text-gray-700 hover:bg-gray-100'
                   }`}
@@ -287,15 +295,18 @@ const DatasetList: React.FC = () => {
                   Précédent
                 </button>
 
+                {/* Numéros de page seulement si le total est connu (recherche) */}
+                {pagination.totalPages !== null ? (
                 <div className="flex space-x-1">
                   {Array.from({ length: Math.min(5, pagination.totalPages) }, (_, i) => {
+                    const totalPages = pagination.totalPages as number;
                     let pageNum;
-                    if (pagination.totalPages <= 5) {
+                    if (totalPages <= 5) {
                       pageNum = i + 1;
                     } else if (pagination.currentPage <= 3) {
                       pageNum = i + 1;
-                    } else if (pagination.currentPage >= pagination.totalPages - 2) {
-                      pageNum = pagination.totalPages - 4 + i;
+                    } else if (pagination.currentPage >= totalPages - 2) {
+                      pageNum = totalPages - 4 + i;
                     } else {
                       pageNum = pagination.currentPage - 2 + i;
                     }
@@ -315,12 +326,15 @@ const DatasetList: React.FC = () => {
                     );
                   })}
                 </div>
+                ) : (
+                  <span className="px-3 py-2 text-gray-700">Page {pagination.currentPage}</span>
+                )}
 
                 <button
-                  onClick={() => handlePageChange(pagination.currentPage + 1)}
-                  disabled={pagination.currentPage === pagination.totalPages}
+                  onClick={() => handleCursorChange(pagination.next, pagination.currentPage + 1)}
+                  disabled={!pagination.next}
                   className={`px-3 py-2 rounded-lg flex items-center ${
-                    pagination.currentPage === pagination.totalPages
+                    !pagination.next
                       ? 'text-gray-400 cursor-not-allowed'
                       : 'text-gray-700 hover:bg-gray-100'
                   }`}
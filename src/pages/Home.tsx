@@ -1,7 +1,7 @@
-import React, { useEffect, useMemo } from 'react';
+import React, { useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import { useAppDispatch, useAppSelector } from '../hooks/reduxHooks';
-import { fetchDatasets } from '../features/data/dataSlice';
+import { fetchDatasets, fetchStatistics } from '../features/data/dataSlice';
 import Layout from '../components/Layout';
 import { Database, BarChart3, Users, Download, ChevronRight, Calendar, Building, Tag } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
@@ -18,37 +18,17 @@ export default function Home() {
     error: datasetsError 
   } = useAppSelector((state) => state.data.datasets);
 
-  // Calculer les statistiques en temps réel
-  const statistics = useMemo(() => {
-    if (!datasets || datasets.length === 0) {
-      return {
-        total_datasets: 0,
-        organizations_count: 0,
-        total_resources: 0,
-      };
-    }
-    
-    const uniqueOrganizations = new Set<string>();
-    let totalResources = 0;
-    
-    datasets.forEach((dataset) => {
-      // Organisation unique
-      if (dataset.organization_title && dataset.organization_title.trim() !== '') {
-        uniqueOrganizations.add(dataset.organization_title);
-      }
-      
-      // Total des ressources
-      if (dataset.resources && Array.isArray(dataset.resources)) {
-        totalResources += dataset.resources.length;
-      }
-    });
-    
-    return {
-      total_datasets: pagination.totalItems || datasets.length,
-      organizations_count: uniqueOrganizations.size,
-      total_resources: totalResources,
-    };
-  }, [datasets, pagination.totalItems]);
+  // Statistiques du catalogue complet, calculées par le serveur
+  const { data: stats } = useAppSelector((state) => state.data.statistics);
+  const statistics = {
+    total_datasets: stats?.total_datasets ?? (pagination.totalItems || datasets.length),
+    organizations_count: stats?.total_orgs ?? 0,
+    total_resources: stats?.total_resources ?? 0,
+  };
+
+  useEffect(() => {
+    dispatch(fetchStatistics());
+  }, [dispatch]);
 
   // Charger les datasets au montage
   useEffect(() => {
@@ -154,7 +134,7 @@ export default function Home() {
                   </p>
                   <p className="text-gray-500">Participantes</p>
                   <div className="mt-2 text-xs text-gray-400">
-                    Basé sur {datasets.length} jeux de données
+                    Basé sur {statistics.total_datasets} jeux de données
                   </div>
                 </>
               )}
@@ -182,7 +162,7 @@ export default function Home() {
                   </p>
                   <p className="text-gray-500">Téléchargeables</p>
                   <div className="mt-2 text-xs text-gray-400">
-                    Moyenne: {(statistics.total_resources / Math.max(datasets.length, 1)).toFixed(1)} par jeu
+                    Moyenne: {(statistics.total_resources / Math.max(statistics.total_datasets, 1)).toFixed(1)} par jeu
                   </div>
                 </>
               )}